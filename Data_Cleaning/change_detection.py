@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Change detection for re-ingestion. Two levels:
+#   1. a content hash per source file, so a republished file that did not
+#      change is skipped without being parsed at all
+#   2. a snapshot of each hospital's fact rows with a fingerprint per row, so a
+#      changed file yields only the rows that were added or removed
+
+STATE_FILE = 'ingest_state.json'
+SNAPSHOT_DIR = 'snapshots'
+
+# The columns that make up a MASTER_TABLE row (payer/plan/code by name instead of ID)
+FINGERPRINT_COLUMNS = [
+    'CODE', 'PAYER_NAME', 'PLAN_NAME', 'STANDARD_CHARGE_DOLLAR', 'MAXIMUM_CHARGE', 'MINIMUM_CHARGE'
+]
+
+
+def file_digest(path, block_size=4 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 64-bit fingerprint per row over FINGERPRINT_COLUMNS
+def row_fingerprints(df):
+    return pd.util.hash_pandas_object(df[FINGERPRINT_COLUMNS], index=False).to_numpy(dtype=np.uint64)
+
+
+def _atomic_write(path, write):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# {hospital: {"sha256": ..., "rows": ...}} for the last successful run
+def load_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(output_dir, state):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+    _atomic_write(os.path.join(output_dir, STATE_FILE), write)
+
+
+def snapshot_path(output_dir, hospital):
+    return os.path.join(output_dir, SNAPSHOT_DIR, f"{hospital}.parquet")
+
+
+# Distinct fact rows of the last load, with their fingerprints
+def load_snapshot(output_dir, hospital):
+    path = snapshot_path(output_dir, hospital)
+    if not os.path.exists(path):
+        return pd.DataFrame({
+            **{column: pd.Series(dtype='string') for column in ['CODE', 'PAYER_NAME', 'PLAN_NAME']},
+            **{column: pd.Series(dtype='float64') for column in FINGERPRINT_COLUMNS[3:]},
+            'FINGERPRINT': pd.Series(dtype='uint64'),
+        })
+    return pd.read_parquet(path)
+
+
+def save_snapshot(output_dir, hospital, snapshot):
+    _atomic_write(snapshot_path(output_dir, hospital), lambda tmp_path: snapshot.to_parquet(tmp_path, index=False))
@@ -0,0 +1,119 @@
+import pandas as pd
+
+# Cleaning step shared by the ingestion scripts. It accepts every column layout
+# the hospitals publish (the v2 "code|1 / standard_charge|..." CSVs, the
+# "Code Type / Payer Name" flattened files, the JSON parser output and already
+# standardized tables) and returns the CORE-level columns.
+
+CLEANED_COLUMNS = [
+    'DESCRIPTION', 'CODE', 'CODE_TYPE', 'PAYER_NAME', 'PLAN_NAME',
+    'STANDARD_CHARGE_DOLLAR', 'STANDARD_CHARGE_PERCENTAGE', 'MINIMUM_CHARGE', 'MAXIMUM_CHARGE'
+]
+
+NUMERIC_COLUMNS = ['STANDARD_CHARGE_DOLLAR', 'STANDARD_CHARGE_PERCENTAGE', 'MINIMUM_CHARGE', 'MAXIMUM_CHARGE']
+
+# Source column name -> standardized column name
+COLUMN_ALIASES = {
+    'description': 'DESCRIPTION',
+    'Description': 'DESCRIPTION',
+    'DESCRIPTION': 'DESCRIPTION',
+    'Code': 'CODE',
+    'CODE': 'CODE',
+    'Code Type': 'CODE_TYPE',
+    'Code_Type': 'CODE_TYPE',
+    'CODE_TYPE': 'CODE_TYPE',
+    'payer_name': 'PAYER_NAME',
+    'Payer Name': 'PAYER_NAME',
+    'Payer_Name': 'PAYER_NAME',
+    'PAYER_NAME': 'PAYER_NAME',
+    'plan_name': 'PLAN_NAME',
+    'Plan Name': 'PLAN_NAME',
+    'Plan_Name': 'PLAN_NAME',
+    'PLAN_NAME': 'PLAN_NAME',
+    'standard_charge|negotiated_dollar': 'STANDARD_CHARGE_DOLLAR',
+    'Standard Charge Dollar': 'STANDARD_CHARGE_DOLLAR',
+    'Standard Charge': 'STANDARD_CHARGE_DOLLAR',
+    'Standard_Charge_Dollar': 'STANDARD_CHARGE_DOLLAR',
+    'STANDARD_CHARGE_DOLLAR': 'STANDARD_CHARGE_DOLLAR',
+    'standard_charge|negotiated_percentage': 'STANDARD_CHARGE_PERCENTAGE',
+    'Standard Charge Percentage': 'STANDARD_CHARGE_PERCENTAGE',
+    'Standard_Charge_Percentage': 'STANDARD_CHARGE_PERCENTAGE',
+    'STANDARD_CHARGE_PERCENTAGE': 'STANDARD_CHARGE_PERCENTAGE',
+    'standard_charge|min': 'MINIMUM_CHARGE',
+    'Minimum Charge': 'MINIMUM_CHARGE',
+    'Minimum_Charge': 'MINIMUM_CHARGE',
+    'MINIMUM_CHARGE': 'MINIMUM_CHARGE',
+    'standard_charge|max': 'MAXIMUM_CHARGE',
+    'Maximum Charge': 'MAXIMUM_CHARGE',
+    'Maximum_Charge': 'MAXIMUM_CHARGE',
+    'MAXIMUM_CHARGE': 'MAXIMUM_CHARGE',
+}
+
+
+# v2 files carry up to four code|N / code|N|type pairs; take the first CPT code
+# in each row (generalizes the CDM -> CPT swap in batch_processing_data_cleaning)
+def _select_cpt_code(chunk):
+    pairs = [(f"code|{n}", f"code|{n}|type") for n in range(1, 5)
+             if f"code|{n}" in chunk.columns and f"code|{n}|type" in chunk.columns]
+    if not pairs:
+        return chunk
+
+    code = pd.Series(pd.NA, index=chunk.index, dtype="object")
+    code_type = pd.Series(pd.NA, index=chunk.index, dtype="object")
+    for code_col, type_col in pairs:
+        take = code.isna() & (chunk[type_col].astype("string").str.strip().str.upper() == "CPT")
+        code = code.mask(take, chunk[code_col])
+        code_type = code_type.mask(take, "CPT")
+
+    # Rows without any CPT code keep their first code so the CPT filter drops them
+    first_code, first_type = pairs[0]
+    code = code.fillna(chunk[first_code])
+    code_type = code_type.fillna(chunk[first_type])
+
+    chunk = chunk.drop(columns=[c for pair in pairs for c in pair])
+    chunk['CODE'] = code
+    chunk['CODE_TYPE'] = code_type
+    return chunk
+
+
+def clean_chunk(chunk):
+    chunk = chunk.drop(columns=[c for c in chunk.columns if str(c).startswith('Unnamed')])
+    chunk.columns = [str(c).strip() for c in chunk.columns]
+    chunk = _select_cpt_code(chunk)
+    chunk = chunk.rename(columns={c: COLUMN_ALIASES[c] for c in chunk.columns if c in COLUMN_ALIASES})
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+
+    for column in CLEANED_COLUMNS:
+        if column not in chunk.columns:
+            chunk[column] = pd.NA
+    chunk = chunk[CLEANED_COLUMNS]
+
+    # Keep CPT codes only
+    chunk = chunk[chunk['CODE_TYPE'].astype("string").str.strip().str.upper() == "CPT"].copy()
+    chunk['CODE_TYPE'] = "CPT"
+
+    for column in ['DESCRIPTION', 'CODE', 'PAYER_NAME', 'PLAN_NAME']:
+        chunk[column] = chunk[column].astype("string").str.strip()
+
+    # "N/A" and blanks become NaN
+    for column in NUMERIC_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").astype("float64")
+
+    dollar_col = 'STANDARD_CHARGE_DOLLAR'
+    percent_col = 'STANDARD_CHARGE_PERCENTAGE'
+    max_col = 'MAXIMUM_CHARGE'
+
+    # Several files publish 0 instead of leaving the dollar amount blank
+    no_dollar = chunk[dollar_col].fillna(0) == 0
+    no_percent = chunk[percent_col].fillna(0) == 0
+    chunk = chunk[~(no_dollar & no_percent)]
+    no_dollar = no_dollar[chunk.index]
+
+    # Derive the dollar amount from the negotiated percentage of the maximum charge
+    missing_dollar = no_dollar & chunk[percent_col].notna() & chunk[max_col].notna()
+    chunk.loc[missing_dollar, dollar_col] = (
+        chunk.loc[missing_dollar, percent_col] / 100 * chunk.loc[missing_dollar, max_col]
+    )
+
+    chunk[NUMERIC_COLUMNS] = chunk[NUMERIC_COLUMNS].fillna(0.0)
+    return chunk.reset_index(drop=True)
@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from change_detection import (FINGERPRINT_COLUMNS, file_digest, load_snapshot, load_state,
+                              row_fingerprints, save_snapshot, save_state)
+from cleaning import CLEANED_COLUMNS, NUMERIC_COLUMNS, clean_chunk
+from stream_json_to_csv import iter_batches
+from wide_to_long import iter_long_chunks
+
+# One command for every hospital: parse -> clean -> load for each manifest
+# entry runs in its own worker process, so wall time is bound by cores instead
+# of by re-running one notebook cell per hospital.
+#
+# Manifest entries (see hospital_manifest.json):
+#   hospital    table name used in HEALTH_NAV.CORE (e.g. CAROLINAS_MEDICAL_CENTER)
+#   hospital_id HOSPITAL_DATA.HOSPITAL_ID
+#   state       two-letter state code
+#   source      path to the hospital's file (relative to the manifest)
+#   format      "csv" (default), "wide_csv" (one column per payer/plan) or "json"
+#   header_row  CSV header row (2 for raw standardcharges CSVs, 0 for STAGE exports)
+#   layout      JSON layout for stream_json_to_csv ("standard" or "multi_code")
+#   encoding    CSV encoding (default utf-8)
+
+
+def load_manifest(path):
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for entry in entries:
+        if not os.path.isabs(entry['source']):
+            entry['source'] = os.path.join(base_dir, entry['source'])
+    return entries
+
+
+# Parse stage: yield raw DataFrame chunks from the source file
+def read_source(entry, chunk_size):
+    source_format = entry.get('format', 'csv')
+    if source_format == 'json':
+        for batch in iter_batches(entry['source'], entry.get('layout', 'standard'), chunk_size):
+            yield pd.DataFrame(batch)
+    elif source_format == 'wide_csv':
+        yield from iter_long_chunks(entry['source'], chunk_size, entry.get('header_row', 2),
+                                    entry.get('encoding', 'latin1'))
+    else:
+        yield from pd.read_csv(
+            entry['source'],
+            header=entry.get('header_row', 0),
+            chunksize=chunk_size,
+            dtype=str,
+            encoding=entry.get('encoding', 'utf-8'),
+            low_memory=False
+        )
+
+
+# Load stage: write the cleaned CORE-level table for one hospital. Output goes
+# to a temporary file renamed on success, so a failed attempt never leaves a
+# partial table behind for the retry to trip over.
+class CsvLoader:
+    columns = CLEANED_COLUMNS
+    suffix = '.csv'
+
+    def __init__(self, output_dir, entry):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, f"{entry['hospital']}{self.suffix}")
+        fd, self.tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+        self.file = os.fdopen(fd, 'w', newline='', encoding='utf-8')
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def commit(self):
+        if self.header:
+            pd.DataFrame(columns=self.columns).to_csv(self.file, index=False)
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+# Columns stored with dictionary encoding; they repeat heavily within a hospital
+DICTIONARY_COLUMNS = ['CODE', 'CODE_TYPE', 'PAYER_NAME', 'PLAN_NAME']
+
+
+def parquet_schema():
+    import pyarrow as pa
+    fields = []
+    for column in CLEANED_COLUMNS:
+        if column in DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in NUMERIC_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+# Load stage writing a Parquet dataset partitioned as STATE=<state>/HOSPITAL_ID=<id>/<hospital>.parquet.
+# Hospitals sharing an ID (the Novant campuses) land in the same partition as
+# separate files. Every chunk becomes a row group with min/max statistics, so
+# readers can skip partitions, row groups and columns they do not need.
+class ParquetLoader:
+    def __init__(self, output_dir, entry):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from None
+
+        partition_dir = os.path.join(output_dir, f"STATE={entry['state']}", f"HOSPITAL_ID={entry['hospital_id']}")
+        os.makedirs(partition_dir, exist_ok=True)
+        self.path = os.path.join(partition_dir, f"{entry['hospital']}.parquet")
+        fd, self.tmp_path = tempfile.mkstemp(dir=partition_dir, suffix='.tmp')
+        os.close(fd)
+        self.schema = parquet_schema()
+        self.writer = pq.ParquetWriter(
+            self.tmp_path,
+            self.schema,
+            compression='zstd',
+            use_dictionary=DICTIONARY_COLUMNS,
+            write_statistics=True
+        )
+
+    def write(self, df):
+        import pyarrow as pa
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def commit(self):
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+# Load stage emitting only what changed since the hospital's last load: rows
+# whose fingerprint is new (ACTION "insert") and rows of the previous snapshot
+# that are gone (ACTION "delete"), in <hospital>.delta.csv. master_loader.py
+# applies the file to MASTER_TABLE with apply_changes().
+class DeltaLoader(CsvLoader):
+    columns = ['ACTION', 'HOSPITAL_ID'] + FINGERPRINT_COLUMNS
+    suffix = '.delta.csv'
+
+    def __init__(self, output_dir, entry):
+        super().__init__(output_dir, entry)
+        self.output_dir = output_dir
+        self.entry = entry
+        self.previous = load_snapshot(output_dir, entry['hospital'])
+        self.previous_fingerprints = self.previous['FINGERPRINT'].to_numpy(dtype=np.uint64)
+        # Sorted once, so each chunk looks its rows up by binary search
+        self.previous_sorted = np.sort(self.previous_fingerprints)
+        self.seen = []
+        self.inserted = []
+
+    def _write_rows(self, rows, action):
+        rows = rows[FINGERPRINT_COLUMNS].copy()
+        rows.insert(0, 'HOSPITAL_ID', self.entry['hospital_id'])
+        rows.insert(0, 'ACTION', action)
+        super().write(rows)
+
+    def _in_previous(self, fingerprints):
+        if not len(self.previous_sorted):
+            return np.zeros(len(fingerprints), dtype=bool)
+        positions = np.searchsorted(self.previous_sorted, fingerprints)
+        positions = np.minimum(positions, len(self.previous_sorted) - 1)
+        return self.previous_sorted[positions] == fingerprints
+
+    # Chunks are only collected here; rows repeated across chunks are dropped
+    # once, in commit()
+    def write(self, df):
+        facts = df[FINGERPRINT_COLUMNS].copy()
+        facts['FINGERPRINT'] = row_fingerprints(facts)
+        facts = facts.drop_duplicates('FINGERPRINT')
+        fingerprints = facts['FINGERPRINT'].to_numpy()
+
+        self.seen.append(fingerprints)
+        new = ~self._in_previous(fingerprints)
+        if new.any():
+            self.inserted.append(facts[new])
+
+    def commit(self):
+        seen = np.unique(np.concatenate(self.seen)) if self.seen else np.array([], dtype=np.uint64)
+        kept = np.isin(self.previous_fingerprints, seen)
+        removed = self.previous[~kept]
+        inserted = pd.concat(self.inserted, ignore_index=True).drop_duplicates('FINGERPRINT') if self.inserted else None
+        if inserted is not None:
+            self._write_rows(inserted, 'insert')
+        if not removed.empty:
+            self._write_rows(removed, 'delete')
+        super().commit()
+
+        snapshot = pd.concat([self.previous[kept]] + ([inserted] if inserted is not None else []), ignore_index=True)
+        save_snapshot(self.output_dir, self.entry['hospital'], snapshot)
+        self.changes = {'inserted': 0 if inserted is None else len(inserted), 'deleted': len(removed)}
+
+
+LOADERS = {
+    'csv': CsvLoader,
+    'parquet': ParquetLoader,
+    'delta': DeltaLoader,
+}
+
+
+# Runs inside a worker process. With previous_digest set, a source file whose
+# content hash is unchanged is skipped without being parsed.
+def process_hospital(entry, output_dir, loader='csv', chunk_size=100000, previous_digest=None):
+    start = time.time()
+    hospital = entry['hospital']
+    digest = file_digest(entry['source'])
+    if digest == previous_digest:
+        return {'hospital': hospital, 'skipped': True, 'sha256': digest, 'seconds': round(time.time() - start, 2)}
+
+    sink = LOADERS[loader](output_dir, entry)
+    rows_in = rows_out = 0
+    try:
+        for chunk_number, chunk in enumerate(read_source(entry, chunk_size), start=1):
+            rows_in += len(chunk)
+            cleaned = clean_chunk(chunk)
+            if not cleaned.empty:
+                sink.write(cleaned)
+                rows_out += len(cleaned)
+            print(f"[{hospital}] chunk {chunk_number}: {rows_in} rows read, {rows_out} kept", flush=True)
+        sink.commit()
+    except BaseException:
+        sink.abort()
+        raise
+    result = {
+        'hospital': hospital,
+        'skipped': False,
+        'sha256': digest,
+        'rows_read': rows_in,
+        'rows_loaded': rows_out,
+        'seconds': round(time.time() - start, 2),
+    }
+    if hasattr(sink, 'changes'):
+        result.update(sink.changes)
+    return result
+
+
+def _describe(result):
+    if result['skipped']:
+        return f"unchanged, skipped in {result['seconds']}s"
+    if 'inserted' in result:
+        return f"{result['inserted']} rows inserted, {result['deleted']} deleted in {result['seconds']}s"
+    return f"{result['rows_loaded']} rows loaded in {result['seconds']}s"
+
+
+# incremental=True records each source file's hash in <output_dir>/ingest_state.json
+# and skips files whose hash matches the last successful run with the same loader
+def run_pipeline(entries, output_dir, workers=None, retries=2, loader='csv', chunk_size=100000,
+                 incremental=False):
+    start = time.time()
+    results, failures = [], []
+    attempts = {entry['hospital']: 0 for entry in entries}
+    state = load_state(output_dir) if incremental else {}
+
+    def previous_digest(hospital):
+        previous = state.get(hospital, {})
+        return previous.get('sha256') if previous.get('loader') == loader else None
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(entry):
+        nonlocal pool
+        attempts[entry['hospital']] += 1
+        args = (process_hospital, entry, output_dir, loader, chunk_size, previous_digest(entry['hospital']))
+        try:
+            return pool.submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and broke the pool: every
+            # hospital still in it fails and is retried in a fresh pool
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers)
+            return pool.submit(*args)
+
+    try:
+        pending = {submit(entry): entry for entry in entries}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = pending.pop(future)
+                hospital = entry['hospital']
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if attempts[hospital] <= retries:
+                        print(f"[{hospital}] attempt {attempts[hospital]} failed ({e}); retrying", flush=True)
+                        pending[submit(entry)] = entry
+                    else:
+                        print(f"[{hospital}] FAILED after {attempts[hospital]} attempts: {e}", flush=True)
+                        failures.append({'hospital': hospital, 'error': str(e)})
+                    continue
+                results.append(result)
+                if incremental and not result['skipped']:
+                    state[hospital] = {'sha256': result['sha256'], 'loader': loader, 'rows': result['rows_loaded']}
+                    save_state(output_dir, state)
+                print(f"[{len(results) + len(failures)}/{len(entries)}] {hospital}: {_describe(result)}", flush=True)
+    finally:
+        pool.shutdown()
+
+    elapsed = round(time.time() - start, 2)
+    skipped = sum(result['skipped'] for result in results)
+    print(f"Pipeline finished in {elapsed}s: {len(results) - skipped} processed, {skipped} unchanged, "
+          f"{len(failures)} failed")
+    return {'results': results, 'failures': failures, 'seconds': elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parse, clean and load every hospital in a manifest in parallel")
+    parser.add_argument('manifest', help="JSON manifest of hospital source files")
+    parser.add_argument('--output-dir', default='cleaned')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--loader', choices=sorted(LOADERS), default='csv')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--only', nargs='*', help="Limit the run to these hospitals")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip source files whose content hash is unchanged since the last run")
+    args = parser.parse_args()
+
+    entries = load_manifest(args.manifest)
+    if args.only:
+        entries = [e for e in entries if e['hospital'] in set(args.only)]
+
+    summary = run_pipeline(entries, args.output_dir, args.workers, args.retries, args.loader, args.chunk_size,
+                           args.incremental)
+    if summary['failures']:
+        raise SystemExit(1)
@@ -0,0 +1,152 @@
+from functools import reduce
+
+from snowflake.snowpark.functions import col, length, lit, to_decimal, trim, upper, when
+
+# Snowpark version of DATA_CLEANING_all_files.ipynb. Each hospital's STAGE table
+# is described by an adapter (which source column feeds which CORE column);
+# every adapter compiles to one SELECT and the SELECTs are combined with
+# UNION ALL, so cleaning all hospitals is a single warehouse job writing one
+# table instead of a notebook cell, a job and a CORE table per hospital.
+
+STAGE_SCHEMA = '"HEALTH_NAV"."STAGE"'
+TARGET_TABLE = '"HEALTH_NAV"."CORE"."CLEANED_CHARGES"'
+
+STRING_COLUMNS = ['DESCRIPTION', 'CODE', 'CODE_TYPE', 'PAYER_NAME', 'PLAN_NAME']
+NUMERIC_COLUMNS = ['STANDARD_CHARGE_DOLLAR', 'STANDARD_CHARGE_PERCENTAGE', 'MINIMUM_CHARGE', 'MAXIMUM_CHARGE']
+
+# CORE column -> STAGE column for each export layout; None means the layout has no such column
+LAYOUTS = {
+    # v2 CSV template, CPT code in the second code slot
+    'v2_code2': {
+        'DESCRIPTION': 'DESCRIPTION',
+        'CODE': '"code|2"',
+        'CODE_TYPE': '"code|2|type"',
+        'PAYER_NAME': 'PAYER_NAME',
+        'PLAN_NAME': 'PLAN_NAME',
+        'STANDARD_CHARGE_DOLLAR': '"standard_charge|negotiated_dollar"',
+        'STANDARD_CHARGE_PERCENTAGE': '"standard_charge|negotiated_percentage"',
+        'MINIMUM_CHARGE': '"standard_charge|min"',
+        'MAXIMUM_CHARGE': '"standard_charge|max"'
+    },
+    # Output of Wide_To_Long_Format.ipynb
+    'long': {
+        'DESCRIPTION': 'DESCRIPTION',
+        'CODE': 'CODE',
+        'CODE_TYPE': '"Code Type"',
+        'PAYER_NAME': '"Payer Name"',
+        'PLAN_NAME': '"Plan Name"',
+        'STANDARD_CHARGE_DOLLAR': '"Standard Charge Dollar"',
+        'STANDARD_CHARGE_PERCENTAGE': '"Standard Charge Percentage"',
+        'MINIMUM_CHARGE': '"Minimum Charge"',
+        'MAXIMUM_CHARGE': '"Maximum Charge"'
+    },
+    # Already in CORE column names
+    'core': {column: column for column in STRING_COLUMNS + NUMERIC_COLUMNS},
+}
+
+
+# Adapter for one STAGE table: a base layout plus per-hospital overrides.
+# Overriding a column with None marks it as not published (e.g. no dollar
+# amount, so it is derived from the percentage of the maximum charge).
+def adapter(hospital_id, layout, table=None, **overrides):
+    columns = dict(LAYOUTS[layout])
+    columns.update(overrides)
+    return {'hospital_id': hospital_id, 'table': table, 'columns': columns}
+
+
+SOURCE_ADAPTERS = {
+    'CAROLINAS_MEDICAL_CENTER': adapter('H0071', 'v2_code2'),
+    'UT_HEALTH_HENDERSON': adapter('100428', 'v2_code2'),
+    'ALEXIUS_MEDICAL_CENTER': adapter('0004994', 'core'),
+    'CHARLOTTE_MECKLENBURG': adapter('H0082', 'core'),
+    'ST_ROSE_DOMINICAN_HOSPITAL_ROSE_DE_LIMA': adapter('659-HOS-40', 'long'),
+    'ST_ROSE_DOMINICAN_HOSPITAL_SIENA': adapter('2969-HOS-41', 'long'),
+    'EDWARD_HOSPITAL': adapter('003905', 'long'),
+    'ELMHURST_MEMORIAL_HOSPITAL': adapter('0005751', 'long'),
+    'LINDEN_OAKS_HOSPITAL': adapter('0005058', 'long'),
+    'TOUCHETTE_REGIONAL_HOSPITAL': adapter('4523', 'long'),
+    'CAROMONT_PART1': adapter('H0105', 'long'),
+    'CAROMONT_PART2': adapter('H0105', 'long'),
+    # Novant publishes the negotiated dollar amount as "Standard Charge"
+    'NOVANT_HEALTH_MINT_HILL_MEDICAL_CENTER': adapter('H0290', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+    'NOVANT_HEALTH_BALLANTYNE_MEDICAL_CENTER': adapter('H0292', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+    'NOVANT_HEALTH_CHARLOTTE_ORTHOPEDIC_HOSPITAL': adapter('H0010', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+    'NOVANT_HEALTH_HUNTERSVILLE_MEDICAL_CENTER': adapter('H0010', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+    'NOVANT_HEALTH_MATTHEWS_MEDICAL_CENTER': adapter('H0270', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+    'NOVANT_HEALTH_PRESBYTERIAN_MEDICAL_CENTER': adapter('H0010', 'long', STANDARD_CHARGE_DOLLAR='"Standard Charge"'),
+}
+
+
+# Blank and "N/A" cells count as missing
+def _missing(column):
+    return column.isNull() | (length(trim(column)) == 0) | (upper(trim(column)) == 'N/A')
+
+
+# One hospital's STAGE table as a lazy Snowpark DataFrame in CORE columns
+def adapter_frame(session, hospital, source):
+    table = f"{STAGE_SCHEMA}.\"{source['table'] or hospital}\""
+    df = session.table(table)
+
+    # Schema lookup is metadata only; fail before anything runs in the warehouse.
+    # A numeric column the table lacks counts as not published (0.0, as the
+    # notebook filled a missing "Standard Charge Dollar"); a missing string
+    # column is an adapter error.
+    columns = dict(source['columns'])
+    available = set(df.schema.names)
+    for column in NUMERIC_COLUMNS:
+        if columns[column] is not None and columns[column] not in available:
+            print(f"{table} has no {columns[column]} column; {column} defaults to 0")
+            columns[column] = None
+    absent = [name for name in columns.values() if name is not None and name not in available]
+    if absent:
+        raise ValueError(
+            f"{table} is missing columns {absent} declared by its adapter.\n"
+            f"Available columns are:\n{sorted(available)}"
+        )
+
+    df = df.filter(upper(trim(col(columns['CODE_TYPE']))) == 'CPT')
+
+    values = {}
+    for column in STRING_COLUMNS:
+        source_col = col(columns[column]) if columns[column] else lit(None)
+        values[column] = when(_missing(source_col), lit('0')).otherwise(trim(source_col))
+    values['CODE_TYPE'] = lit('CPT')
+    for column in NUMERIC_COLUMNS:
+        if columns[column] is None:
+            values[column] = lit(0.0)
+            continue
+        source_col = col(columns[column])
+        values[column] = when(_missing(source_col), lit(0.0)).otherwise(
+            to_decimal(source_col, 38, 2).cast('FLOAT')
+        )
+
+    # Derive the dollar amount from the negotiated percentage of the maximum charge
+    dollar = values['STANDARD_CHARGE_DOLLAR']
+    percent = values['STANDARD_CHARGE_PERCENTAGE']
+    maximum = values['MAXIMUM_CHARGE']
+    values['STANDARD_CHARGE_DOLLAR'] = when(
+        (dollar == 0) & (percent > 0) & (maximum > 0), percent * maximum * 0.01
+    ).otherwise(dollar)
+
+    df = df.select(
+        [lit(hospital).alias('HOSPITAL'), lit(source['hospital_id']).alias('HOSPITAL_ID')] +
+        [values[column].alias(column) for column in STRING_COLUMNS + NUMERIC_COLUMNS]
+    )
+    return df.filter((col('STANDARD_CHARGE_DOLLAR') != 0) | (col('STANDARD_CHARGE_PERCENTAGE') != 0))
+
+
+# Compile the adapters into a single UNION ALL plan; nothing executes yet
+def build_cleaning_plan(session, adapters=None):
+    adapters = adapters or SOURCE_ADAPTERS
+    frames = [adapter_frame(session, hospital, source) for hospital, source in adapters.items()]
+    return reduce(lambda left, right: left.union_all(right), frames)
+
+
+def clean_all(session, adapters=None, target=TARGET_TABLE):
+    plan = build_cleaning_plan(session, adapters)
+    plan.write.save_as_table(target, mode='overwrite')
+    counts = session.table(target).group_by('HOSPITAL').count().collect()
+    for row in sorted(counts, key=lambda r: r['HOSPITAL']):
+        print(f"{row['HOSPITAL']}: {row['COUNT']} rows")
+    print(f"Data successfully written to {target}")
+    return {row['HOSPITAL']: row['COUNT'] for row in counts}
@@ -0,0 +1,143 @@
+import argparse
+import csv
+
+# Streaming version of JSON_To_csv_parsing_Script.ipynb. Instead of json.load()
+# on the whole standardcharges file, ijson walks standard_charge_information one
+# item at a time, so memory stays bounded by a single item plus one write batch.
+
+STANDARD_COLUMNS = [
+    'Description', 'Code', 'Code_Type', 'Minimum_Charge', 'Maximum_Charge', 'Setting',
+    'Payer_Name', 'Plan_Name', 'Standard_Charge_Dollar', 'Standard_Charge_Percentage',
+    'Estimated_Amount', 'Methodology'
+]
+
+MULTI_CODE_COLUMNS = [
+    'Description', 'Code', 'Code_Type', 'Gross_Charge', 'Discounted_Cash', 'Setting',
+    'Billing_Class', 'Modifiers', 'Additional_Notes'
+]
+
+
+# Yield each entry of standard_charge_information without loading the whole file
+def iter_charge_items(path):
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("Streaming JSON parsing requires ijson: pip install ijson") from None
+    with open(path, 'rb') as file:
+        yield from ijson.items(file, 'standard_charge_information.item')
+
+
+# Single code_information layout (first code only, one row per payer)
+def flatten_standard(charge):
+    description = charge.get('description', 'N/A')
+    code_info = (charge.get('code_information') or [{}])[0]
+    code = code_info.get('code', 'N/A')
+    code_type = code_info.get('type', 'N/A')
+
+    for std_charge in charge.get('standard_charges', []):
+        minimum = std_charge.get('minimum', 'N/A')
+        maximum = std_charge.get('maximum', 'N/A')
+        setting = std_charge.get('setting', 'N/A')
+
+        for payer in std_charge.get('payers_information', []):
+            # Handling both pricing methodologies
+            if 'standard_charge_dollar' in payer:
+                charge_dollar = payer.get('standard_charge_dollar', 'N/A')
+                charge_percentage = 'N/A'
+                estimated_amount = 'N/A'
+            elif 'standard_charge_percentage' in payer:
+                charge_dollar = 'N/A'
+                charge_percentage = payer.get('standard_charge_percentage', 'N/A')
+                estimated_amount = payer.get('estimated_amount', 'N/A')
+            else:
+                charge_dollar = 'N/A'
+                charge_percentage = 'N/A'
+                estimated_amount = 'N/A'
+
+            yield {
+                'Description': description,
+                'Code': code,
+                'Code_Type': code_type,
+                'Minimum_Charge': minimum,
+                'Maximum_Charge': maximum,
+                'Setting': setting,
+                'Payer_Name': payer.get('payer_name', 'N/A'),
+                'Plan_Name': payer.get('plan_name', 'N/A'),
+                'Standard_Charge_Dollar': charge_dollar,
+                'Standard_Charge_Percentage': charge_percentage,
+                'Estimated_Amount': estimated_amount,
+                'Methodology': payer.get('methodology', 'N/A')
+            }
+
+
+# University of Chicago layout (every code in code_information, one row per standard charge)
+def flatten_multi_code(charge):
+    description = charge.get('description', 'N/A')
+
+    for code_info in charge.get('code_information', []):
+        code = code_info.get('code', 'N/A')
+        code_type = code_info.get('type', 'N/A')
+
+        for std_charge in charge.get('standard_charges', []):
+            yield {
+                'Description': description,
+                'Code': code,
+                'Code_Type': code_type,
+                'Gross_Charge': std_charge.get('gross_charge', 'N/A'),
+                'Discounted_Cash': std_charge.get('discounted_cash', 'N/A'),
+                'Setting': std_charge.get('setting', 'N/A'),
+                'Billing_Class': std_charge.get('billing_class', 'N/A'),
+                'Modifiers': std_charge.get('modifiers', 'N/A'),
+                'Additional_Notes': std_charge.get('additional_generic_notes', 'N/A')
+            }
+
+
+LAYOUTS = {
+    'standard': (flatten_standard, STANDARD_COLUMNS),
+    'multi_code': (flatten_multi_code, MULTI_CODE_COLUMNS),
+}
+
+
+# Flattened rows for a whole file, one charge item at a time
+def iter_rows(path, layout='standard'):
+    flatten, _ = LAYOUTS[layout]
+    for charge in iter_charge_items(path):
+        yield from flatten(charge)
+
+
+# Yield lists of at most batch_size flattened rows
+def iter_batches(path, layout='standard', batch_size=50000):
+    batch = []
+    for row in iter_rows(path, layout):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert(input_file, output_file, layout='standard', batch_size=50000):
+    _, columns = LAYOUTS[layout]
+    total_rows = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=columns)
+        writer.writeheader()
+        for batch in iter_batches(input_file, layout, batch_size):
+            writer.writerows(batch)
+            total_rows += len(batch)
+            print(f"Wrote {total_rows} rows to {output_file}")
+    return total_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream a standardcharges JSON file into a flat CSV")
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='standard',
+                        help="'standard' for a single code_information entry, 'multi_code' for the UCMC layout")
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = convert(args.input_file, args.output_file, args.layout, args.batch_size)
+    print(f"Data has been written to {args.output_file} ({rows} rows)")
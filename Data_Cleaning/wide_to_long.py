@@ -0,0 +1,160 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Streaming version of Wide_To_Long_Format.ipynb. Wide standardcharges CSVs
+# carry one column per payer/plan/measure ("standard_charge|Aetna|PPO|negotiated_dollar").
+# Instead of melting the whole file and regex-parsing the column name on every
+# melted row, each header is parsed once into (payer, plan, measure) and every
+# chunk is reshaped with NumPy. As in the notebook, a long row is kept only when
+# it has a negotiated dollar charge, and only the first row for each merge key
+# (the base columns plus payer and plan) is kept, across the whole file.
+
+# Measure suffix -> long column name
+WIDE_MEASURES = {
+    'negotiated_dollar': 'Standard Charge Dollar',
+    'negotiated_percentage': 'Standard Charge Percentage',
+    'estimated_amount': 'Estimated Amount',
+    'methodology': 'Methodology',
+}
+
+# A long row is kept only when this is present
+CHARGE_MEASURE = 'Standard Charge Dollar'
+
+BASE_KEYS = ['description', 'setting', 'standard_charge|min', 'standard_charge|max']
+
+# A row repeating these is a duplicate (the notebook's merge keys)
+MERGE_KEYS = ['description', 'code|1', 'code|1|type', 'setting', 'standard_charge|min', 'standard_charge|max',
+              'Payer Name', 'Plan Name']
+
+# Same output as the notebook
+OUTPUT_RENAMES = {
+    'description': 'DESCRIPTION',
+    'code|1': 'CODE',
+    'code|1|type': 'Code Type',
+    'setting': 'SETTING',
+    'standard_charge|min': 'Minimum Charge',
+    'standard_charge|max': 'Maximum Charge'
+}
+
+OUTPUT_COLUMNS = [
+    'DESCRIPTION', 'CODE', 'Code Type', 'Minimum Charge', 'Maximum Charge',
+    'SETTING', 'Payer Name', 'Plan Name',
+    'Standard Charge Dollar', 'Standard Charge Percentage',
+    'Estimated Amount', 'Methodology'
+]
+
+
+# "standard_charge|Payer_Name|Plan_Name|negotiated_dollar" -> ("Payer Name", "Plan Name", "Standard Charge Dollar")
+# v2 files put the estimate first instead: "estimated_amount|Payer_Name|Plan_Name"
+def parse_header(column):
+    parts = column.split('|')
+    if len(parts) == 3 and parts[0] == 'estimated_amount':
+        return parts[1].replace('_', ' '), parts[2].replace('_', ' '), WIDE_MEASURES['estimated_amount']
+    if len(parts) < 4 or parts[0] != 'standard_charge':
+        return None
+    measure = '|'.join(parts[3:])
+    for suffix, name in WIDE_MEASURES.items():
+        if suffix in measure:
+            return parts[1].replace('_', ' '), parts[2].replace('_', ' '), name
+    return None
+
+
+# Everything the reshape needs, worked out once from the header row
+class WideLayout:
+    def __init__(self, columns):
+        self.base_columns = [c for c in columns if c in BASE_KEYS or c.startswith('code|')]
+
+        parsed = {c: parse_header(c) for c in columns}
+        parsed = {c: p for c, p in parsed.items() if p is not None}
+        self.charge_columns = len(parsed)
+        self.pairs = list(dict.fromkeys((payer, plan) for payer, plan, _ in parsed.values()))
+        pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+
+        # measure -> one source column (or None) per payer/plan pair
+        self.measure_columns = {}
+        for column, (payer, plan, measure) in parsed.items():
+            slots = self.measure_columns.setdefault(measure, [None] * len(self.pairs))
+            if slots[pair_index[(payer, plan)]] is None:
+                slots[pair_index[(payer, plan)]] = column
+
+        self.payers = pd.Index(sorted({payer for payer, _ in self.pairs}))
+        self.plans = pd.Index(sorted({plan for _, plan in self.pairs}))
+        self.payer_codes = self.payers.get_indexer([payer for payer, _ in self.pairs])
+        self.plan_codes = self.plans.get_indexer([plan for _, plan in self.pairs])
+
+    # rows x pairs block for one measure; pairs without that measure stay empty
+    def _block(self, chunk, measure):
+        block = np.full((len(chunk), len(self.pairs)), None, dtype=object)
+        for j, column in enumerate(self.measure_columns[measure]):
+            if column is not None:
+                block[:, j] = chunk[column].to_numpy(dtype=object)
+        return block
+
+    def to_long(self, chunk):
+        measures = [m for m in WIDE_MEASURES.values() if m in self.measure_columns]
+        blocks = {m: self._block(chunk, m) for m in measures}
+
+        if CHARGE_MEASURE in blocks:
+            keep = pd.notna(blocks[CHARGE_MEASURE])
+        else:
+            keep = np.zeros((len(chunk), len(self.pairs)), dtype=bool)
+        rows, pairs = np.nonzero(keep)
+
+        long = chunk[self.base_columns].iloc[rows].reset_index(drop=True)
+        long['Payer Name'] = pd.Categorical.from_codes(self.payer_codes[pairs], categories=self.payers)
+        long['Plan Name'] = pd.Categorical.from_codes(self.plan_codes[pairs], categories=self.plans)
+        for measure in measures:
+            long[measure] = blocks[measure][rows, pairs]
+        return long
+
+
+# Yield long-format DataFrames, one per chunk of the wide CSV. Merge keys seen
+# in earlier chunks are remembered in a set of 64-bit hashes, so a duplicate is
+# dropped even when its first occurrence was in another chunk. Each chunk costs
+# one lookup per row, and the set holds one hash per distinct key.
+def iter_long_chunks(path, chunk_size=50000, header_row=2, encoding='latin1'):
+    reader = pd.read_csv(path, header=header_row, chunksize=chunk_size, dtype=str,
+                         encoding=encoding, low_memory=False)
+    layout = None
+    seen = set()
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        if layout is None:
+            layout = WideLayout(list(chunk.columns))
+            print(f"Parsed {layout.charge_columns} charge columns into {len(layout.pairs)} payer/plan pairs")
+        long = layout.to_long(chunk)
+        keys = [c for c in MERGE_KEYS if c in long.columns]
+        hashes = pd.util.hash_pandas_object(long[keys].astype(object), index=False).to_numpy()
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        first[first] = [h not in seen for h in hashes[first].tolist()]
+        seen.update(hashes[first].tolist())
+        yield long[first].reset_index(drop=True)
+
+
+def convert(input_file, output_file, chunk_size=50000, header_row=2, encoding='latin1'):
+    total_rows = 0
+    header = True
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        for long in iter_long_chunks(input_file, chunk_size, header_row, encoding):
+            long = long.rename(columns=OUTPUT_RENAMES)
+            long = long[[c for c in OUTPUT_COLUMNS if c in long.columns]]
+            long.to_csv(out, index=False, header=header)
+            header = False
+            total_rows += len(long)
+            print(f"Wrote {total_rows} rows to {output_file}")
+    return total_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a wide standardcharges CSV to one row per payer/plan")
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--header-row', type=int, default=2)
+    parser.add_argument('--encoding', default='latin1')
+    args = parser.parse_args()
+
+    rows = convert(args.input_file, args.output_file, args.chunk_size, args.header_row, args.encoding)
+    print(f"File saved: {args.output_file} ({rows} rows)")
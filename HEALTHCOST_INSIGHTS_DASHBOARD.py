@@ -1,8 +1,21 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
 import altair as alt
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import numpy as np
-from snowflake.snowpark.context import get_active_session
+from analytics import consistency_category, group_deltas, location_labels, percentile_rank, price_category
+from data_versions import DEFAULT_CHECK_SECONDS, DataVersions, source_version
+from dimensions import DIMENSION_TABLES, DimensionCache
+from fact_store import MANIFEST_FILE, FactStore
+from search_index import SearchIndex, build_search_indexes, is_code
+from query_backend import get_backend
+from query_metrics import LATENCY_BUDGET_SECONDS, get_query_log
+from quantile_sketch import RELATIVE_ACCURACY, quantiles
+from query_scheduler import DEFAULT_MAX_WORKERS, QueryScheduler, with_thread_context
+from query_templates import NAVIGATOR_PAGE_KEY, NAVIGATOR_PAGE_SIZES, QUERY_TEMPLATES, bind, navigator_cursor, navigator_filters
+from result_cache import DEFAULT_CACHE_DIR, ResultCache
 
 # Set page configuration
 st.set_page_config(
@@ -68,81 +81,228 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Establish connection to Snowflake using Snowpark
+# Connect to the query backend (Snowflake by default, or the embedded local engine
+# when HEALTH_NAV_BACKEND=local)
 @st.cache_resource
-def get_snowpark_session():
-    return get_active_session()
+def get_query_backend():
+    return get_backend()
 
-# Get the session
-session = get_snowpark_session()
+# Get the backend
+backend = get_query_backend()
 
-# Function to execute Snowflake queries with proper error handling
-def run_query(query):
+# Data version stamps of the tables (data_versions.py), re-read every
+# HEALTH_NAV_VERSION_CHECK_SECONDS. Every cache below is keyed on the stamps of
+# the tables its results come from, so a load invalidates exactly the results
+# that read the table it changed; only unstamped tables expire on a timer.
+@st.cache_resource
+def get_data_versions():
+    return DataVersions(backend, float(os.environ.get("HEALTH_NAV_VERSION_CHECK_SECONDS", DEFAULT_CHECK_SECONDS)))
+
+data_versions = get_data_versions()
+
+# Stamp of the tables a query template reads
+def template_version(name):
+    return data_versions.stamp(QUERY_TEMPLATES[name].tables)
+
+# Shared result cache for template queries (in-process LRU plus an on-disk tier
+# that every Streamlit worker pointed at HEALTH_NAV_CACHE_DIR can read)
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(
+        memory_bytes=int(os.environ.get("HEALTH_NAV_CACHE_MB", "256")) * 1024 * 1024,
+        disk_dir=os.environ.get("HEALTH_NAV_CACHE_DIR", DEFAULT_CACHE_DIR),
+        namespace=backend.name
+    )
+
+result_cache = get_result_cache()
+
+# Timing, size and cache outcome of every template query, shared by all sessions
+# (shown on the diagnostics page; also written to HEALTH_NAV_QUERY_LOG if set)
+@st.cache_resource
+def get_query_metrics():
+    return get_query_log(backend.name)
+
+query_log = get_query_metrics()
+
+# Dashboard page the current run's queries are recorded under
+current_page = None
+
+# Execute a named query template from query_templates.py with bind parameters,
+# serving repeated requests from the result cache until a table it reads gets
+# a new data version. Errors are raised, so this is safe to run on a scheduler
+# thread.
+def execute_template(name, **params):
+    query = bind(name, **params)
+    start = time.perf_counter()
+    key = f"{query.key}-{data_versions.stamp(query.tables)}"
+    result = result_cache.get(key)
+    if result is not None:
+        query_log.record(query, current_page, "hit", (time.perf_counter() - start) * 1000, result)
+        return result
     try:
-        if query.strip().upper().startswith("SELECT"):
-            return session.sql(query).to_pandas()
-        else:
-            result = session.sql(query).collect()
-            if result:
-                data = [row.asDict() for row in result]
-                return pd.DataFrame(data)
-            return pd.DataFrame()
+        result, stats = backend.run_measured(query.sql, query.params)
+    except Exception as e:
+        query_log.record(query, current_page, "miss", (time.perf_counter() - start) * 1000, error=str(e))
+        raise
+    query_log.record(query, current_page, "miss", (time.perf_counter() - start) * 1000, result, stats)
+    result_cache.put(key, result)
+    return result
+
+# execute_template with errors shown on the page
+def run_template(name, **params):
+    try:
+        return execute_template(name, **params)
     except Exception as e:
         st.error(f"Query execution error: {str(e)}")
         return pd.DataFrame()
 
-# Tables
-master_table = "HEALTH_NAV.CORE.MASTER_TABLE"
-hospital_table = "HEALTH_NAV.CORE.HOSPITAL_DATA"
-provider_table = "HEALTH_NAV.CORE.INSURANCE_PROVIDERS"
-plan_table = "HEALTH_NAV.CORE.INSURANCE_PLANS"
-service_code_table = "HEALTH_NAV.CORE.SERVICE_CODES"
+# The thread attribute Streamlit keeps a thread's ScriptRunContext in
+SCRIPT_RUN_CTX_ATTR = "streamlit_script_run_ctx"
+
+# One bounded thread pool, shared by all sessions, for a page's independent queries
+@st.cache_resource
+def get_query_scheduler():
+    return QueryScheduler(int(os.environ.get("HEALTH_NAV_QUERY_WORKERS", DEFAULT_MAX_WORKERS)))
+
+# Open a batch of concurrent queries; tasks run with this session's Streamlit
+# context so cached functions behave as they do on the page thread
+def query_batch():
+    return get_query_scheduler().batch(
+        with_thread_context(add_script_run_ctx, get_script_run_ctx(), SCRIPT_RUN_CTX_ATTR)
+    )
+
+# Wait for one batched query; a failed query shows the same error as run_template
+def batch_result(batch, key):
+    try:
+        return batch.result(key)
+    except Exception as e:
+        st.error(f"Query execution error: {str(e)}")
+        return pd.DataFrame()
+
+# Call a query function (e.g. get_states) on the page thread, showing errors
+# the same way
+def call_query(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        st.error(f"Query execution error: {str(e)}")
+        return pd.DataFrame()
+
+# Dimension tables held in memory for client-side labeling of fact rows,
+# re-read when one of them gets a new data version
+@st.cache_resource(max_entries=1)
+def load_dimensions(version):
+    return DimensionCache(backend.run)
+
+def get_dimensions():
+    return load_dimensions(data_versions.stamp(DIMENSION_TABLES))
+
+# Optional memory-mapped copy of MASTER_TABLE (fact_store.py) that answers
+# Navigator lookups without a query; HEALTH_NAV_FACT_STORE names its directory.
+# It is reopened when fact_store.py rebuilds the directory.
+@st.cache_resource(max_entries=1)
+def load_fact_store(path, version):
+    return FactStore.load(path)
+
+def get_fact_store():
+    path = os.environ.get("HEALTH_NAV_FACT_STORE")
+    if not path:
+        return None
+    manifest = os.path.join(path, MANIFEST_FILE)
+    return load_fact_store(path, source_version(manifest) if os.path.exists(manifest) else None)
+
+# Answer a template from the fact store, recorded in the query log like a query
+def fact_store_result(name, answer, **params):
+    start = time.perf_counter()
+    result = answer()
+    query_log.record(bind(name, **params), current_page, "fact_store", (time.perf_counter() - start) * 1000, result)
+    return result
+
+# The cheapest offers anywhere for one CPT code
+def navigator_cheapest(code):
+    store = get_fact_store()
+    if store is not None:
+        return fact_store_result("navigator_cheapest", lambda: store.cheapest(code), code=code)
+    return run_template("navigator_cheapest", code=code)
+
+# Number of priced offers for one CPT code at the given hospitals, optionally
+# limited to some payers and plans (None for any)
+def navigator_count(code, hospital_ids, provider_ids=None, plan_ids=None):
+    filters = navigator_filters(provider_ids, plan_ids)
+    store = get_fact_store()
+    if store is not None:
+        count = fact_store_result(
+            "navigator_hospitals_count",
+            lambda: pd.DataFrame({"ROW_COUNT": [store.count(code, hospital_ids, provider_ids, plan_ids)]}),
+            code=code, hospital_ids=hospital_ids, **filters
+        )
+    else:
+        count = run_template("navigator_hospitals_count", code=code, hospital_ids=hospital_ids, **filters)
+    return int(count["ROW_COUNT"].iloc[0]) if not count.empty else 0
+
+# One page of Navigator fact rows for one CPT code at the given hospitals, in
+# charge order, starting after the cursor of the previous page (None for the
+# first page). Up to page_size + 1 rows come back; the extra one only says
+# that a next page exists.
+def navigator_page(code, hospital_ids, page_size, after=None, provider_ids=None, plan_ids=None):
+    cursor = dict(zip([param for _, param in NAVIGATOR_PAGE_KEY], after or [None] * len(NAVIGATOR_PAGE_KEY)))
+    filters = navigator_filters(provider_ids, plan_ids)
+    name = f"navigator_hospitals_page_{page_size}"
+    store = get_fact_store()
+    if store is not None:
+        return fact_store_result(
+            name, lambda: store.page(code, hospital_ids, page_size + 1, after, provider_ids, plan_ids),
+            code=code, hospital_ids=hospital_ids, **cursor, **filters
+        )
+    return run_template(name, code=code, hospital_ids=hospital_ids, **cursor, **filters)
+
+# The cursor a page leaves off at: the sort key of its last row
+def page_cursor(page):
+    return navigator_cursor(page.iloc[-1])
+
+# Cache function to get all states from the data (version only keys the cache)
+@st.cache_data
+def load_states(version):
+    return execute_template("states")
 
-# Cache function to get all states from the data
-@st.cache_data(ttl=3600)
 def get_states():
-    query = f"""
-    SELECT DISTINCT STATE
-    FROM {hospital_table}
-    WHERE STATE IS NOT NULL
-    ORDER BY STATE
-    """
-    return run_query(query)
+    return load_states(template_version("states"))
 
 # Cache function to get cities by state
-@st.cache_data(ttl=3600)
+@st.cache_data
+def load_cities_by_state(state, version):
+    return execute_template("cities_by_state", state=state if state != "All States" else None)
+
 def get_cities_by_state(state=None):
-    if state and state != "All States":
-        query = f"""
-        SELECT DISTINCT CITY
-        FROM {hospital_table}
-        WHERE STATE = '{state}'
-        AND CITY IS NOT NULL
-        ORDER BY CITY
-        """
-    else:
-        query = f"""
-        SELECT DISTINCT CITY
-        FROM {hospital_table}
-        WHERE CITY IS NOT NULL
-        ORDER BY CITY
-        """
-    return run_query(query)
-
-# Cache function to get available CPT codes
-@st.cache_data(ttl=3600)
-def get_cpt_codes():
-    query = f"""
-    SELECT DISTINCT CODE, DESCRIPTION
-    FROM {service_code_table}
-    ORDER BY CODE
-    """
-    return run_query(query)
+    return load_cities_by_state(state, template_version("cities_by_state"))
+
+# Typeahead indexes over CPT codes, hospitals, cities, payers and plans, rebuilt
+# with the dimension cache
+@st.cache_resource(max_entries=1)
+def load_search_indexes(version):
+    return build_search_indexes(load_dimensions(version))
+
+def get_search_indexes():
+    return load_search_indexes(data_versions.stamp(DIMENSION_TABLES))
+
+# One search index ("cpt", "hospital", "city", "payer" or "plan"), showing
+# errors like call_query; a failed build gives an empty index
+def get_search_index(name):
+    try:
+        return get_search_indexes()[name]
+    except Exception as e:
+        st.error(f"Query execution error: {str(e)}")
+        return SearchIndex([], [])
 
 # Sidebar navigation
 st.sidebar.title("Navigation")
+# The query diagnostics page is hidden unless the URL carries ?diagnostics=1
+dashboard_pages = ["Hospital Price Variation", "Insurance Provider Comparison", "Healthcare Cost Explorer", "Health Cost Navigator"]
+if st.query_params.get("diagnostics") == "1":
+    dashboard_pages.append("Query Diagnostics")
 app_mode = st.sidebar.radio("Select Dashboard", 
-    options=["Hospital Price Variation", "Insurance Provider Comparison", "Healthcare Cost Explorer", "Health Cost Navigator"])
+    options=dashboard_pages)
+current_page = app_mode
 
 if app_mode == "Hospital Price Variation":
     # Display header for this section
@@ -152,8 +312,14 @@ if app_mode == "Hospital Price Variation":
     # Sidebar for filters
     st.sidebar.header("Filters")
 
+    # States and the cities of the current selection load together
+    batch = query_batch()
+    prefetched_state = st.session_state.get("price_variation_state", "All States")
+    batch.add("states", get_states)
+    batch.add("cities", get_cities_by_state, prefetched_state)
+
     # State selection
-    states_df = get_states()
+    states_df = batch_result(batch, "states")
     state_options = ["All States"] + states_df["STATE"].tolist() if not states_df.empty else ["All States"]
     selected_state = st.sidebar.selectbox(
         "Select State:",
@@ -161,8 +327,11 @@ if app_mode == "Hospital Price Variation":
         key="price_variation_state"
     )
 
-    # Get cities for selected state
-    cities_df = get_cities_by_state(selected_state if selected_state != "All States" else None)
+    # Get cities for selected state (already loading unless the selection just changed)
+    if selected_state == prefetched_state:
+        cities_df = batch_result(batch, "cities")
+    else:
+        cities_df = call_query(get_cities_by_state, selected_state)
     city_options = ["All Cities"] + cities_df["CITY"].tolist() if not cities_df.empty else ["All Cities"]
 
     # City selection
@@ -193,83 +362,40 @@ if app_mode == "Hospital Price Variation":
 
     # Main area for displaying results
     if apply_filters:
-        # Build state and city filter conditions
-        state_condition = ""
-        if selected_state and selected_state != "All States":
-            state_condition = f"AND h.STATE = '{selected_state}'"
-        else:
-            state_condition = "AND h.STATE IN ('NV', 'IL', 'NC')"
-        
-        city_condition = ""
-        if selected_city and selected_city != "All Cities":
-            city_condition = f"AND h.CITY = '{selected_city}'"
+        # Build state and city filters (None means no filter)
+        state_filter = selected_state if selected_state and selected_state != "All States" else None
+        city_filter = selected_city if selected_city and selected_city != "All Cities" else None
         
         # Query to calculate price variation by hospital
         location_display = f"in {selected_state}" if selected_state != "All States" else "in Nevada, Illinois, and North Carolina"
         st.info(f"Analyzing price variation for hospitals {location_display}...")
         
-        # Different SQL calculation based on the selected variation metric
+        # Every variation metric is returned by the query; pick the selected one
         if variation_metric == "Coefficient of Variation":
-            variation_sql = "STDDEV(m.STANDARD_CHARGE_DOLLAR) / NULLIF(AVG(m.STANDARD_CHARGE_DOLLAR), 0) * 100 as PRICE_VARIATION"
-            sort_order = "ASC"  # Lower CV is better
+            variation_column = "COEFFICIENT_OF_VARIATION"
             explanation = "Coefficient of Variation (CV) measures the ratio of the standard deviation to the mean, expressed as a percentage. Lower values indicate more consistent pricing."
         elif variation_metric == "Standard Deviation":
-            variation_sql = "STDDEV(m.STANDARD_CHARGE_DOLLAR) as PRICE_VARIATION"
-            sort_order = "ASC"  # Lower SD is better
+            variation_column = "STANDARD_DEVIATION"
             explanation = "Standard Deviation measures the amount of dispersion in pricing. Lower values indicate less spread in prices."
         else:  # Price Range
-            variation_sql = "MAX(m.STANDARD_CHARGE_DOLLAR) - MIN(m.STANDARD_CHARGE_DOLLAR) as PRICE_VARIATION"
-            sort_order = "ASC"  # Lower range is better
+            variation_column = "PRICE_RANGE"
             explanation = "Price Range is the difference between the highest and lowest prices. Lower values indicate more consistent pricing."
         
-        # Query to get hospitals and their price variation
-        hospital_variation_query = f"""
-        WITH hospital_procedures AS (
-            SELECT 
-                h.HOSPITAL_ID,
-                h.HOSPITAL_NAME,
-                h.CITY,
-                h.STATE,
-                COUNT(DISTINCT m.CODE) as PROCEDURE_COUNT
-            FROM 
-                {hospital_table} h
-            JOIN 
-                {master_table} m ON h.HOSPITAL_ID = m.HOSPITAL_ID
-            WHERE 
-                m.STANDARD_CHARGE_DOLLAR > 0
-                {state_condition}
-                {city_condition}
-            GROUP BY 
-                h.HOSPITAL_ID, h.HOSPITAL_NAME, h.CITY, h.STATE
-            HAVING 
-                PROCEDURE_COUNT >= {min_procedures}
+        # Query the precomputed per-hospital rollup instead of rescanning MASTER_TABLE
+        hospital_variation_df = run_template(
+            "hospital_variation",
+            min_procedures=min_procedures,
+            state=state_filter,
+            city=city_filter
         )
         
-        SELECT 
-            hp.HOSPITAL_ID,
-            hp.HOSPITAL_NAME,
-            hp.CITY,
-            hp.STATE,
-            hp.PROCEDURE_COUNT,
-            {variation_sql},
-            AVG(m.STANDARD_CHARGE_DOLLAR) as AVG_PRICE,
-            MIN(m.STANDARD_CHARGE_DOLLAR) as MIN_PRICE,
-            MAX(m.STANDARD_CHARGE_DOLLAR) as MAX_PRICE,
-            COUNT(DISTINCT m.CODE) as UNIQUE_CODES
-        FROM 
-            hospital_procedures hp
-        JOIN 
-            {master_table} m ON hp.HOSPITAL_ID = m.HOSPITAL_ID
-        WHERE 
-            m.STANDARD_CHARGE_DOLLAR > 0
-        GROUP BY 
-            hp.HOSPITAL_ID, hp.HOSPITAL_NAME, hp.CITY, hp.STATE, hp.PROCEDURE_COUNT
-        ORDER BY 
-            PRICE_VARIATION {sort_order}
-        """
-        
-        # Execute query
-        hospital_variation_df = run_query(hospital_variation_query)
+        if not hospital_variation_df.empty:
+            # Lower variation is better, so sort ascending
+            hospital_variation_df['PRICE_VARIATION'] = hospital_variation_df[variation_column]
+            hospital_variation_df = hospital_variation_df[
+                ['HOSPITAL_ID', 'HOSPITAL_NAME', 'CITY', 'STATE', 'PROCEDURE_COUNT', 'PRICE_VARIATION',
+                 'AVG_PRICE', 'MIN_PRICE', 'MAX_PRICE', 'UNIQUE_CODES']
+            ].sort_values('PRICE_VARIATION').reset_index(drop=True)
         
         # Check if data was returned
         if hospital_variation_df.empty:
@@ -277,18 +403,12 @@ if app_mode == "Hospital Price Variation":
         else:
             # Calculate score for each hospital (lower variation = higher score)
             # Convert to percentile ranking (higher is better)
-            hospital_variation_df['PERCENTILE_RANK'] = 100 - (hospital_variation_df['PRICE_VARIATION'].rank(pct=True) * 100)
+            hospital_variation_df['PERCENTILE_RANK'] = percentile_rank(
+                hospital_variation_df['PRICE_VARIATION'], higher_is_better=False
+            )
             
             # Add a scoring column
-            def get_score_category(percentile):
-                if percentile >= 80:
-                    return "High Consistency"
-                elif percentile >= 50:
-                    return "Medium Consistency"
-                else:
-                    return "Low Consistency"
-            
-            hospital_variation_df['SCORE_CATEGORY'] = hospital_variation_df['PERCENTILE_RANK'].apply(get_score_category)
+            hospital_variation_df['SCORE_CATEGORY'] = consistency_category(hospital_variation_df['PERCENTILE_RANK'])
             
             # Calculate summary metrics
             total_hospitals = len(hospital_variation_df)
@@ -397,11 +517,11 @@ if app_mode == "Hospital Price Variation":
                 # Add a search box for filtering the hospitals
                 hospital_search = st.text_input("Search for a specific hospital:")
                 
-                # Filter the data based on search
+                # Filter the data based on search: the hospitals whose names
+                # match in the hospital search index, typos included
                 if hospital_search:
-                    filtered_df = display_df[
-                        display_df['HOSPITAL_NAME'].str.contains(hospital_search, case=False)
-                    ]
+                    hospital_ids = get_search_index("hospital").matching_keys(hospital_search)
+                    filtered_df = display_df[comparison_df['HOSPITAL_ID'].isin(hospital_ids)]
                 else:
                     filtered_df = display_df
                 
@@ -479,49 +599,18 @@ if app_mode == "Hospital Price Variation":
             if selected_hospital:
                 selected_hospital_id = hospital_variation_df[hospital_variation_df['HOSPITAL_NAME'] == selected_hospital]['HOSPITAL_ID'].iloc[0]
                 
-                # Query to get procedure-level prices for the selected hospital
-                procedure_query = f"""
-                SELECT 
-                    s.CODE,
-                    s.DESCRIPTION,
-                    m.STANDARD_CHARGE_DOLLAR as PRICE,
-                    AVG(m2.STANDARD_CHARGE_DOLLAR) OVER (PARTITION BY s.CODE) as AVG_PRICE_ACROSS_HOSPITALS,
-                    (m.STANDARD_CHARGE_DOLLAR - AVG(m2.STANDARD_CHARGE_DOLLAR) OVER (PARTITION BY s.CODE)) / 
-                        NULLIF(AVG(m2.STANDARD_CHARGE_DOLLAR) OVER (PARTITION BY s.CODE), 0) * 100 as PERCENT_DIFF_FROM_AVG
-                FROM 
-                    {master_table} m
-                JOIN 
-                    {service_code_table} s ON m.CODE = s.CODE
-                JOIN 
-                    {master_table} m2 ON s.CODE = m2.CODE AND m2.STANDARD_CHARGE_DOLLAR > 0
-                WHERE 
-                    m.HOSPITAL_ID = '{selected_hospital_id}'
-                    AND m.STANDARD_CHARGE_DOLLAR > 0
-                ORDER BY 
-                    ABS(PERCENT_DIFF_FROM_AVG) DESC
-                """
-                
-                procedure_df = run_query(procedure_query)
+                # Query to get procedure-level prices for the selected hospital,
+                # compared with the per-CODE market prices in the CPT price index
+                procedure_df = run_template("procedure_deep_dive", hospital_id=selected_hospital_id)
                 
                 if not procedure_df.empty:
                     # Add columns to categorize price differences
-                    def get_price_category(pct_diff):
-                        if pct_diff < -20:
-                            return "Significantly Lower"
-                        elif pct_diff < -5:
-                            return "Moderately Lower"
-                        elif pct_diff <= 5:
-                            return "Comparable"
-                        elif pct_diff <= 20:
-                            return "Moderately Higher"
-                        else:
-                            return "Significantly Higher"
+                    procedure_df['PRICE_CATEGORY'] = price_category(procedure_df['PERCENT_DIFF_FROM_AVG'])
                     
-                    procedure_df['PRICE_CATEGORY'] = procedure_df['PERCENT_DIFF_FROM_AVG'].apply(get_price_category)
-                    
-                    # Summary of procedure pricing
+                    # Summary of procedure pricing (categories with no procedures are left out)
                     category_counts = procedure_df['PRICE_CATEGORY'].value_counts().reset_index()
                     category_counts.columns = ['Category', 'Count']
+                    category_counts = category_counts[category_counts['Count'] > 0]
                     
                     # Create a horizontal bar chart for price categories
                     category_order = ["Significantly Lower", "Moderately Lower", "Comparable", 
@@ -589,8 +678,21 @@ elif app_mode == "Insurance Provider Comparison":
     # Create a container for filters to keep layout clean
     filter_container = st.container()
 
+    # States, the cities of the current state and the chart for the current
+    # filters load together
+    prefetched_state = st.session_state.get("provider_comp_state", "All States")
+    prefetched_city = st.session_state.get("provider_comp_city", "All Cities")
+    batch = query_batch()
+    batch.add("states", get_states)
+    batch.add("cities", get_cities_by_state, prefetched_state)
+    batch.add(
+        "results", execute_template, "provider_comparison",
+        state=prefetched_state if prefetched_state != "All States" else None,
+        city=prefetched_city if prefetched_city != "All Cities" else None
+    )
+
     # Retrieve state data
-    states_df = get_states()
+    states_df = batch_result(batch, "states")
 
     # Create filters in the designated container
     with filter_container:
@@ -607,10 +709,10 @@ elif app_mode == "Insurance Provider Comparison":
                 selected_state = "All States"
         
         with col2:
-            if selected_state != "All States":
-                cities_df = get_cities_by_state(selected_state)
+            if selected_state == prefetched_state:
+                cities_df = batch_result(batch, "cities")
             else:
-                cities_df = get_cities_by_state()
+                cities_df = call_query(get_cities_by_state, selected_state)
             
             if not cities_df.empty:
                 selected_city = st.selectbox(
@@ -624,40 +726,16 @@ elif app_mode == "Insurance Provider Comparison":
     # Add spacing
     st.markdown("---")
 
-    # Build query conditions
-    state_condition = ""
-    if selected_state != "All States":
-        state_condition = f"AND h.STATE = '{selected_state}'"
-
-    city_condition = ""
-    if selected_city != "All Cities":
-        city_condition = f"AND h.CITY = '{selected_city}'"
-
-    # Query for average prices
-    query = f"""
-    SELECT 
-        p.PAYER_NAME,
-        AVG(m.STANDARD_CHARGE_DOLLAR) as AVG_CHARGE
-    FROM 
-        {master_table} m
-    JOIN 
-        {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
-    JOIN 
-        {provider_table} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
-    JOIN 
-        {service_code_table} s ON m.CODE = s.CODE
-    WHERE 
-        m.STANDARD_CHARGE_DOLLAR > 0
-        {state_condition}
-        {city_condition}
-    GROUP BY 
-        p.PAYER_NAME
-    ORDER BY 
-        AVG_CHARGE DESC
-    """
-
-    # Execute the query
-    results = run_query(query)
+    # Query for average prices; the prefetched result is only stale when a
+    # filter changed during this run
+    if (selected_state, selected_city) == (prefetched_state, prefetched_city):
+        results = batch_result(batch, "results")
+    else:
+        results = run_template(
+            "provider_comparison",
+            state=selected_state if selected_state != "All States" else None,
+            city=selected_city if selected_city != "All Cities" else None
+        )
 
     # Check for results and render chart
     if results.empty:
@@ -708,25 +786,31 @@ elif app_mode == "Healthcare Cost Explorer":
     st.markdown('<div class="main-header">Healthcare Cost Explorer</div>', unsafe_allow_html=True)
     st.markdown('<div class="sub-header">Analyze medical procedure costs across cities</div>', unsafe_allow_html=True)
 
-    # Load CPT codes and states
-    cpt_codes_df = get_cpt_codes()
-    states_df = get_states()
+    # Load CPT search index and states
+    cpt_index = get_search_index("cpt")
+    states_df = call_query(get_states)
 
     # Sidebar for filters
     st.sidebar.header("Filters")
 
-    # CPT code selection (with description)
-    if not cpt_codes_df.empty:
+    # CPT code selection (with description), narrowed to the best matches for the search text
+    if len(cpt_index):
+        cpt_search = st.sidebar.text_input("Search Medical Procedure (code or description):",
+                                           key="cost_explorer_cpt_search")
+        cpt_matches = cpt_index.search(cpt_search, limit=50) if cpt_search.strip() else cpt_index.head(50)
+
         # Format CPT codes with descriptions for the dropdown
-        cpt_options = [f"{row['CODE']} - {row['DESCRIPTION'][:50]}..." if len(row['DESCRIPTION']) > 50 
-                      else f"{row['CODE']} - {row['DESCRIPTION']}" 
-                      for _, row in cpt_codes_df.iterrows()]
+        cpt_options = [f"{code} - {description[:50]}..." if len(description) > 50
+                      else f"{code} - {description}"
+                      for code, description in cpt_matches]
         
         selected_cpt_option = st.sidebar.selectbox(
             "Select Medical Procedure (CPT Code):",
             options=cpt_options,
             key="cost_explorer_cpt"
         )
+        if not cpt_options:
+            st.sidebar.warning("No procedures match your search.")
         
         # Extract just the code from the selection
         selected_cpt = selected_cpt_option.split(" - ")[0].strip() if selected_cpt_option else None
@@ -752,77 +836,52 @@ elif app_mode == "Healthcare Cost Explorer":
         key="cost_explorer_metric"
     )
     
-    # Set standard charge as default
-    charge_column = "STANDARD_CHARGE_DOLLAR"
-    
     # Apply filters button
     apply_filters = st.sidebar.button("Apply Filters", use_container_width=True, key="cost_explorer_apply")
     
     # Main area for displaying results
     if apply_filters and selected_cpt:
+        # The procedure name and the city metrics are independent, so both run at once.
+        # Medians are merged from the per-hospital quantile sketches.
+        if selected_metric == "Median":
+            metric_template = "city_charge_sketches"
+        else:
+            metric_template = f"city_metrics_{selected_metric.lower()}"
+        batch = query_batch()
+        batch.add("description", execute_template, "cpt_description", code=selected_cpt)
+        batch.add(
+            "city_metrics", execute_template, metric_template,
+            code=selected_cpt,
+            state=selected_state if selected_state and selected_state != "All States" else None
+        )
+
         # Get the name of the CPT code for display
-        cpt_description_query = f"""
-        SELECT DESCRIPTION 
-        FROM {service_code_table} 
-        WHERE CODE = '{selected_cpt}'
-        LIMIT 1
-        """
-        cpt_desc_df = run_query(cpt_description_query)
+        cpt_desc_df = batch_result(batch, "description")
         cpt_description = cpt_desc_df.iloc[0]['DESCRIPTION'] if not cpt_desc_df.empty else "Unknown Procedure"
         
         # Display procedure information
         st.subheader(f"Analysis for: {cpt_description} (CPT {selected_cpt})")
         
-        # Build state filter condition
-        state_condition = ""
-        if selected_state and selected_state != "All States":
-            state_condition = f"AND h.STATE = '{selected_state}'"
-        
-        # Query to get city-level metrics
-        metric_sql = ""
-        if selected_metric == "Average":
-            metric_sql = f"AVG({charge_column})"
-        elif selected_metric == "Median":
-            metric_sql = f"MEDIAN({charge_column})"
-        elif selected_metric == "Minimum":
-            metric_sql = f"MIN({charge_column})"
-        elif selected_metric == "Maximum":
-            metric_sql = f"MAX({charge_column})"
-        
-        city_metrics_query = f"""
-        SELECT 
-            h.CITY,
-            h.STATE,
-            {metric_sql} as PRICE_METRIC,
-            COUNT(*) as NUM_PROVIDERS
-        FROM 
-            {master_table} m
-        JOIN 
-            {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
-        JOIN 
-            {service_code_table} s ON m.CODE = s.CODE
-        WHERE 
-            s.CODE = '{selected_cpt}'
-            AND h.CITY IS NOT NULL
-            AND h.STATE IS NOT NULL
-            AND {charge_column} > 0
-            {state_condition}
-        GROUP BY 
-            h.CITY, h.STATE
-        ORDER BY 
-            PRICE_METRIC DESC
-        """
-        
         # Execute query
         st.info(f"Calculating {selected_metric} Standard Charge by city...")
-        city_metrics_df = run_query(city_metrics_query)
+        city_metrics_df = batch_result(batch, "city_metrics")
+
+        # Sketch buckets become median and p10/p90 per city, and merged across
+        # every city for the headline figure
+        area_quantiles = None
+        if selected_metric == "Median" and not city_metrics_df.empty:
+            sketches = city_metrics_df
+            city_metrics_df = quantiles(sketches, by=["CITY", "STATE"]).rename(
+                columns={"MEDIAN_CHARGE": "PRICE_METRIC", "CHARGE_COUNT": "NUM_PROVIDERS"}
+            ).sort_values("PRICE_METRIC", ascending=False, kind="stable").reset_index(drop=True)
+            area_quantiles = quantiles(sketches).iloc[0]
         
         # Check if data was returned
         if city_metrics_df.empty:
             st.warning(f"No data found for CPT code {selected_cpt} in the selected area.")
         else:
             # Format city name with state for display
-            city_metrics_df['CITY_STATE'] = city_metrics_df.apply(lambda x: f"{x['CITY']}, {x['STATE']}", axis=1)
+            city_metrics_df['CITY_STATE'] = location_labels(city_metrics_df['CITY'], city_metrics_df['STATE'])
             
             # Show summary metrics
             col1, col2, col3 = st.columns(3)
@@ -836,13 +895,22 @@ elif app_mode == "Healthcare Cost Explorer":
             num_cities = len(city_metrics_df)
             
             with col1:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-label">National {selected_metric}</div>
-                    <div class="metric-value">${overall_avg:,.2f}</div>
-                    <div>Based on {num_cities} cities</div>
-                </div>
-                """, unsafe_allow_html=True)
+                if area_quantiles is not None:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-label">National {selected_metric}</div>
+                        <div class="metric-value">${area_quantiles['MEDIAN_CHARGE']:,.2f}</div>
+                        <div>p10 ${area_quantiles['P10_CHARGE']:,.2f} - p90 ${area_quantiles['P90_CHARGE']:,.2f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-label">National {selected_metric}</div>
+                        <div class="metric-value">${overall_avg:,.2f}</div>
+                        <div>Based on {num_cities} cities</div>
+                    </div>
+                    """, unsafe_allow_html=True)
             
             with col2:
                 st.markdown(f"""
@@ -862,6 +930,10 @@ elif app_mode == "Healthcare Cost Explorer":
                 </div>
                 """, unsafe_allow_html=True)
             
+            if area_quantiles is not None:
+                st.caption(f"Medians and p10/p90 bands are estimated from quantile sketches and are within "
+                           f"{RELATIVE_ACCURACY:.0%} of a charge at that percentile.")
+
             st.markdown("<hr>", unsafe_allow_html=True)
             
             # Tabs for different visualizations - removed city map tab
@@ -871,20 +943,37 @@ elif app_mode == "Healthcare Cost Explorer":
                 # Create a bar chart of prices by city, limit to top 30 for readability
                 top_cities = city_metrics_df.head(30)
                 
+                tooltip = [
+                    alt.Tooltip('CITY_STATE:N', title='City'),
+                    alt.Tooltip('PRICE_METRIC:Q', title=f'{selected_metric} Price', format='$,.2f'),
+                    alt.Tooltip('NUM_PROVIDERS:Q', title='Number of Providers')
+                ]
+                if area_quantiles is not None:
+                    tooltip += [
+                        alt.Tooltip('P10_CHARGE:Q', title='10th Percentile', format='$,.2f'),
+                        alt.Tooltip('P90_CHARGE:Q', title='90th Percentile', format='$,.2f')
+                    ]
+                city_order = top_cities['CITY_STATE'].tolist()
                 bar_chart = alt.Chart(top_cities).mark_bar().encode(
                     x=alt.X('PRICE_METRIC:Q', title=f'{selected_metric} Price ($)'),
-                    y=alt.Y('CITY_STATE:N', title='City', sort='-x'),
+                    y=alt.Y('CITY_STATE:N', title='City', sort=city_order),
                     color=alt.Color('PRICE_METRIC:Q', scale=alt.Scale(scheme='blues')),
-                    tooltip=[
-                        alt.Tooltip('CITY_STATE:N', title='City'),
-                        alt.Tooltip('PRICE_METRIC:Q', title=f'{selected_metric} Price', format='$,.2f'),
-                        alt.Tooltip('NUM_PROVIDERS:Q', title='Number of Providers')
-                    ]
+                    tooltip=tooltip
                 ).properties(
                     width=700,
                     height=500,
                     title=f'Top Cities by {selected_metric} Standard Charge for {cpt_description}'
                 )
+
+                # p10-p90 band over each median
+                if area_quantiles is not None:
+                    band = alt.Chart(top_cities).mark_rule(color='gray', strokeWidth=2).encode(
+                        x='P10_CHARGE:Q',
+                        x2='P90_CHARGE:Q',
+                        y=alt.Y('CITY_STATE:N', sort=city_order),
+                        tooltip=tooltip
+                    )
+                    bar_chart = bar_chart + band
                 
                 st.altair_chart(bar_chart, use_container_width=True)
                 
@@ -908,15 +997,22 @@ elif app_mode == "Healthcare Cost Explorer":
                     filtered_df = city_metrics_df
                 
                 # Display the filtered data
+                raw_columns = ['CITY_STATE', 'PRICE_METRIC', 'NUM_PROVIDERS']
+                if area_quantiles is not None:
+                    raw_columns[2:2] = ['P10_CHARGE', 'P90_CHARGE']
                 st.dataframe(
-                    filtered_df[['CITY_STATE', 'PRICE_METRIC', 'NUM_PROVIDERS']].rename(
+                    filtered_df[raw_columns].rename(
                         columns={
                             'CITY_STATE': 'City',
                             'PRICE_METRIC': f'{selected_metric} Price',
+                            'P10_CHARGE': '10th Percentile',
+                            'P90_CHARGE': '90th Percentile',
                             'NUM_PROVIDERS': 'Number of Providers'
                         }
                     ).style.format({
-                        f'{selected_metric} Price': '${:,.2f}'
+                        f'{selected_metric} Price': '${:,.2f}',
+                        '10th Percentile': '${:,.2f}',
+                        '90th Percentile': '${:,.2f}'
                     }),
                     use_container_width=True
                 )
@@ -978,16 +1074,8 @@ elif app_mode == "Healthcare Cost Explorer":
             
             # Cities with highest variation from state average
             if len(city_metrics_df) >= 3:
-                # Calculate state averages
-                state_avgs = city_metrics_df.groupby('STATE')['PRICE_METRIC'].mean().reset_index()
-                state_avgs.columns = ['STATE', 'STATE_AVG']
-                
-                # Merge state averages with city data
-                city_comparison = city_metrics_df.merge(state_avgs, on='STATE', how='left')
-                
-                # Calculate price difference from state average
-                city_comparison['PRICE_DIFF'] = city_comparison['PRICE_METRIC'] - city_comparison['STATE_AVG']
-                city_comparison['PRICE_DIFF_PCT'] = (city_comparison['PRICE_DIFF'] / city_comparison['STATE_AVG']) * 100
+                # Price difference of each city from its state average
+                city_comparison = group_deltas(city_metrics_df, value='PRICE_METRIC', by='STATE', average='STATE_AVG')
                 
                 # Display cities with highest positive and negative differences
                 col1, col2 = st.columns(2)
@@ -1061,132 +1149,193 @@ elif app_mode == "Health Cost Navigator":
             zip_code = st.text_input("Enter ZIP Code (Optional):")
         with col3:
             city_name = st.text_input("Enter City Name (Optional):")
+        col1, col2 = st.columns(2)
+        with col1:
+            payer_name = st.text_input("Insurance Provider (Optional):")
+        with col2:
+            plan_name = st.text_input("Insurance Plan (Optional):")
         search_button = st.form_submit_button("Search", use_container_width=True)
     
     st.markdown("---")
-    
-    def build_exact_query(zip_code_val):
-        return f"""
-        SELECT 
-            s.DESCRIPTION,
-            h.HOSPITAL_NAME, 
-            h.CITY, 
-            h.STATE, 
-            h.ZIPCODE, 
-            p.PAYER_NAME, 
-            pl.PLAN_NAME, 
-            m.STANDARD_CHARGE_DOLLAR, 
-            m.MINIMUM_CHARGE, 
-            m.MAXIMUM_CHARGE
-        FROM {master_table} m
-        JOIN {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
-        JOIN {provider_table} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
-        JOIN {plan_table} pl ON m.INSURANCE_PLAN_ID = pl.INSURANCE_PLAN_ID
-        JOIN {service_code_table} s ON m.CODE = s.CODE
-        WHERE s.CODE = '{cpt_code}' AND h.ZIPCODE = '{zip_code_val}'
-        """
-    
-    def build_multi_zipcode_query(zipcode_list):
-        zipcode_condition = "', '".join(zipcode_list)
-        return f"""
-        SELECT 
-            s.DESCRIPTION,
-            h.HOSPITAL_NAME, 
-            h.CITY, 
-            h.STATE, 
-            h.ZIPCODE, 
-            p.PAYER_NAME, 
-            pl.PLAN_NAME, 
-            m.STANDARD_CHARGE_DOLLAR, 
-            m.MINIMUM_CHARGE, 
-            m.MAXIMUM_CHARGE
-        FROM {master_table} m
-        JOIN {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
-        JOIN {provider_table} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
-        JOIN {plan_table} pl ON m.INSURANCE_PLAN_ID = pl.INSURANCE_PLAN_ID
-        JOIN {service_code_table} s ON m.CODE = s.CODE
-        WHERE s.CODE = '{cpt_code}' AND h.ZIPCODE IN ('{zipcode_condition}')
-        """
-    
+
+    # Column labels for the results grid
+    navigator_column_config = {
+        "DESCRIPTION": "Service Description",
+        "HOSPITAL_NAME": "Hospital Name",
+        "CITY": "City",
+        "STATE": "State",
+        "ZIPCODE": "ZIP Code",
+        "PAYER_NAME": "Insurance Provider",
+        "PLAN_NAME": "Insurance Plan",
+        "STANDARD_CHARGE_DOLLAR": st.column_config.NumberColumn("Standard Charge ($)", format="$%.2f"),
+        "MINIMUM_CHARGE": st.column_config.NumberColumn("Minimum Charge ($)", format="$%.2f"),
+        "MAXIMUM_CHARGE": st.column_config.NumberColumn("Maximum Charge ($)", format="$%.2f")
+    }
+
+    dimensions = get_dimensions()
+
     if search_button:
+        # A new search starts again from its first page
+        st.session_state.pop("navigator_search", None)
         if cpt_code:
-            results = pd.DataFrame()
-    
-            if zip_code:
-                query = build_exact_query(zip_code)
+            cpt_code = cpt_code.strip()
+
+            # A description or partial code resolves to the best matching CPT
+            # code. A complete code is searched as typed (in the index's case),
+            # even when it has no prices.
+            cpt_match = get_search_index("cpt").best(cpt_code)
+            if is_code(cpt_code):
+                if cpt_match and cpt_match[0].upper() == cpt_code.upper():
+                    cpt_code = cpt_match[0]
+            elif cpt_match:
+                st.info(f"Showing results for CPT {cpt_match[0]} - {cpt_match[1]}")
+                cpt_code = cpt_match[0]
+
+            # Payer and plan names resolve to every matching ID; None means any
+            provider_ids = get_search_index("payer").matching_keys(payer_name) if payer_name.strip() else None
+            plan_ids = get_search_index("plan").matching_keys(plan_name) if plan_name.strip() else None
+            filters = {"provider_ids": provider_ids, "plan_ids": plan_ids, "cursors": [None]}
+
+            if provider_ids == []:
+                st.warning(f"No insurance provider matches: {payer_name}")
+
+            elif plan_ids == []:
+                st.warning(f"No insurance plan matches: {plan_name}")
+
+            elif zip_code:
                 st.info(f"Searching for CPT code {cpt_code} in ZIP code {zip_code}...")
-                results = run_query(query)
-    
-                if results.empty:
-                    st.warning(f"No results found for ZIP {zip_code}.")
+                st.session_state["navigator_search"] = {
+                    "code": cpt_code, "zip_code": zip_code, "location": f"ZIP {zip_code}", **filters
+                }
             
             elif city_name:
-                city_query = f"""
-                SELECT DISTINCT ZIPCODE
-                FROM {hospital_table}
-                WHERE UPPER(CITY) = '{city_name.strip().upper()}'
-                """
-                zip_df = run_query(city_query)
+                hospitals = dimensions.hospitals_in_city(city_name)
+                if hospitals.empty:
+                    city_match = get_search_index("city").best(city_name)
+                    if city_match:
+                        city_name = city_match[0]
+                        hospitals = dimensions.hospitals_in_city(city_name)
     
-                if not zip_df.empty:
-                    zipcodes = zip_df["ZIPCODE"].tolist()
-                    query = build_multi_zipcode_query(zipcodes)
+                if not hospitals.empty:
                     st.info(f"Searching for CPT code {cpt_code} in city: {city_name}")
-                    results = run_query(query)
-    
-                    if results.empty:
-                        st.warning(f"No results for CPT code {cpt_code} in city {city_name}.")
-                    else:
-                        st.success(f"Found {len(results)} results for city {city_name}")
-    
+                    st.session_state["navigator_search"] = {
+                        "code": cpt_code, "city": city_name, "location": f"city {city_name}", **filters
+                    }
                 else:
                     st.warning(f"No ZIP codes found for city: {city_name}")
+
+            elif provider_ids is not None or plan_ids is not None:
+                # The precomputed cheapest offers are not kept per payer or
+                # plan, so a filtered search pages through every hospital
+                st.info(f"Searching for CPT code {cpt_code} at all hospitals...")
+                st.session_state["navigator_search"] = {
+                    "code": cpt_code, "location": "any location", **filters
+                }
     
             else:
-                fallback_query = f"""
-                SELECT 
-                    s.DESCRIPTION,
-                    h.HOSPITAL_NAME, 
-                    h.CITY, 
-                    h.STATE, 
-                    h.ZIPCODE, 
-                    p.PAYER_NAME, 
-                    pl.PLAN_NAME, 
-                    m.STANDARD_CHARGE_DOLLAR, 
-                    m.MINIMUM_CHARGE, 
-                    m.MAXIMUM_CHARGE
-                FROM {master_table} m
-                JOIN {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
-                JOIN {provider_table} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
-                JOIN {plan_table} pl ON m.INSURANCE_PLAN_ID = pl.INSURANCE_PLAN_ID
-                JOIN {service_code_table} s ON m.CODE = s.CODE
-                WHERE s.CODE = '{cpt_code}'
-                ORDER BY m.STANDARD_CHARGE_DOLLAR ASC
-                LIMIT 10
-                """
                 st.info(f"No location provided. Showing top 10 cheapest charges for CPT code {cpt_code}.")
-                results = run_query(fallback_query)
-    
-            if not results.empty:
+                results = dimensions.label(navigator_cheapest(cpt_code))
+                results = results.sort_values("STANDARD_CHARGE_DOLLAR", kind="stable").head(10)
+                if not results.empty:
+                    st.dataframe(results, column_config=navigator_column_config, hide_index=True,
+                                 use_container_width=True)
+                else:
+                    st.warning(f"No results for CPT code {cpt_code}.")
+        else:
+            st.warning("Please enter a CPT code.")
+
+    # Location searches are shown one page at a time. The search and the
+    # cursor each page started from live in session state, so Next fetches
+    # only the next page and Previous re-reads a cached one.
+    search = st.session_state.get("navigator_search")
+    if search:
+        if "zip_code" in search:
+            hospitals = dimensions.hospitals_in_zipcodes(search["zip_code"])
+        elif "city" in search:
+            hospitals = dimensions.hospitals_in_city(search["city"])
+        else:
+            hospitals = dimensions.hospitals
+        hospital_ids = hospitals.index.unique().tolist()
+
+        def restart_navigator_pages():
+            st.session_state["navigator_search"]["cursors"] = [None]
+
+        def next_navigator_page():
+            search = st.session_state["navigator_search"]
+            search["cursors"].append(search["next_cursor"])
+
+        def previous_navigator_page():
+            st.session_state["navigator_search"]["cursors"].pop()
+
+        total = navigator_count(search["code"], hospital_ids, search["provider_ids"], search["plan_ids"]) \
+            if hospital_ids else 0
+        if total == 0:
+            st.warning(f"No results for CPT code {search['code']} in {search['location']}.")
+        else:
+            page_size = st.selectbox("Rows per page:", options=NAVIGATOR_PAGE_SIZES, index=1,
+                                     key="navigator_page_size", on_change=restart_navigator_pages)
+            page_number = len(search["cursors"])
+            page = navigator_page(search["code"], hospital_ids, page_size, search["cursors"][-1],
+                                  search["provider_ids"], search["plan_ids"])
+            has_next = len(page) > page_size
+            page = page.head(page_size)
+
+            if not page.empty:
+                search["next_cursor"] = page_cursor(page)
+                first_row = (page_number - 1) * page_size + 1
+                st.success(f"Found {total:,} results for CPT code {search['code']} in {search['location']} "
+                           f"(showing {first_row:,}-{first_row + len(page) - 1:,})")
                 st.dataframe(
-                    results,
-                    column_config={
-                        "DESCRIPTION": "Service Description",
-                        "HOSPITAL_NAME": "Hospital Name",
-                        "CITY": "City",
-                        "STATE": "State",
-                        "ZIPCODE": "ZIP Code",
-                        "PAYER_NAME": "Insurance Provider",
-                        "PLAN_NAME": "Insurance Plan",
-                        "STANDARD_CHARGE_DOLLAR": st.column_config.NumberColumn("Standard Charge ($)", format="$%.2f"),
-                        "MINIMUM_CHARGE": st.column_config.NumberColumn("Minimum Charge ($)", format="$%.2f"),
-                        "MAXIMUM_CHARGE": st.column_config.NumberColumn("Maximum Charge ($)", format="$%.2f")
-                    },
+                    dimensions.label(page, hospitals),
+                    column_config=navigator_column_config,
                     hide_index=True,
                     use_container_width=True
                 )
-        else:
-            st.warning("Please enter a CPT code.")
+
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                st.button("Previous", disabled=page_number == 1, on_click=previous_navigator_page,
+                          use_container_width=True, key="navigator_previous")
+            with col2:
+                st.caption(f"Page {page_number} of {max(-(-total // page_size), page_number)}")
+            with col3:
+                st.button("Next", disabled=not has_next, on_click=next_navigator_page,
+                          use_container_width=True, key="navigator_next")
+
+elif app_mode == "Query Diagnostics":
+    st.markdown('<div class="main-header">Query Diagnostics</div>', unsafe_allow_html=True)
+    st.markdown(
+        f'<div class="sub-header">Recent dashboard queries on the {backend.name} backend '
+        f'(budget {LATENCY_BUDGET_SECONDS:.0f}s per query)</div>',
+        unsafe_allow_html=True
+    )
+
+    records_df = query_log.frame()
+    if records_df.empty:
+        st.info("No queries recorded yet. Use the other pages, then come back here.")
+    else:
+        cache_stats = result_cache.stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Queries", len(records_df))
+        col2.metric("p95 Latency", f"{records_df['wall_ms'].quantile(0.95):,.0f} ms")
+        col3.metric("Over Budget", int((records_df['wall_ms'] > LATENCY_BUDGET_SECONDS * 1000).sum()))
+        col4.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+
+        st.subheader("By Page")
+        st.dataframe(query_log.summary(by=("page",)), hide_index=True, use_container_width=True)
+
+        st.subheader("By Page and Template")
+        st.dataframe(query_log.summary(), hide_index=True, use_container_width=True)
+
+        st.subheader("Recent Queries")
+        st.dataframe(records_df.iloc[::-1], hide_index=True, use_container_width=True)
+
+        st.download_button(
+            "Download query log (JSON lines)",
+            data=query_log.to_jsonl(),
+            file_name="health_nav_queries.jsonl",
+            mime="application/json"
+        )
 
 # Footer
 st.markdown("<br><br>", unsafe_allow_html=True)
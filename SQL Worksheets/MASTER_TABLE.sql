@@ -1,3 +1,4 @@
+--Incremental reloads of one hospital: python master_loader.py <HOSPITAL_ID> (see README)
 --delete from health_nav.core.master_table;
 
 create or replace TABLE HEALTH_NAV.CORE.MASTER_TABLE (
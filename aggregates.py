@@ -0,0 +1,320 @@
+import argparse
+
+from query_backend import get_backend, qualified_name
+from quantile_sketch import bucket_sql
+
+# Derived tables maintained next to MASTER_TABLE so dashboard pages read small
+# rollups instead of rescanning the fact table on every interaction.
+master_table = qualified_name("MASTER_TABLE")
+hospital_table = qualified_name("HOSPITAL_DATA")
+provider_table = qualified_name("INSURANCE_PROVIDERS")
+
+hospital_price_stats_table = qualified_name("HOSPITAL_PRICE_STATS")
+cpt_price_index_table = qualified_name("CPT_PRICE_INDEX")
+charge_sketches_table = qualified_name("CHARGE_SKETCHES")
+payer_geo_stats_table = qualified_name("PAYER_GEO_STATS")
+cheapest_offers_table = qualified_name("CHEAPEST_OFFERS")
+
+# Offers kept per CODE in CHEAPEST_OFFERS
+CHEAPEST_OFFERS_K = 10
+
+# Core tables each derived table is computed from: a derived table's contents
+# change only when one of these does
+DERIVED_TABLE_SOURCES = {
+    "HOSPITAL_PRICE_STATS": ["MASTER_TABLE", "HOSPITAL_DATA"],
+    "CPT_PRICE_INDEX": ["MASTER_TABLE"],
+    "CHARGE_SKETCHES": ["MASTER_TABLE"],
+    "PAYER_GEO_STATS": ["MASTER_TABLE", "HOSPITAL_DATA", "INSURANCE_PROVIDERS"],
+    "CHEAPEST_OFFERS": ["MASTER_TABLE"],
+}
+
+
+# Per-hospital price statistics. COUNT/SUM/SUM-of-squares/MIN/MAX are enough to
+# derive the mean, standard deviation, coefficient of variation and range, both
+# per hospital and for any group of hospitals (sum the sums, min the mins).
+def _hospital_price_stats_select(where=""):
+    return f"""
+    SELECT
+        h.HOSPITAL_ID,
+        h.HOSPITAL_NAME,
+        h.CITY,
+        h.STATE,
+        COUNT(*) as CHARGE_COUNT,
+        SUM(CAST(m.STANDARD_CHARGE_DOLLAR AS DOUBLE)) as CHARGE_SUM,
+        SUM(CAST(m.STANDARD_CHARGE_DOLLAR AS DOUBLE) * CAST(m.STANDARD_CHARGE_DOLLAR AS DOUBLE)) as CHARGE_SUMSQ,
+        MIN(m.STANDARD_CHARGE_DOLLAR) as MIN_CHARGE,
+        MAX(m.STANDARD_CHARGE_DOLLAR) as MAX_CHARGE,
+        COUNT(DISTINCT m.CODE) as DISTINCT_CODES
+    FROM
+        (SELECT DISTINCT HOSPITAL_ID, HOSPITAL_NAME, CITY, STATE FROM {hospital_table}) h
+    JOIN
+        {master_table} m ON h.HOSPITAL_ID = m.HOSPITAL_ID
+    WHERE
+        m.STANDARD_CHARGE_DOLLAR > 0
+        {where}
+    GROUP BY
+        h.HOSPITAL_ID, h.HOSPITAL_NAME, h.CITY, h.STATE
+    """
+
+
+# Rebuild the whole rollup (initial load or full reload)
+def build_hospital_price_stats(backend):
+    backend.run(f"CREATE OR REPLACE TABLE {hospital_price_stats_table} AS {_hospital_price_stats_select()}")
+
+
+# Recompute only the given hospitals after their MASTER_TABLE rows were inserted
+# or deleted; every other hospital's row is left untouched.
+def refresh_hospital_price_stats(backend, hospital_ids):
+    hospital_ids = sorted(set(hospital_ids))
+    if not hospital_ids:
+        return
+    placeholders = ", ".join("?" for _ in hospital_ids)
+    backend.run(f"DELETE FROM {hospital_price_stats_table} WHERE HOSPITAL_ID IN ({placeholders})", hospital_ids)
+    backend.run(
+        f"INSERT INTO {hospital_price_stats_table} "
+        f"{_hospital_price_stats_select(f'AND m.HOSPITAL_ID IN ({placeholders})')}",
+        hospital_ids,
+    )
+
+
+# Per-CODE reference prices across every hospital, so a hospital's rows can be
+# compared to the market with a keyed join instead of a MASTER_TABLE self-join.
+def _cpt_price_index_select(where=""):
+    return f"""
+    SELECT
+        m.CODE,
+        COUNT(*) as CHARGE_COUNT,
+        COUNT(DISTINCT m.HOSPITAL_ID) as HOSPITAL_COUNT,
+        AVG(m.STANDARD_CHARGE_DOLLAR) as MEAN_CHARGE,
+        MEDIAN(m.STANDARD_CHARGE_DOLLAR) as MEDIAN_CHARGE,
+        MIN(m.STANDARD_CHARGE_DOLLAR) as MIN_CHARGE,
+        MAX(m.STANDARD_CHARGE_DOLLAR) as MAX_CHARGE,
+        PERCENTILE_CONT(0.10) WITHIN GROUP (ORDER BY m.STANDARD_CHARGE_DOLLAR) as P10_CHARGE,
+        PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY m.STANDARD_CHARGE_DOLLAR) as P25_CHARGE,
+        PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY m.STANDARD_CHARGE_DOLLAR) as P75_CHARGE,
+        PERCENTILE_CONT(0.90) WITHIN GROUP (ORDER BY m.STANDARD_CHARGE_DOLLAR) as P90_CHARGE
+    FROM
+        {master_table} m
+    WHERE
+        m.STANDARD_CHARGE_DOLLAR > 0
+        {where}
+    GROUP BY
+        m.CODE
+    """
+
+
+def build_cpt_price_index(backend):
+    backend.run(f"CREATE OR REPLACE TABLE {cpt_price_index_table} AS {_cpt_price_index_select()}")
+
+
+# Recompute the index entries for the given codes (e.g. every code a reloaded
+# hospital offers); codes that no longer have any rows simply disappear.
+def refresh_cpt_price_index(backend, codes):
+    codes = sorted(set(codes))
+    if not codes:
+        return
+    placeholders = ", ".join("?" for _ in codes)
+    backend.run(f"DELETE FROM {cpt_price_index_table} WHERE CODE IN ({placeholders})", codes)
+    backend.run(
+        f"INSERT INTO {cpt_price_index_table} {_cpt_price_index_select(f'AND m.CODE IN ({placeholders})')}",
+        codes,
+    )
+
+
+# Quantile sketch (quantile_sketch.py) of the positive charges of each (CODE,
+# HOSPITAL_ID): one row per bucket with its count. Percentiles for a city, a
+# state or every hospital merge these rows instead of sorting MASTER_TABLE.
+def _charge_sketches_select(where=""):
+    return f"""
+    SELECT
+        m.CODE,
+        m.HOSPITAL_ID,
+        {bucket_sql("m.STANDARD_CHARGE_DOLLAR")} as BUCKET,
+        COUNT(*) as BUCKET_COUNT
+    FROM
+        {master_table} m
+    WHERE
+        m.STANDARD_CHARGE_DOLLAR > 0
+        {where}
+    GROUP BY
+        1, 2, 3
+    """
+
+
+# Stored in CODE order so a per-code lookup reads only that code's blocks
+def build_charge_sketches(backend):
+    backend.run(f"CREATE OR REPLACE TABLE {charge_sketches_table} AS {_charge_sketches_select()} ORDER BY CODE")
+
+
+# Replace the sketches of the given hospitals after a reload
+def refresh_charge_sketches(backend, hospital_ids):
+    hospital_ids = sorted(set(hospital_ids))
+    if not hospital_ids:
+        return
+    placeholders = ", ".join("?" for _ in hospital_ids)
+    backend.run(f"DELETE FROM {charge_sketches_table} WHERE HOSPITAL_ID IN ({placeholders})", hospital_ids)
+    backend.run(
+        f"INSERT INTO {charge_sketches_table} "
+        f"{_charge_sketches_select(f'AND m.HOSPITAL_ID IN ({placeholders})')}",
+        hospital_ids,
+    )
+
+
+# Payer x geography cube: sum and count of positive charges per payer, state
+# and city. Any state, city or all-region average by payer is a roll-up of a
+# few of its rows (sum the sums, sum the counts).
+def _payer_geo_stats_select(where=""):
+    return f"""
+    SELECT
+        p.PAYER_NAME,
+        h.STATE,
+        h.CITY,
+        SUM(CAST(m.STANDARD_CHARGE_DOLLAR AS DOUBLE)) as CHARGE_SUM,
+        COUNT(*) as CHARGE_COUNT
+    FROM
+        {master_table} m
+    JOIN
+        {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
+    JOIN
+        {provider_table} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
+    WHERE
+        m.STANDARD_CHARGE_DOLLAR > 0
+        {where}
+    GROUP BY
+        p.PAYER_NAME, h.STATE, h.CITY
+    """
+
+
+def build_payer_geo_stats(backend):
+    backend.run(f"CREATE OR REPLACE TABLE {payer_geo_stats_table} AS {_payer_geo_stats_select()}")
+
+
+# A cube row covers every hospital in its city, so reloading a hospital
+# recomputes the cities it is listed in (several, for a shared hospital ID)
+def refresh_payer_geo_stats(backend, hospital_ids):
+    hospital_ids = sorted(set(hospital_ids))
+    if not hospital_ids:
+        return
+    placeholders = ", ".join("?" for _ in hospital_ids)
+
+    def touched(alias):
+        return f"""EXISTS (
+            SELECT 1 FROM {hospital_table} t
+            WHERE t.HOSPITAL_ID IN ({placeholders})
+            AND t.STATE IS NOT DISTINCT FROM {alias}.STATE
+            AND t.CITY IS NOT DISTINCT FROM {alias}.CITY
+        )"""
+
+    # The DELETE refers to its target by table name: Snowflake's DELETE takes no alias
+    backend.run(f"DELETE FROM {payer_geo_stats_table} WHERE {touched('PAYER_GEO_STATS')}", hospital_ids)
+    backend.run(
+        f"INSERT INTO {payer_geo_stats_table} {_payer_geo_stats_select('AND ' + touched('h'))}",
+        hospital_ids,
+    )
+
+
+# The CHEAPEST_OFFERS_K cheapest priced offers of each CODE, ranked by charge
+# and then by the rest of the row so ties always resolve the same way (the
+# order of query_templates.NAVIGATOR_PAGE_KEY)
+def _cheapest_offers_select(where=""):
+    return f"""
+    SELECT
+        m.CODE,
+        ROW_NUMBER() OVER (
+            PARTITION BY m.CODE
+            ORDER BY m.STANDARD_CHARGE_DOLLAR, m.HOSPITAL_ID, m.INSURANCE_PROVIDER_ID, m.INSURANCE_PLAN_ID,
+                COALESCE(m.MINIMUM_CHARGE, -1), COALESCE(m.MAXIMUM_CHARGE, -1), COALESCE(m.METHODOLOGY, '')
+        ) as OFFER_RANK,
+        m.HOSPITAL_ID,
+        m.INSURANCE_PROVIDER_ID,
+        m.INSURANCE_PLAN_ID,
+        m.STANDARD_CHARGE_DOLLAR,
+        m.MINIMUM_CHARGE,
+        m.MAXIMUM_CHARGE
+    FROM
+        {master_table} m
+    WHERE
+        m.STANDARD_CHARGE_DOLLAR IS NOT NULL
+        {where}
+    QUALIFY
+        OFFER_RANK <= {CHEAPEST_OFFERS_K}
+    """
+
+
+def build_cheapest_offers(backend):
+    backend.run(f"CREATE OR REPLACE TABLE {cheapest_offers_table} AS {_cheapest_offers_select()} ORDER BY CODE")
+
+
+# Re-rank the given codes from MASTER_TABLE. Pass every code whose rows were
+# inserted, updated or deleted: a deleted offer in the top k is replaced by
+# the next cheapest one, which only MASTER_TABLE knows.
+def refresh_cheapest_offers(backend, codes):
+    codes = sorted(set(codes))
+    if not codes:
+        return
+    placeholders = ", ".join("?" for _ in codes)
+    backend.run(f"DELETE FROM {cheapest_offers_table} WHERE CODE IN ({placeholders})", codes)
+    backend.run(
+        f"INSERT INTO {cheapest_offers_table} {_cheapest_offers_select(f'AND m.CODE IN ({placeholders})')}",
+        codes,
+    )
+
+
+# Sample standard deviation from count, sum and sum of squares (matches STDDEV)
+def stddev_sql(count, total, sumsq):
+    return f"SQRT(GREATEST({sumsq} - {total} * {total} / {count}, 0) / NULLIF({count} - 1, 0))"
+
+
+# Variation metric expressions over the rollup columns. Pass aggregated column
+# expressions (e.g. SUM(CHARGE_SUM)) to get the metric for a group of hospitals.
+def variation_sql(metric, count="CHARGE_COUNT", total="CHARGE_SUM", sumsq="CHARGE_SUMSQ",
+                  low="MIN_CHARGE", high="MAX_CHARGE"):
+    if metric == "Coefficient of Variation":
+        return f"{stddev_sql(count, total, sumsq)} / NULLIF({total} / {count}, 0) * 100"
+    elif metric == "Standard Deviation":
+        return stddev_sql(count, total, sumsq)
+    elif metric == "Price Range":
+        return f"{high} - {low}"
+    raise ValueError(f"Unknown variation metric: {metric}")
+
+
+# How each derived table is built from scratch
+DERIVED_TABLE_BUILDERS = {
+    "HOSPITAL_PRICE_STATS": build_hospital_price_stats,
+    "CPT_PRICE_INDEX": build_cpt_price_index,
+    "CHARGE_SKETCHES": build_charge_sketches,
+    "PAYER_GEO_STATS": build_payer_geo_stats,
+    "CHEAPEST_OFFERS": build_cheapest_offers,
+}
+
+
+# Build every derived table from the current core tables
+def build_derived_tables(backend):
+    for build in DERIVED_TABLE_BUILDERS.values():
+        build(backend)
+
+
+# Build the derived tables that do not exist yet, so a warehouse that never ran
+# build_derived_tables still has a table for each refresh to update. Returns
+# the tables built.
+def ensure_derived_tables(backend):
+    existing = set(backend.list_tables())
+    missing = [table for table in DERIVED_TABLE_BUILDERS if table not in existing]
+    for table in missing:
+        DERIVED_TABLE_BUILDERS[table](backend)
+    return missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the derived tables the dashboard reads from MASTER_TABLE")
+    parser.add_argument("--backend", help="snowflake or local (defaults to HEALTH_NAV_BACKEND)")
+    parser.add_argument("--missing", action="store_true", help="Only build the tables that do not exist yet")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    if args.missing:
+        built = ensure_derived_tables(backend)
+        print(f"Built {', '.join(built)}" if built else "Every derived table exists")
+    else:
+        build_derived_tables(backend)
+        print("Built every derived table")
@@ -0,0 +1,156 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Column operations the dashboard pages run on query results, written as whole-
+# column NumPy/pandas operations so their cost stays flat per row however many
+# rows a query returns (no Series.apply or row-wise lambdas). Category columns
+# come back as ordered pandas Categoricals: one small integer code per row plus
+# the labels once.
+
+# Hospital price consistency by percentile rank: >= 80 high, >= 50 medium
+CONSISTENCY_EDGES = [(50, True), (80, True)]
+CONSISTENCY_LABELS = ["Low Consistency", "Medium Consistency", "High Consistency"]
+
+# Procedure price against the market average, by percent difference:
+# < -20, < -5, <= 5, <= 20, above
+PRICE_EDGES = [(-20, True), (-5, True), (5, False), (20, False)]
+PRICE_LABELS = ["Significantly Lower", "Moderately Lower", "Comparable", "Moderately Higher", "Significantly Higher"]
+
+
+# Percentile rank (0-100) of each value; ties share their average rank. With
+# higher_is_better=False the lowest value ranks highest, as for variation.
+def percentile_rank(values, higher_is_better=True):
+    rank = pd.Series(values).rank(pct=True) * 100
+    return rank if higher_is_better else 100 - rank
+
+
+# Bucket values by edges, a list of (edge, inclusive) in increasing order: a
+# value moves past an edge when it is above it, or equal to it if inclusive.
+# Missing values go to the missing label (the first label by default).
+def bucket(values, edges, labels, missing=None):
+    values = np.asarray(values, dtype=np.float64)
+    bounds = np.array([edge for edge, _ in edges], dtype=np.float64)
+    inclusive = np.array([inc for _, inc in edges], dtype=bool)
+    passed = (values[:, None] > bounds) | (inclusive & (values[:, None] == bounds))
+    codes = passed.sum(axis=1)
+    if missing is not None:
+        codes[np.isnan(values)] = labels.index(missing)
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def consistency_category(percentiles):
+    return bucket(percentiles, CONSISTENCY_EDGES, CONSISTENCY_LABELS)
+
+
+# A missing difference (no market average) counts as significantly higher
+def price_category(percent_diffs):
+    return bucket(percent_diffs, PRICE_EDGES, PRICE_LABELS, missing=PRICE_LABELS[-1])
+
+
+# "City, ST" labels, built once per distinct location rather than once per row
+def location_labels(city, state):
+    city_codes, cities = pd.factorize(pd.Series(city).astype("string"))
+    state_codes, states = pd.factorize(pd.Series(state).astype("string"))
+    # One code per (city, state) pair; a missing city or state stays missing
+    pairs = np.where((city_codes < 0) | (state_codes < 0), -1, city_codes * len(states) + state_codes)
+    pair_codes, distinct = pd.factorize(pairs, use_na_sentinel=False)
+    present = distinct >= 0
+    labels = np.full(len(distinct), None, dtype=object)
+    labels[present] = (cities.take(distinct[present] // len(states)) + ", " +
+                       states.take(distinct[present] % len(states))).to_numpy(dtype=object)
+    # Two pairs can still spell the same label ("A, B" + "C" and "A" + "B, C")
+    label_codes, categories = pd.factorize(labels)
+    return pd.Categorical.from_codes(label_codes[pair_codes], categories=categories)
+
+
+# Each row's value against the mean of its group (by default its state):
+# adds the group mean (as average), PRICE_DIFF and PRICE_DIFF_PCT in one
+# grouped pass, without a merge
+def group_deltas(df, value="PRICE_METRIC", by="STATE", average="STATE_AVG"):
+    result = df.copy()
+    result[average] = result.groupby(by, observed=True, sort=False)[value].transform("mean")
+    result["PRICE_DIFF"] = result[value] - result[average]
+    result["PRICE_DIFF_PCT"] = result["PRICE_DIFF"] / result[average] * 100
+    return result
+
+
+# ----- Micro-benchmarks -----
+
+def _row_wise(frame):
+    def score(percentile):
+        if percentile >= 80:
+            return "High Consistency"
+        elif percentile >= 50:
+            return "Medium Consistency"
+        return "Low Consistency"
+
+    def price(pct_diff):
+        if pct_diff < -20:
+            return "Significantly Lower"
+        elif pct_diff < -5:
+            return "Moderately Lower"
+        elif pct_diff <= 5:
+            return "Comparable"
+        elif pct_diff <= 20:
+            return "Moderately Higher"
+        return "Significantly Higher"
+
+    percentiles = 100 - frame["VARIATION"].rank(pct=True) * 100
+    percentiles.apply(score)
+    frame["PCT_DIFF"].apply(price)
+    frame.apply(lambda x: f"{x['CITY']}, {x['STATE']}", axis=1)
+    state_avgs = frame.groupby("STATE")["PRICE_METRIC"].mean().reset_index()
+    state_avgs.columns = ["STATE", "STATE_AVG"]
+    frame.merge(state_avgs, on="STATE", how="left")
+
+
+def _vectorized(frame):
+    consistency_category(percentile_rank(frame["VARIATION"], higher_is_better=False))
+    price_category(frame["PCT_DIFF"])
+    location_labels(frame["CITY"], frame["STATE"])
+    group_deltas(frame)
+
+
+def _sample_frame(rows, rng):
+    cities = np.array([f"City {i:04d}" for i in range(2000)])
+    states = np.array(["NV", "IL", "NC", "SC", "IN", "WI"])
+    return pd.DataFrame({
+        "CITY": pd.array(rng.choice(cities, rows), dtype="string"),
+        "STATE": pd.array(rng.choice(states, rows), dtype="string"),
+        "VARIATION": rng.gamma(2.0, 20.0, rows),
+        "PCT_DIFF": rng.normal(0.0, 25.0, rows),
+        "PRICE_METRIC": rng.lognormal(6.0, 1.0, rows),
+    })
+
+
+def _best_ms(fn, frame, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def run_micro_benchmarks(sizes, repeat=3, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for rows in sizes:
+        frame = _sample_frame(rows, rng)
+        row_wise = _best_ms(_row_wise, frame, repeat)
+        vectorized = _best_ms(_vectorized, frame, repeat)
+        results.append({"rows": rows, "row_wise_ms": row_wise, "vectorized_ms": vectorized})
+        print(f"{rows:>10,} rows: row-wise {row_wise:9.1f} ms, vectorized {vectorized:7.1f} ms "
+              f"({row_wise / vectorized:.0f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the analytics kernels against the row-wise versions")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run_micro_benchmarks(args.rows, args.repeat)
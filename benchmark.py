@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+from query_backend import LocalBackend, qualified_name
+from query_templates import CITY_METRIC_SQL, NAVIGATOR_PAGE_KEY, NAVIGATOR_PAGE_SIZES, bind, navigator_filters
+
+# Replays the query shapes of every dashboard page against the local backend
+# (typically on synthetic_data.py output) and reports p50/p95 latency per shape
+# plus the process's peak memory. With --baseline the run is compared against
+# a stored result and any shape whose p95 regressed beyond the tolerance fails
+# the run with exit status 1.
+
+# A shape regresses when its p95 grows by more than the tolerance AND by more
+# than the slack, so sub-millisecond noise on tiny queries never fails a run
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_SLACK_MS = 5.0
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Parameters for each shape, drawn from the loaded data so every run hits rows
+def _sample_parameters(backend, samples, seed):
+    rng = np.random.default_rng(seed)
+    hospital_table = qualified_name("HOSPITAL_DATA")
+    master_table = qualified_name("MASTER_TABLE")
+
+    hospitals = backend.run(f"SELECT DISTINCT HOSPITAL_ID, CITY, STATE FROM {hospital_table}")
+    codes = backend.run(f"SELECT DISTINCT CODE FROM {master_table} ORDER BY CODE")["CODE"].to_numpy()
+
+    def pick(values, count):
+        values = list(values)
+        return [values[i] for i in rng.choice(len(values), size=min(count, len(values)), replace=False)]
+
+    states = sorted(hospitals["STATE"].dropna().unique())
+    locations = hospitals[["CITY", "STATE"]].dropna().drop_duplicates().itertuples(index=False)
+    cities = [tuple(location) for location in locations]
+    city_hospitals = {
+        city: hospitals.loc[hospitals["CITY"] == city, "HOSPITAL_ID"].tolist() for city, _ in cities
+    }
+    return {
+        "codes": pick(codes, samples),
+        "hospital_ids": pick(hospitals["HOSPITAL_ID"].unique(), samples),
+        "states": [None] + states,
+        "cities": cities,
+        "city_hospitals": city_hospitals,
+    }
+
+
+# Page -> shape name -> list of BoundQuery, mirroring what each page issues
+def build_shapes(params):
+    codes = params["codes"]
+    shapes = {
+        "Hospital Price Variation": {
+            "hospital_variation": [
+                bind("hospital_variation", min_procedures=5, state=state, city=None) for state in params["states"]
+            ] + [
+                bind("hospital_variation", min_procedures=5, state=state, city=city) for city, state in params["cities"]
+            ],
+            "procedure_deep_dive": [
+                bind("procedure_deep_dive", hospital_id=hospital_id) for hospital_id in params["hospital_ids"]
+            ],
+        },
+        "Insurance Provider Comparison": {
+            "provider_comparison": [
+                bind("provider_comparison", state=state, city=None) for state in params["states"]
+            ] + [
+                bind("provider_comparison", state=state, city=city) for city, state in params["cities"]
+            ],
+        },
+        "Healthcare Cost Explorer": {
+            "cpt_description": [bind("cpt_description", code=code) for code in codes],
+            "city_charge_sketches": [bind("city_charge_sketches", code=code, state=None) for code in codes],
+        },
+        "Health Cost Navigator": {
+            "navigator_hospitals_count": [
+                bind("navigator_hospitals_count", code=code, hospital_ids=params["city_hospitals"][city],
+                     **navigator_filters())
+                for code in codes for city, _ in params["cities"][:3]
+            ],
+            "navigator_hospitals_page": [
+                bind(f"navigator_hospitals_page_{NAVIGATOR_PAGE_SIZES[1]}", code=code,
+                     hospital_ids=params["city_hospitals"][city], **navigator_filters(),
+                     **{param: None for _, param in NAVIGATOR_PAGE_KEY})
+                for code in codes for city, _ in params["cities"][:3]
+            ],
+            "navigator_cheapest": [bind("navigator_cheapest", code=code) for code in codes],
+        },
+    }
+    for metric in CITY_METRIC_SQL:
+        name = f"city_metrics_{metric.lower()}"
+        shapes["Healthcare Cost Explorer"][name] = [bind(name, code=code, state=None) for code in codes]
+    return shapes
+
+
+def _time_shape(backend, queries, repeat):
+    backend.run(queries[0].sql, queries[0].params)
+    timings = []
+    for i in range(max(repeat, len(queries))):
+        query = queries[i % len(queries)]
+        start = time.perf_counter()
+        backend.run(query.sql, query.params)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": len(timings),
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def run_benchmark(data_dir, repeat=20, samples=10, seed=0):
+    start = time.perf_counter()
+    backend = LocalBackend(data_dir)
+    load_seconds = time.perf_counter() - start
+    rows = int(backend.run(f"SELECT COUNT(*) as N FROM {qualified_name('MASTER_TABLE')}")["N"].iloc[0])
+
+    shapes = build_shapes(_sample_parameters(backend, samples, seed))
+    results = {}
+    for page, page_shapes in shapes.items():
+        for name, queries in page_shapes.items():
+            if not queries:
+                continue
+            result = _time_shape(backend, queries, repeat)
+            result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            results[f"{page} / {name}"] = result
+            print(f"{page} / {name}: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms "
+                  f"({result['runs']} runs)")
+    backend.close()
+
+    return {
+        "rows": rows,
+        "load_seconds": round(load_seconds, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "shapes": results,
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+    }
+
+
+# Shapes whose p95 (or the run's peak memory) regressed against the baseline
+def compare(result, baseline, tolerance=DEFAULT_TOLERANCE, slack_ms=DEFAULT_SLACK_MS):
+    regressions = []
+    if result["rows"] != baseline["rows"]:
+        regressions.append(f"row count {result['rows']} does not match the baseline's {baseline['rows']}")
+        return regressions
+    for shape, expected in baseline["shapes"].items():
+        actual = result["shapes"].get(shape)
+        if actual is None:
+            regressions.append(f"{shape}: missing from this run")
+            continue
+        limit = max(expected["p95_ms"] * (1 + tolerance), expected["p95_ms"] + slack_ms)
+        if actual["p95_ms"] > limit:
+            regressions.append(f"{shape}: p95 {actual['p95_ms']:.1f} ms > {limit:.1f} ms "
+                               f"(baseline {expected['p95_ms']:.1f} ms)")
+    memory_limit = baseline["peak_rss_mb"] * (1 + tolerance)
+    if result["peak_rss_mb"] > memory_limit:
+        regressions.append(f"peak memory {result['peak_rss_mb']:.0f} MB > {memory_limit:.0f} MB "
+                           f"(baseline {baseline['peak_rss_mb']:.0f} MB)")
+    return regressions
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every dashboard page's queries on the local backend")
+    parser.add_argument("data_dir", help="Directory of tables, e.g. from synthetic_data.py")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query shape")
+    parser.add_argument("--samples", type=int, default=10, help="Codes and hospitals sampled per shape")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write this run's results as JSON")
+    parser.add_argument("--baseline", help="Compare against this stored result and fail on regressions")
+    parser.add_argument("--save-baseline", help="Store this run as the baseline at this path")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--slack-ms", type=float, default=DEFAULT_SLACK_MS)
+    args = parser.parse_args()
+
+    result = run_benchmark(args.data_dir, args.repeat, args.samples, args.seed)
+    print(f"{result['rows']} rows loaded in {result['load_seconds']}s, peak memory {result['peak_rss_mb']:.0f} MB")
+    if args.output:
+        _write_json(args.output, result)
+    if args.save_baseline:
+        _write_json(args.save_baseline, result)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.slack_ms)
+        if regressions:
+            print(f"\nREGRESSIONS against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from aggregates import DERIVED_TABLE_SOURCES
+from query_backend import get_backend, qualified_name
+
+# Per-table data version stamps. Every load that changes a core table records a
+# new stamp for it in DATA_VERSIONS (master_loader after each hospital it
+# changes, the local backend from its source files), and the dashboard keys its
+# caches on the stamps of the tables a result was computed from. A cached result
+# then lives until the data under it changes instead of for a fixed time.
+# Derived tables have no stamp of their own: they change when their sources do.
+#
+# On Snowflake each table's LAST_ALTERED time is part of its stamp as well, so
+# loads that bypass master_loader (MASTER_TABLE.sql, the Snowpark job, a plain
+# INSERT) still invalidate. A table with neither, or every table while the
+# stamps cannot be read, falls back to a fixed lifetime.
+
+data_versions_table = qualified_name("DATA_VERSIONS")
+
+# Seconds between the dashboard's reads of DATA_VERSIONS
+DEFAULT_CHECK_SECONDS = 30
+
+# Lifetime in seconds of cached results for tables without a stamp
+DEFAULT_UNVERSIONED_TTL = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+# Stamp for a table read from a file or a directory of files; it changes when
+# any file is rewritten, added or removed
+def source_version(path):
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    digest = hashlib.sha256()
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f"{os.path.relpath(file, path)}:{stat.st_mtime_ns}:{stat.st_size};".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def create_data_versions_table(backend):
+    backend.run(f"""
+        CREATE TABLE IF NOT EXISTS {data_versions_table} (
+            TABLE_NAME VARCHAR,
+            VERSION VARCHAR,
+            UPDATED_AT TIMESTAMP
+        )
+    """)
+
+
+# Record new stamps: versions maps table -> stamp, or lists tables that each
+# get a fresh one. Returns the stamps recorded.
+def bump_data_versions(backend, versions):
+    if not isinstance(versions, dict):
+        versions = {table: new_version() for table in versions}
+    create_data_versions_table(backend)
+    for table, version in versions.items():
+        backend.run(f"DELETE FROM {data_versions_table} WHERE TABLE_NAME = ?", [table])
+        backend.run(
+            f"INSERT INTO {data_versions_table} (TABLE_NAME, VERSION, UPDATED_AT) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            [table, version]
+        )
+    return versions
+
+
+# Table -> current stamp: its DATA_VERSIONS row plus the engine's last-altered
+# time. Tables with neither are left out.
+def read_data_versions(backend):
+    altered = backend.last_altered()
+    recorded = {}
+    if "DATA_VERSIONS" in altered:
+        df = backend.run(f"SELECT TABLE_NAME, VERSION FROM {data_versions_table}")
+        recorded = dict(zip(df["TABLE_NAME"], df["VERSION"]))
+    versions = {}
+    for table in set(altered) | set(recorded):
+        if recorded.get(table) is not None or altered.get(table) is not None:
+            versions[table] = f"{recorded.get(table)}@{altered.get(table)}"
+    return versions
+
+
+# Core tables whose stamps cover the given tables (a derived table stands for
+# the tables it is computed from)
+def source_tables(tables):
+    sources = set()
+    for table in tables:
+        sources.update(DERIVED_TABLE_SOURCES.get(table, [table]))
+    return sorted(sources)
+
+
+# The stamps as the dashboard sees them, shared by every session. They are
+# re-read at most every check_seconds, so a load reaches the caches within that
+# time and an idle dashboard costs one or two tiny queries per interval.
+class DataVersions:
+    def __init__(self, backend, check_seconds=DEFAULT_CHECK_SECONDS, unversioned_ttl=DEFAULT_UNVERSIONED_TTL):
+        self._backend = backend
+        self.check_seconds = check_seconds
+        self.unversioned_ttl = unversioned_ttl
+        self._versions = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+                try:
+                    self._versions = read_data_versions(self._backend)
+                except Exception:
+                    # Stamps that can no longer be checked are not trusted:
+                    # every table falls back to the fixed lifetime until a read works
+                    logger.warning("Could not read data versions; caching for %ss instead",
+                                   self.unversioned_ttl, exc_info=True)
+                    self._versions = {}
+                self._checked_at = now
+            return dict(self._versions)
+
+    # One short stamp for the current versions of the given tables. A table
+    # without a version gets one that changes every unversioned_ttl seconds.
+    def stamp(self, tables):
+        versions = self.current()
+        expiry = f"ttl-{int(time.time() // self.unversioned_ttl)}"
+        payload = ";".join(f"{table}={versions.get(table, expiry)}" for table in source_tables(tables))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show data version stamps, or bump them after loading tables by hand")
+    parser.add_argument("tables", nargs="*", help="Tables to give a new stamp, e.g. HOSPITAL_DATA")
+    parser.add_argument("--backend", help="snowflake or local (defaults to HEALTH_NAV_BACKEND)")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    if args.tables:
+        bump_data_versions(backend, [table.upper() for table in args.tables])
+    create_data_versions_table(backend)
+    print(backend.run(f"SELECT * FROM {data_versions_table} ORDER BY TABLE_NAME").to_string(index=False))
@@ -0,0 +1,108 @@
+import re
+
+import numpy as np
+
+from query_templates import bind
+
+# The dimension tables are tiny (a few hundred rows each), so they are read once
+# per process and joined to fact rows client-side. Fact queries then return only
+# IDs and charges instead of repeating hospital, payer, plan and description
+# strings on every row, and the warehouse skips four joins per search.
+
+# Tables the cache is read from
+DIMENSION_TABLES = ["HOSPITAL_DATA", "INSURANCE_PROVIDERS", "INSURANCE_PLANS", "SERVICE_CODES"]
+
+# Navigator result columns, in display order
+NAVIGATOR_COLUMNS = [
+    "DESCRIPTION", "HOSPITAL_NAME", "CITY", "STATE", "ZIPCODE", "PAYER_NAME", "PLAN_NAME",
+    "STANDARD_CHARGE_DOLLAR", "MINIMUM_CHARGE", "MAXIMUM_CHARGE"
+]
+
+
+# Shown for fact rows whose code, hospital, payer or plan is not in the cache
+MISSING_LABEL = "Unknown"
+
+LABEL_COLUMNS = ["DESCRIPTION", "HOSPITAL_NAME", "PAYER_NAME", "PLAN_NAME"]
+
+
+class DimensionCache:
+    def __init__(self, run):
+        self._run = run
+        self.reload()
+
+    def _load(self, template, key):
+        query = bind(template)
+        df = self._run(query.sql, query.params)
+        return df.set_index(key).sort_index()
+
+    # Re-read every dimension table (e.g. after a load added hospitals or plans)
+    def reload(self):
+        hospitals = self._load("hospital_dimension", "HOSPITAL_ID")
+        providers = self._load("provider_dimension", "INSURANCE_PROVIDER_ID")
+        plans = self._load("plan_dimension", "INSURANCE_PLAN_ID")
+        service_codes = self._load("service_code_dimension", "CODE")
+        self.hospitals = hospitals
+        self.providers = providers
+        self.plans = plans
+        self.service_codes = service_codes
+        self._index_locations()
+
+    # City and ZIP lookups over the hospital rows, so a location search resolves
+    # to hospital IDs without a warehouse round trip. Cities are keyed
+    # case-insensitively; ZIPs are kept sorted so a prefix is a range.
+    def _index_locations(self):
+        cities = self.hospitals["CITY"].fillna("").str.strip().str.upper()
+        self._city_rows = {city: rows for city, rows in cities.groupby(cities.to_numpy()).indices.items() if city}
+        zipcodes = self.hospitals["ZIPCODE"].fillna("").astype(str).str.strip().str[:5].to_numpy(dtype=str)
+        order = np.argsort(zipcodes, kind="stable")
+        self._zip_keys = zipcodes[order]
+        self._zip_rows = order
+
+    def _zip_prefix_rows(self, prefix):
+        start = np.searchsorted(self._zip_keys, prefix, side="left")
+        stop = np.searchsorted(self._zip_keys, prefix + "\uffff", side="left")
+        return self._zip_rows[start:stop]
+
+    # Hospital rows for a ZIP search: one ZIP, a prefix ("282") or a list
+    # ("28202, 28203"). ZIP+4 suffixes are ignored.
+    def hospitals_in_zipcodes(self, zipcodes):
+        if isinstance(zipcodes, str):
+            zipcodes = re.split(r"[\s,;]+", zipcodes)
+        prefixes = {z.strip().split("-")[0][:5] for z in zipcodes if z and z.strip()}
+        prefixes = [p for p in prefixes if p.isdigit()]
+        rows = [self._zip_prefix_rows(p) for p in prefixes]
+        rows = np.unique(np.concatenate(rows)) if rows else np.array([], dtype=int)
+        return self.hospitals.iloc[rows]
+
+    # A city search covers every hospital in the city's ZIP codes
+    def hospitals_in_city(self, city):
+        rows = self._city_rows.get((city or "").strip().upper(), [])
+        return self.hospitals_in_zipcodes(self.hospitals["ZIPCODE"].iloc[rows].astype(str).tolist())
+
+    # Attach labels to fact rows (HOSPITAL_ID, INSURANCE_PROVIDER_ID,
+    # INSURANCE_PLAN_ID, CODE + charges). Every fact row is kept: an ID or code
+    # missing from the cached tables gets MISSING_LABEL, so a page shows as many
+    # rows as the count query found. A code, payer or plan listed more than once
+    # takes its first label; a hospital ID shared by several campuses yields one
+    # row per campus. Pass a subset of self.hospitals to keep only those
+    # hospital rows (several hospitals share an ID, so filtering facts by ID
+    # alone is not enough).
+    def label(self, facts, hospitals=None, columns=NAVIGATOR_COLUMNS):
+        if hospitals is None:
+            hospitals = self.hospitals
+        else:
+            facts = facts[facts["HOSPITAL_ID"].isin(hospitals.index)]
+        labeled = (
+            facts
+            .join(_first_label(self.service_codes[["DESCRIPTION"]]), on="CODE", how="left")
+            .join(hospitals, on="HOSPITAL_ID", how="left")
+            .join(_first_label(self.providers), on="INSURANCE_PROVIDER_ID", how="left")
+            .join(_first_label(self.plans), on="INSURANCE_PLAN_ID", how="left")
+        )
+        for column in LABEL_COLUMNS:
+            labeled[column] = labeled[column].fillna(MISSING_LABEL)
+        return labeled[columns].reset_index(drop=True)
+
+
+def _first_label(table):
+    return table[~table.index.duplicated()]
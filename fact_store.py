@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from query_backend import get_backend, qualified_name
+from query_templates import MISSING_CHARGE
+
+# Columnar, dictionary-encoded copy of MASTER_TABLE for serving lookups locally.
+# Hospital, provider, plan, CPT and methodology columns are small integer codes
+# into sorted dictionaries and charges are float32, so a row costs about 22
+# bytes instead of several Python strings. Rows are sorted by CODE and
+# code_offsets[i] is where code i starts, so the rows of one CPT code are a
+# contiguous slice found with one binary search. Every array is a plain .npy file, so a saved store opens
+# memory-mapped and only the slices that are touched are read from disk.
+
+master_table = qualified_name("MASTER_TABLE")
+
+# Encoded column -> MASTER_TABLE column
+KEY_COLUMNS = {
+    "hospital": "HOSPITAL_ID",
+    "provider": "INSURANCE_PROVIDER_ID",
+    "plan": "INSURANCE_PLAN_ID",
+    "code": "CODE",
+    "methodology": "METHODOLOGY",
+}
+
+# Keys whose dictionaries hold strings, even when every value is missing
+TEXT_KEYS = {"hospital", "code", "methodology"}
+
+CHARGE_COLUMNS = {
+    "dollar": "STANDARD_CHARGE_DOLLAR",
+    "minimum": "MINIMUM_CHARGE",
+    "maximum": "MAXIMUM_CHARGE",
+}
+
+# Same columns, in the same order, as the Navigator fact templates
+FACT_COLUMNS = [
+    "HOSPITAL_ID", "INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID", "CODE",
+    "STANDARD_CHARGE_DOLLAR", "MINIMUM_CHARGE", "MAXIMUM_CHARGE", "METHODOLOGY",
+]
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 2
+
+
+# Smallest signed integer type that holds every code (-1 marks a missing value)
+def _code_dtype(size):
+    return np.int16 if size < np.iinfo(np.int16).max else np.int32
+
+
+# Sorted dictionary of a key column. String IDs keep their leading zeros and are
+# stored fixed-width so the dictionary itself can be memory-mapped.
+def _dictionary(values, text=False):
+    values = pd.unique(pd.Series(values).dropna())
+    if text or (len(values) and isinstance(values[0], str)):
+        return np.sort(np.asarray(values, dtype=str))
+    return np.sort(np.asarray(values, dtype=np.int64))
+
+
+def _encode(values, dictionary):
+    values = pd.Series(values)
+    missing = values.isna().to_numpy()
+    if not len(dictionary):
+        return np.full(len(values), -1, dtype=_code_dtype(0))
+    lookup = values.fillna(dictionary[0]).to_numpy(dtype=dictionary.dtype)
+    codes = np.searchsorted(dictionary, lookup).astype(_code_dtype(len(dictionary)))
+    codes[missing] = -1
+    return codes
+
+
+class FactStore:
+    def __init__(self, dictionaries, columns, code_offsets):
+        self.dictionaries = dictionaries
+        self.columns = columns
+        self.code_offsets = code_offsets
+
+    def __len__(self):
+        return len(self.columns["code"])
+
+    @property
+    def nbytes(self):
+        arrays = list(self.dictionaries.values()) + list(self.columns.values()) + [self.code_offsets]
+        return sum(array.nbytes for array in arrays)
+
+    # Build from DataFrames of MASTER_TABLE rows (e.g. one per hospital). Each
+    # frame is encoded against its own dictionary as it arrives and the codes
+    # are remapped once at the end, so frames can be streamed from a generator
+    # and the full table never exists as Python strings at once.
+    @classmethod
+    def from_frames(cls, frames):
+        parts = {key: [] for key in KEY_COLUMNS}
+        columns = {key: [] for key in CHARGE_COLUMNS}
+        for frame in frames:
+            for key, column in KEY_COLUMNS.items():
+                dictionary = _dictionary(frame[column], key in TEXT_KEYS)
+                parts[key].append((dictionary, _encode(frame[column], dictionary)))
+            for key, column in CHARGE_COLUMNS.items():
+                columns[key].append(pd.to_numeric(frame[column]).to_numpy(dtype=np.float32, na_value=np.nan))
+
+        dictionaries = {}
+        for key, encoded in parts.items():
+            seen = [local for local, _ in encoded if len(local)]
+            dictionary = _dictionary(np.concatenate(seen) if seen else [], key in TEXT_KEYS)
+            dtype = _code_dtype(len(dictionary))
+            remapped = [
+                np.where(codes >= 0, np.searchsorted(dictionary, local)[np.clip(codes, 0, None)], -1).astype(dtype)
+                if len(local) else codes.astype(dtype)
+                for local, codes in encoded
+            ]
+            dictionaries[key] = dictionary
+            columns[key] = np.concatenate(remapped) if remapped else np.array([], dtype=dtype)
+        for key in CHARGE_COLUMNS:
+            columns[key] = np.concatenate(columns[key]) if columns[key] else np.array([], dtype=np.float32)
+
+        # CODE first, then hospital and price, so each code's slice is already
+        # grouped by hospital and in price order
+        order = np.lexsort((columns["dollar"], columns["hospital"], columns["code"]))
+        columns = {key: array[order] for key, array in columns.items()}
+        code_offsets = np.searchsorted(columns["code"], np.arange(len(dictionaries["code"]) + 1)).astype(np.int64)
+        return cls(dictionaries, columns, code_offsets)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls.from_frames([df])
+
+    # Read MASTER_TABLE one hospital at a time through a query backend
+    @classmethod
+    def from_backend(cls, backend):
+        hospital_ids = backend.run(f"SELECT DISTINCT HOSPITAL_ID FROM {master_table}")["HOSPITAL_ID"].dropna()
+        columns = ", ".join(FACT_COLUMNS)
+        frames = (
+            backend.run(f"SELECT {columns} FROM {master_table} WHERE HOSPITAL_ID = ?", [hospital_id])
+            for hospital_id in sorted(hospital_ids)
+        )
+        return cls.from_frames(frames)
+
+    # Write every array as .npy next to a manifest; the directory is replaced
+    # in one rename so readers never see a half-written store
+    def save(self, directory):
+        directory = os.path.abspath(directory)
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix=".fact_store.")
+        try:
+            arrays = {"code_offsets": self.code_offsets}
+            arrays.update({f"dictionary_{key}": array for key, array in self.dictionaries.items()})
+            arrays.update({f"column_{key}": array for key, array in self.columns.items()})
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            manifest = {"version": FORMAT_VERSION, "rows": len(self), "arrays": sorted(arrays)}
+            with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+
+            previous = None
+            if os.path.exists(directory):
+                previous = tempfile.mkdtemp(dir=parent, prefix=".fact_store.old.")
+                os.rmdir(previous)
+                os.replace(directory, previous)
+            os.replace(staging, directory)
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported fact store version {manifest['version']} in {directory}")
+        mode = "r" if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+
+        dictionaries = {key: array(f"dictionary_{key}") for key in KEY_COLUMNS}
+        columns = {key: array(f"column_{key}") for key in list(KEY_COLUMNS) + list(CHARGE_COLUMNS)}
+        return cls(dictionaries, columns, array("code_offsets"))
+
+    # Dictionary position of each value, or -1 when the store has never seen it
+    def lookup(self, key, values):
+        dictionary = self.dictionaries[key]
+        if not len(dictionary):
+            return np.full(len(values), -1)
+        # Strings are compared at their own width so a longer value cannot be
+        # truncated into a false match
+        values = np.asarray(values, dtype=str if dictionary.dtype.kind == "U" else dictionary.dtype)
+        positions = np.searchsorted(dictionary, values)
+        found = positions < len(dictionary)
+        found[found] = dictionary[positions[found]] == values[found]
+        return np.where(found, positions, -1)
+
+    def code_slice(self, code):
+        position = self.lookup("code", [str(code).strip()])[0]
+        if position < 0:
+            return slice(0, 0)
+        return slice(int(self.code_offsets[position]), int(self.code_offsets[position + 1]))
+
+    # Row positions for one CPT code (or every row), optionally limited to
+    # some hospitals
+    def select(self, code=None, hospital_ids=None):
+        rows = self.code_slice(code) if code is not None else slice(0, len(self))
+        positions = np.arange(rows.start, rows.stop)
+        if hospital_ids is not None:
+            hospitals = self.lookup("hospital", list(hospital_ids))
+            hospitals = hospitals[hospitals >= 0]
+            positions = positions[np.isin(self.columns["hospital"][rows], hospitals)]
+        return positions
+
+    def _decode(self, key, codes):
+        dictionary = self.dictionaries[key]
+        values = dictionary[np.clip(codes, 0, None)] if len(dictionary) else np.zeros(len(codes), dtype=dictionary.dtype)
+        if dictionary.dtype.kind == "U":
+            values = pd.array(values, dtype="string")
+        else:
+            values = pd.array(values, dtype="Int64")
+        values[codes < 0] = pd.NA
+        return values
+
+    # MASTER_TABLE rows at the given positions, decoded to FACT_COLUMNS
+    def frame(self, positions):
+        data = {}
+        for key, column in KEY_COLUMNS.items():
+            data[column] = self._decode(key, self.columns[key][positions])
+        for key, column in CHARGE_COLUMNS.items():
+            data[column] = self.columns[key][positions].astype(np.float64)
+        return pd.DataFrame(data, columns=FACT_COLUMNS)
+
+    # Rows of one code, optionally limited to some hospitals
+    def rows(self, code, hospital_ids=None):
+        return self.frame(self.select(code, hospital_ids))
+
+    # Positions of the priced rows of one code at the given hospitals (every
+    # hospital for None), optionally limited to some providers and plans
+    def _priced(self, code, hospital_ids, provider_ids=None, plan_ids=None):
+        positions = self.select(code, hospital_ids)
+        for key, ids in (("provider", provider_ids), ("plan", plan_ids)):
+            if ids is not None:
+                codes = self.lookup(key, list(ids))
+                positions = positions[np.isin(self.columns[key][positions], codes[codes >= 0])]
+        return positions[~np.isnan(self.columns["dollar"][positions])]
+
+    # Same count as the navigator_hospitals_count template
+    def count(self, code, hospital_ids, provider_ids=None, plan_ids=None):
+        return len(self._priced(code, hospital_ids, provider_ids, plan_ids))
+
+    # Where a value sits among the codes of a key column. Dictionaries are
+    # sorted, so ordering the codes orders the values; a value missing from
+    # the dictionary sits between two codes.
+    def _position(self, key, value):
+        dictionary = self.dictionaries[key]
+        value = np.asarray([value], dtype=str if dictionary.dtype.kind == "U" else dictionary.dtype)
+        index = int(np.searchsorted(dictionary, value)[0])
+        found = index < len(dictionary) and dictionary[index] == value[0]
+        return index if found else index - 0.5
+
+    # The NAVIGATOR_PAGE_KEY of each row, with NULLs replaced as in the SQL
+    def _page_keys(self, positions):
+        keys = [self.columns["dollar"][positions].astype(np.float64)]
+        keys += [self.columns[key][positions] for key in ("hospital", "provider", "plan")]
+        for key in ("minimum", "maximum"):
+            values = self.columns[key][positions].astype(np.float64)
+            keys.append(np.where(np.isnan(values), MISSING_CHARGE, values))
+        methodology = self.columns["methodology"][positions]
+        keys.append(np.where(methodology >= 0, methodology, self._position("methodology", "")))
+        return keys
+
+    # Same rows as a navigator_hospitals_page template: up to limit rows after
+    # the cursor (query_templates.navigator_cursor of the previous page's last
+    # row), or the first rows when after is None
+    def page(self, code, hospital_ids, limit, after=None, provider_ids=None, plan_ids=None):
+        positions = self._priced(code, hospital_ids, provider_ids, plan_ids)
+        keys = self._page_keys(positions)
+        if after is not None:
+            cursor = [float(after[0])]
+            cursor += [self._position(key, value) for key, value in zip(("hospital", "provider", "plan"), after[1:4])]
+            cursor += [float(after[4]), float(after[5]), self._position("methodology", after[6])]
+            later = np.zeros(len(positions), dtype=bool)
+            tied = np.ones(len(positions), dtype=bool)
+            for values, bound in zip(keys, cursor):
+                later |= tied & (values > bound)
+                tied &= values == bound
+            positions = positions[later]
+            keys = [values[later] for values in keys]
+        order = np.lexsort(keys[::-1])[:limit]
+        return self.frame(positions[order])
+
+    # Same rows as the navigator_cheapest template
+    def cheapest(self, code, limit=10):
+        return self.page(code, None, limit).drop(columns="METHODOLOGY")
+
+    # COUNT / SUM / MEAN / MEDIAN / MIN / MAX of STANDARD_CHARGE_DOLLAR grouped by
+    # one key column ("hospital", "provider", "plan" or "code") over the selected
+    # rows. Only positive prices count, like the dashboard's SQL.
+    def group_by(self, key, code=None, hospital_ids=None):
+        positions = self.select(code, hospital_ids)
+        keys = self.columns[key][positions]
+        values = self.columns["dollar"][positions]
+        keep = (values > 0) & (keys >= 0)
+        keys = keys[keep]
+        values = values[keep].astype(np.float64)
+
+        order = np.lexsort((values, keys))
+        keys = keys[order]
+        values = values[order]
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            ends = np.r_[starts[1:], len(keys)]
+            sums = np.add.reduceat(values, starts)
+        else:
+            starts = ends = np.array([], dtype=np.int64)
+            sums = np.array([], dtype=np.float64)
+        counts = ends - starts
+        return pd.DataFrame({
+            KEY_COLUMNS[key]: self._decode(key, keys[starts]),
+            "CHARGE_COUNT": counts,
+            "CHARGE_SUM": sums,
+            "MEAN_CHARGE": sums / np.maximum(counts, 1),
+            "MEDIAN_CHARGE": (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2,
+            "MIN_CHARGE": values[starts],
+            "MAX_CHARGE": values[ends - 1],
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dictionary-encoded MASTER_TABLE fact store")
+    parser.add_argument("output_dir")
+    parser.add_argument("--backend", help="snowflake or local (defaults to HEALTH_NAV_BACKEND)")
+    args = parser.parse_args()
+
+    store = FactStore.from_backend(get_backend(args.backend))
+    store.save(args.output_dir)
+    print(f"Wrote {len(store)} rows, {len(store.dictionaries['code'])} codes "
+          f"({store.nbytes / 1024 / 1024:.1f} MB) to {args.output_dir}")
@@ -0,0 +1,237 @@
+import argparse
+import time
+
+from aggregates import (ensure_derived_tables, refresh_charge_sketches, refresh_cheapest_offers,
+                        refresh_cpt_price_index, refresh_hospital_price_stats, refresh_payer_geo_stats)
+from data_versions import bump_data_versions
+from query_backend import get_backend, qualified_name
+
+# Incremental MASTER_TABLE loader. Each fact row is identified by a fingerprint
+# (HASH over all of its columns), so reloading a hospital only deletes the rows
+# that disappeared and inserts the rows that are new; unchanged rows are never
+# rewritten. Invalid rows (unknown payer/plan/code, zero or missing price) are
+# dropped while staging, so no clean-up DELETE over the whole table is needed.
+# Every load that changes rows gives MASTER_TABLE a new data version stamp, which
+# is what the dashboard's caches are keyed on.
+
+master_table = qualified_name("MASTER_TABLE")
+cleaned_table = qualified_name("CLEANED_CHARGES")
+provider_table = qualified_name("INSURANCE_PROVIDERS")
+plan_table = qualified_name("INSURANCE_PLANS")
+service_code_table = qualified_name("SERVICE_CODES")
+stage_table = qualified_name("MASTER_TABLE_STAGE")
+removed_table = qualified_name("MASTER_TABLE_REMOVED")
+delta_table = qualified_name("MASTER_TABLE_DELTA")
+
+FACT_COLUMNS = [
+    "HOSPITAL_ID", "INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID", "CODE",
+    "STANDARD_CHARGE_DOLLAR", "MAXIMUM_CHARGE", "MINIMUM_CHARGE", "METHODOLOGY"
+]
+
+# A changed price for the same hospital/payer/plan/code counts as an update (see _delta_counts)
+KEY_COLUMNS = ["HOSPITAL_ID", "INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID", "CODE"]
+
+
+def _columns(alias=None, columns=FACT_COLUMNS):
+    return ", ".join(f"{alias}.{c}" if alias else c for c in columns)
+
+
+def row_fingerprint_sql(alias=None):
+    return f"HASH({_columns(alias)})"
+
+
+def key_fingerprint_sql(alias=None):
+    return f"HASH({_columns(alias, KEY_COLUMNS)})"
+
+
+# Cleaned rows for one hospital resolved to MASTER_TABLE IDs. The stage table is
+# created from MASTER_TABLE so values take the target's column types before they
+# are fingerprinted.
+def _stage_hospital(backend, hospital_id, source_table, target=stage_table):
+    backend.run(f"CREATE OR REPLACE TABLE {target} AS SELECT * FROM {master_table} WHERE 1 = 0")
+    backend.run(f"""
+        INSERT INTO {target} ({_columns()})
+        SELECT DISTINCT
+            c.HOSPITAL_ID,
+            ip.INSURANCE_PROVIDER_ID,
+            pl.INSURANCE_PLAN_ID,
+            sc.CODE,
+            c.STANDARD_CHARGE_DOLLAR,
+            c.MAXIMUM_CHARGE,
+            c.MINIMUM_CHARGE,
+            NULL
+        FROM {source_table} c
+        JOIN {provider_table} ip ON c.PAYER_NAME = ip.PAYER_NAME
+        JOIN {plan_table} pl ON c.PLAN_NAME = pl.PLAN_NAME
+        JOIN (SELECT DISTINCT CODE FROM {service_code_table}) sc ON c.CODE = sc.CODE
+        WHERE c.HOSPITAL_ID = ?
+        AND c.STANDARD_CHARGE_DOLLAR > 0
+    """, [hospital_id])
+
+
+# Rows to insert (fingerprint only in the stage) and delete (only in MASTER_TABLE)
+def _build_delta(backend, hospital_id):
+    backend.run(f"""
+        CREATE OR REPLACE TABLE {delta_table} AS
+        WITH s AS (
+            SELECT DISTINCT {_columns()}, {row_fingerprint_sql()} as ROW_HASH, {key_fingerprint_sql()} as KEY_HASH
+            FROM {stage_table}
+            WHERE STANDARD_CHARGE_DOLLAR > 0
+        ),
+        t AS (
+            SELECT DISTINCT {_columns()}, {row_fingerprint_sql()} as ROW_HASH, {key_fingerprint_sql()} as KEY_HASH
+            FROM {master_table}
+            WHERE HOSPITAL_ID = ?
+        )
+        SELECT 'insert' as ACTION, s.* FROM s WHERE s.ROW_HASH NOT IN (SELECT ROW_HASH FROM t)
+        UNION ALL
+        SELECT 'delete' as ACTION, t.* FROM t WHERE t.ROW_HASH NOT IN (SELECT ROW_HASH FROM s)
+    """, [hospital_id])
+
+
+# Row counts. Within one key, each inserted row paired with a deleted row is
+# one updated row; the inserts or deletes left over are inserted or deleted
+# rows. A key that goes from one price to two is one update and one insert.
+def _delta_counts(backend):
+    counts = backend.run(f"""
+        WITH k AS (
+            SELECT
+                KEY_HASH,
+                COUNT(CASE WHEN ACTION = 'insert' THEN 1 END) as INSERTS,
+                COUNT(CASE WHEN ACTION = 'delete' THEN 1 END) as DELETES
+            FROM {delta_table}
+            GROUP BY KEY_HASH
+        )
+        SELECT
+            COALESCE(SUM(INSERTS - LEAST(INSERTS, DELETES)), 0) as INSERTED,
+            COALESCE(SUM(LEAST(INSERTS, DELETES)), 0) as UPDATED,
+            COALESCE(SUM(DELETES - LEAST(INSERTS, DELETES)), 0) as DELETED
+        FROM k
+    """)
+    return {column.lower(): int(counts[column].iloc[0]) for column in counts.columns}
+
+
+def _staged_rows(backend):
+    counts = backend.run(f"""
+        SELECT COUNT(*) as N FROM (SELECT DISTINCT {_columns()} FROM {stage_table} WHERE STANDARD_CHARGE_DOLLAR > 0) s
+    """)
+    return int(counts["N"].iloc[0])
+
+
+def _apply_delta(backend, hospital_id):
+    backend.run(f"""
+        DELETE FROM {master_table}
+        WHERE HOSPITAL_ID = ?
+        AND {row_fingerprint_sql()} IN (SELECT ROW_HASH FROM {delta_table} WHERE ACTION = 'delete')
+    """, [hospital_id])
+    backend.run(f"""
+        INSERT INTO {master_table} ({_columns()})
+        SELECT {_columns()} FROM {delta_table} WHERE ACTION = 'insert'
+    """)
+
+
+def _apply_and_refresh(backend, hospital_id, report, refresh_derived):
+    if not (report["inserted"] or report["updated"] or report["deleted"]):
+        return
+    if refresh_derived:
+        # Built from the rows before this change, which the refresh then applies.
+        # This is DDL, so it runs before the transaction (Snowflake commits on DDL).
+        ensure_derived_tables(backend)
+    # The DELETE, the INSERT and the refresh commit together: a failure part way
+    # leaves MASTER_TABLE and the derived tables as they were
+    with backend.transaction():
+        _apply_delta(backend, hospital_id)
+        if refresh_derived:
+            codes = backend.run(f"SELECT DISTINCT CODE FROM {delta_table}")["CODE"].tolist()
+            refresh_hospital_price_stats(backend, [hospital_id])
+            refresh_cpt_price_index(backend, codes)
+            refresh_charge_sketches(backend, [hospital_id])
+            refresh_payer_geo_stats(backend, [hospital_id])
+            refresh_cheapest_offers(backend, codes)
+    # Stamped after the derived tables, so a new stamp never serves stale rollups
+    bump_data_versions(backend, ["MASTER_TABLE"])
+
+
+def _drop_work_tables(backend):
+    for table in (stage_table, removed_table, delta_table):
+        backend.run(f"DROP TABLE IF EXISTS {table}")
+
+
+# Bring MASTER_TABLE in line with the cleaned rows of one hospital. Returns
+# inserted / updated / deleted / unchanged row counts.
+def load_hospital(backend, hospital_id, source_table=cleaned_table, refresh_derived=True):
+    start = time.time()
+    try:
+        _stage_hospital(backend, hospital_id, source_table)
+        _build_delta(backend, hospital_id)
+        report = _delta_counts(backend)
+        report["unchanged"] = _staged_rows(backend) - report["inserted"] - report["updated"]
+        _apply_and_refresh(backend, hospital_id, report, refresh_derived)
+    finally:
+        _drop_work_tables(backend)
+    report["hospital_id"] = hospital_id
+    report["seconds"] = round(time.time() - start, 2)
+    return report
+
+
+# Apply a change file from the ingestion pipeline's delta loader (rows with
+# ACTION "insert" or "delete"), so only rows that changed in the source file
+# reach MASTER_TABLE. Hospitals sharing a HOSPITAL_ID (the Novant campuses)
+# share MASTER_TABLE rows, so a row one of them dropped is deleted for all.
+def apply_changes(backend, hospital_id, changes_table, refresh_derived=True):
+    start = time.time()
+    try:
+        _stage_hospital(backend, hospital_id, f"(SELECT * FROM {changes_table} WHERE ACTION = 'insert')")
+        _stage_hospital(backend, hospital_id, f"(SELECT * FROM {changes_table} WHERE ACTION = 'delete')",
+                        target=removed_table)
+        backend.run(f"""
+            CREATE OR REPLACE TABLE {delta_table} AS
+            WITH t AS (
+                SELECT DISTINCT {row_fingerprint_sql()} as ROW_HASH
+                FROM {master_table}
+                WHERE HOSPITAL_ID = ?
+            )
+            SELECT DISTINCT 'insert' as ACTION, {_columns()}, {row_fingerprint_sql()} as ROW_HASH, {key_fingerprint_sql()} as KEY_HASH
+            FROM {stage_table}
+            WHERE STANDARD_CHARGE_DOLLAR > 0
+            AND {row_fingerprint_sql()} NOT IN (SELECT ROW_HASH FROM t)
+            UNION ALL
+            SELECT DISTINCT 'delete' as ACTION, {_columns()}, {row_fingerprint_sql()} as ROW_HASH, {key_fingerprint_sql()} as KEY_HASH
+            FROM {removed_table}
+            WHERE {row_fingerprint_sql()} IN (SELECT ROW_HASH FROM t)
+        """, [hospital_id])
+        report = _delta_counts(backend)
+        _apply_and_refresh(backend, hospital_id, report, refresh_derived)
+    finally:
+        _drop_work_tables(backend)
+    report["hospital_id"] = hospital_id
+    report["seconds"] = round(time.time() - start, 2)
+    return report
+
+
+# changes_table switches from full reloads to applying delta-loader change rows
+def load_hospitals(backend, hospital_ids, source_table=cleaned_table, refresh_derived=True, changes_table=None):
+    reports = []
+    for hospital_id in hospital_ids:
+        if changes_table:
+            report = apply_changes(backend, hospital_id, changes_table, refresh_derived)
+        else:
+            report = load_hospital(backend, hospital_id, source_table, refresh_derived)
+        unchanged = f", {report['unchanged']} unchanged" if "unchanged" in report else ""
+        print(f"{hospital_id}: {report['inserted']} inserted, {report['updated']} updated, "
+              f"{report['deleted']} deleted{unchanged} in {report['seconds']}s")
+        reports.append(report)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally load cleaned hospital rows into MASTER_TABLE")
+    parser.add_argument("hospital_ids", nargs="+")
+    parser.add_argument("--source-table", default=cleaned_table)
+    parser.add_argument("--changes-table", help="Apply ACTION insert/delete rows from this table instead")
+    parser.add_argument("--backend", help="snowflake or local (defaults to HEALTH_NAV_BACKEND)")
+    parser.add_argument("--no-refresh", action="store_true", help="Skip refreshing the derived tables")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    load_hospitals(backend, args.hospital_ids, args.source_table, not args.no_refresh, args.changes_table)
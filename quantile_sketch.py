@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Mergeable quantile sketch for charges (the DDSketch scheme). A positive charge
+# x falls in bucket CEIL(LN(x) / LN(GAMMA)), so every charge in a bucket is
+# within RELATIVE_ACCURACY of the bucket's representative value. A sketch is just
+# a count per bucket: sketches for several hospitals or cities merge by adding
+# the counts of equal buckets (a SUM ... GROUP BY in SQL), and a quantile of
+# the merged sketch is the representative of the bucket holding that rank. The
+# estimate is within RELATIVE_ACCURACY of a charge at the requested rank,
+# however many sketches were merged.
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+# Quantiles the Cost Explorer shows
+QUANTILES = {"P10_CHARGE": 0.10, "MEDIAN_CHARGE": 0.50, "P90_CHARGE": 0.90}
+
+
+# SQL expression for the bucket of a positive charge column
+def bucket_sql(column):
+    return f"CAST(CEIL(LN({column}) / {math.log(GAMMA)!r}) AS INTEGER)"
+
+
+def bucket_of(values):
+    return np.ceil(np.log(np.asarray(values, dtype=np.float64)) / math.log(GAMMA)).astype(np.int64)
+
+
+# The value a bucket stands for: the point with equal relative error to both
+# of its bounds
+def bucket_value(buckets):
+    return 2 * GAMMA ** np.asarray(buckets, dtype=np.float64) / (GAMMA + 1)
+
+
+# Quantiles of merged sketches. buckets has a BUCKET and a BUCKET_COUNT column
+# plus the group columns in by; rows with the same group and bucket are merged.
+# Returns one row per group with CHARGE_COUNT and one column per quantile
+# (QUANTILES by default). With no group columns every row merges into one sketch.
+def quantiles(buckets, by=(), quantiles=QUANTILES):
+    by = list(by)
+    columns = by + ["CHARGE_COUNT"] + list(quantiles)
+    if buckets.empty:
+        return pd.DataFrame(columns=columns)
+    merged = buckets.groupby(by + ["BUCKET"], sort=True)["BUCKET_COUNT"].sum().reset_index()
+    group = merged.groupby(by, sort=False).ngroup().to_numpy() if by else np.zeros(len(merged), dtype=np.int64)
+    counts = merged["BUCKET_COUNT"].to_numpy(dtype=np.int64)
+    cumulative = np.cumsum(counts)
+    # Rows are sorted by group, so each group's running count is the global
+    # running count minus the total of the groups before it
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    before = np.r_[0, cumulative[starts[1:] - 1]]
+    totals = np.add.reduceat(counts, starts)
+    cumulative -= np.repeat(before, np.diff(np.r_[starts, len(merged)]))
+
+    result = merged.iloc[starts][by].reset_index(drop=True)
+    result["CHARGE_COUNT"] = totals
+    bucket = merged["BUCKET"].to_numpy()
+    for column, q in quantiles.items():
+        # 0-based rank of the charge at quantile q (the lower of two middles)
+        rank = np.floor(q * (totals - 1)).astype(np.int64)
+        past = cumulative > np.repeat(rank, np.diff(np.r_[starts, len(merged)]))
+        # First bucket of each group whose running count passes the rank
+        first = np.flatnonzero(past & np.r_[True, ~past[:-1] | (group[1:] != group[:-1])])
+        result[column] = bucket_value(bucket[first])
+    return result[columns]
@@ -0,0 +1,321 @@
+import os
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Every dashboard query addresses tables as HEALTH_NAV.CORE.<TABLE>
+DATABASE = "HEALTH_NAV"
+SCHEMA = "CORE"
+
+# Core tables shipped in HEALTH_NAV_Database_Tables.zip
+CORE_TABLES = [
+    "HOSPITAL_DATA",
+    "INSURANCE_PROVIDERS",
+    "INSURANCE_PLANS",
+    "SERVICE_CODES",
+    "MASTER_TABLE",
+]
+
+# Column types for the local engine (IDs, codes and ZIPs keep their leading zeros)
+TABLE_DTYPES = {
+    "HOSPITAL_DATA": {
+        "HOSPITAL_NAME": "string",
+        "HOSPITAL_ID": "string",
+        "CITY": "string",
+        "STATE": "string",
+        "ZIPCODE": "string",
+    },
+    "INSURANCE_PROVIDERS": {
+        "INSURANCE_PROVIDER_ID": "Int64",
+        "PAYER_NAME": "string",
+    },
+    "INSURANCE_PLANS": {
+        "INSURANCE_PLAN_ID": "Int64",
+        "PLAN_NAME": "string",
+    },
+    "SERVICE_CODES": {
+        "CODE": "string",
+        "CODE_TYPE": "string",
+        "DESCRIPTION": "string",
+    },
+    "MASTER_TABLE": {
+        "HOSPITAL_ID": "string",
+        "INSURANCE_PROVIDER_ID": "Int64",
+        "INSURANCE_PLAN_ID": "Int64",
+        "CODE": "string",
+        "STANDARD_CHARGE_DOLLAR": "float64",
+        "MAXIMUM_CHARGE": "float64",
+        "MINIMUM_CHARGE": "float64",
+        "METHODOLOGY": "string",
+    },
+}
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "HEALTH_NAV_Database_Tables.zip")
+
+
+def qualified_name(table):
+    return f"{DATABASE}.{SCHEMA}.{table}"
+
+
+# Base class for the engines that can serve dashboard queries
+class QueryBackend:
+    name = "base"
+
+    # Run a query (optionally with ? bind parameters) and return a DataFrame
+    def run(self, query, params=None):
+        raise NotImplementedError
+
+    # run() plus execution details for query_metrics: milliseconds until the
+    # first row was available and the engine's query ID where it has one
+    def run_measured(self, query, params=None):
+        start = time.perf_counter()
+        df = self.run(query, params)
+        return df, {"first_row_ms": (time.perf_counter() - start) * 1000, "query_id": None}
+
+    # Names of the tables that exist in HEALTH_NAV.CORE
+    def list_tables(self):
+        raise NotImplementedError
+
+    # Table name -> when the engine last changed it, for every table in
+    # HEALTH_NAV.CORE (None where the engine does not track it)
+    def last_altered(self):
+        return {table: None for table in self.list_tables()}
+
+    # Statements run inside the block commit together, or not at all if it raises
+    @contextmanager
+    def transaction(self):
+        self.run("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.run("ROLLBACK")
+            raise
+        self.run("COMMIT")
+
+    def close(self):
+        pass
+
+
+# Snowflake warehouse backend using the active Snowpark session
+class SnowflakeBackend(QueryBackend):
+    name = "snowflake"
+
+    def __init__(self, session=None):
+        if session is None:
+            from snowflake.snowpark.context import get_active_session
+            session = get_active_session()
+        self.session = session
+
+    def _sql(self, query, params):
+        if params:
+            return self.session.sql(query, params=list(params))
+        return self.session.sql(query)
+
+    def run(self, query, params=None):
+        if query.strip().upper().startswith(("SELECT", "WITH")):
+            return self._sql(query, params).to_pandas()
+        result = self._sql(query, params).collect()
+        if result:
+            data = [row.asDict() for row in result]
+            return pd.DataFrame(data)
+        return pd.DataFrame()
+
+    # Results are fetched batch by batch so the first batch marks the first row;
+    # the query ID comes from the session's query history
+    def run_measured(self, query, params=None):
+        if not query.strip().upper().startswith(("SELECT", "WITH")):
+            return super().run_measured(query, params)
+        start = time.perf_counter()
+        first_row_ms = None
+        frames = []
+        with self.session.query_history() as history:
+            df = self._sql(query, params)
+            for batch in df.to_pandas_batches():
+                if first_row_ms is None:
+                    first_row_ms = (time.perf_counter() - start) * 1000
+                frames.append(batch)
+        if frames:
+            result = pd.concat(frames, ignore_index=True)
+        else:
+            result = pd.DataFrame(columns=df.schema.names)
+        query_id = history.queries[-1].query_id if history.queries else None
+        return result, {"first_row_ms": first_row_ms, "query_id": query_id}
+
+    def list_tables(self):
+        tables = self.run(
+            f"SELECT TABLE_NAME FROM {DATABASE}.INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = ?", [SCHEMA]
+        )
+        return tables["TABLE_NAME"].tolist()
+
+    # LAST_ALTERED moves with every DML or DDL statement on the table, however
+    # the data was loaded
+    def last_altered(self):
+        tables = self.run(
+            f"SELECT TABLE_NAME, LAST_ALTERED FROM {DATABASE}.INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = ?",
+            [SCHEMA]
+        )
+        return {table: str(altered) for table, altered in zip(tables["TABLE_NAME"], tables["LAST_ALTERED"])}
+
+
+# Read one core table from a zip archive of CSVs (the first column is a pandas index)
+def _read_zipped_csv(archive, table):
+    with archive.open(f"{table}.csv") as f:
+        df = pd.read_csv(f, index_col=0, dtype=TABLE_DTYPES[table])
+    return df.reset_index(drop=True)
+
+
+# Embedded DuckDB backend serving the same SQL from local CSV/Parquet copies
+class LocalBackend(QueryBackend):
+    name = "local"
+
+    def __init__(self, source=None, tables=None):
+        import duckdb
+
+        self.source = source or DEFAULT_DATA_PATH
+        self.connection = duckdb.connect(database=":memory:")
+        self.connection.execute(f"ATTACH ':memory:' AS {DATABASE}")
+        self.connection.execute(f"CREATE SCHEMA IF NOT EXISTS {DATABASE}.{SCHEMA}")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if tables is not None:
+            for table, df in tables.items():
+                self.load_dataframe(table, df)
+            versions = {table: None for table in tables}
+        elif self.source.lower().endswith(".zip"):
+            versions = self._load_zip(self.source)
+        else:
+            versions = self._load_directory(self.source)
+
+        self.build_derived_tables()
+        self.record_data_versions(versions)
+
+    # Stamp each loaded table from its source files, so every process that
+    # loads the same files shares cache entries; in-memory tables get new stamps
+    def record_data_versions(self, versions):
+        from data_versions import bump_data_versions, new_version
+        bump_data_versions(self, {table: version or new_version() for table, version in versions.items()})
+
+    # Precompute the rollups the dashboard reads instead of MASTER_TABLE
+    def build_derived_tables(self):
+        from aggregates import build_derived_tables
+        build_derived_tables(self)
+
+    # Both loaders return the source stamp of each table they loaded
+    def _load_zip(self, path):
+        from data_versions import source_version
+        version = source_version(path)
+        versions = {}
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+            for table in CORE_TABLES:
+                if f"{table}.csv" in names:
+                    self.load_dataframe(table, _read_zipped_csv(archive, table))
+                    versions[table] = version
+        return versions
+
+    # A directory may hold TABLE.parquet, a TABLE/ Parquet dataset, or TABLE.csv
+    def _load_directory(self, path):
+        from data_versions import source_version
+        versions = {}
+        for table in CORE_TABLES:
+            parquet_file = os.path.join(path, f"{table}.parquet")
+            parquet_dir = os.path.join(path, table)
+            csv_file = os.path.join(path, f"{table}.csv")
+            if os.path.isfile(parquet_file):
+                self._create_from_parquet(table, parquet_file)
+                versions[table] = source_version(parquet_file)
+            elif os.path.isdir(parquet_dir):
+                self._create_from_parquet(table, os.path.join(parquet_dir, "**", "*.parquet"))
+                versions[table] = source_version(parquet_dir)
+            elif os.path.isfile(csv_file):
+                df = pd.read_csv(csv_file, dtype=TABLE_DTYPES[table])
+                df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed")])
+                self.load_dataframe(table, df)
+                versions[table] = source_version(csv_file)
+        return versions
+
+    # Partition values stay strings: hospital IDs such as 0004994 keep their leading zeros
+    def _create_from_parquet(self, table, pattern):
+        self.connection.execute(
+            f"CREATE OR REPLACE TABLE {qualified_name(table)} AS "
+            f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, hive_types_autocast = false)"
+        )
+
+    # Replace a table with the contents of a DataFrame
+    def load_dataframe(self, table, df):
+        with self._lock:
+            self.connection.register("_incoming", df)
+            try:
+                self.connection.execute(f"CREATE OR REPLACE TABLE {qualified_name(table)} AS SELECT * FROM _incoming")
+            finally:
+                self.connection.unregister("_incoming")
+
+    # A cursor per call lets several threads share the in-process database; a
+    # thread inside transaction() keeps using the transaction's cursor
+    @contextmanager
+    def _cursor(self):
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is not None:
+            yield cursor
+            return
+        cursor = self.connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def run(self, query, params=None):
+        with self._cursor() as cursor:
+            cursor.execute(query, list(params) if params else None)
+            if cursor.description is None:
+                return pd.DataFrame()
+            return cursor.df()
+
+    # DuckDB runs the query on execute(); fetching the DataFrame follows
+    def run_measured(self, query, params=None):
+        start = time.perf_counter()
+        with self._cursor() as cursor:
+            cursor.execute(query, list(params) if params else None)
+            first_row_ms = (time.perf_counter() - start) * 1000
+            df = pd.DataFrame() if cursor.description is None else cursor.df()
+        return df, {"first_row_ms": first_row_ms, "query_id": None}
+
+    @contextmanager
+    def transaction(self):
+        cursor = self.connection.cursor()
+        self._local.cursor = cursor
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                yield
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+        finally:
+            self._local.cursor = None
+            cursor.close()
+
+    def list_tables(self):
+        tables = self.run(
+            "SELECT TABLE_NAME as TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_CATALOG = ? AND TABLE_SCHEMA = ?",
+            [DATABASE, SCHEMA]
+        )
+        return tables["TABLE_NAME"].tolist()
+
+    def close(self):
+        self.connection.close()
+
+
+# Pick the backend from HEALTH_NAV_BACKEND ("snowflake" or "local") and HEALTH_NAV_DATA
+def get_backend(kind=None, source=None):
+    kind = (kind or os.environ.get("HEALTH_NAV_BACKEND", "snowflake")).lower()
+    if kind == "snowflake":
+        return SnowflakeBackend()
+    if kind in ("local", "duckdb"):
+        return LocalBackend(source or os.environ.get("HEALTH_NAV_DATA"))
+    raise ValueError(f"Unknown query backend: {kind}")
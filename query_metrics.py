@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from result_cache import result_size
+
+# Per-query instrumentation for the dashboard. Every template execution (cache
+# hits included) becomes one record; the most recent records are kept in memory
+# for the diagnostics page and, when HEALTH_NAV_QUERY_LOG names a file, every
+# record is also appended to it as one JSON line for log shipping.
+
+# The latency budget the README promises for a dashboard query
+LATENCY_BUDGET_SECONDS = 10.0
+
+RECORD_FIELDS = [
+    "timestamp", "page", "template", "params_hash", "backend", "cache", "wall_ms",
+    "first_row_ms", "rows", "bytes", "query_id", "error"
+]
+
+
+def params_hash(params):
+    payload = json.dumps(params, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class QueryLog:
+    def __init__(self, capacity=2000, log_path=None, backend=""):
+        self.log_path = log_path
+        self.backend = backend
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    # query is a BoundQuery; result is the returned DataFrame (None on error);
+    # cache is "hit", "miss" or "fact_store" (answered by fact_store.py); stats may carry first_row_ms and query_id from the backend
+    def record(self, query, page, cache, wall_ms, result=None, stats=None, error=None):
+        stats = stats or {}
+        record = {
+            "timestamp": time.time(),
+            "page": page,
+            "template": query.name,
+            "params_hash": params_hash(query.params),
+            "backend": self.backend,
+            "cache": cache,
+            "wall_ms": round(wall_ms, 3),
+            "first_row_ms": round(stats["first_row_ms"], 3) if stats.get("first_row_ms") is not None else None,
+            "rows": len(result) if result is not None else None,
+            "bytes": result_size(result) if result is not None else None,
+            "query_id": stats.get("query_id"),
+            "error": error,
+        }
+        with self._lock:
+            self._records.append(record)
+            if self.log_path:
+                self._append(record)
+        return record
+
+    def _append(self, record):
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            # Instrumentation must never take a page down
+            pass
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def frame(self):
+        df = pd.DataFrame(self.records(), columns=RECORD_FIELDS)
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    # Latency percentiles, hit rate and budget overruns per page and template
+    def summary(self, by=("page", "template")):
+        df = self.frame()
+        if df.empty:
+            return pd.DataFrame(columns=list(by) + [
+                "queries", "p50_ms", "p95_ms", "max_ms", "hit_rate", "over_budget", "errors", "avg_rows", "avg_bytes"
+            ])
+        df["hit"] = df["cache"] == "hit"
+        df["over_budget"] = df["wall_ms"] > LATENCY_BUDGET_SECONDS * 1000
+        df["failed"] = df["error"].notna()
+        summary = df.groupby(list(by), dropna=False).agg(
+            queries=("wall_ms", "size"),
+            p50_ms=("wall_ms", lambda s: s.quantile(0.50)),
+            p95_ms=("wall_ms", lambda s: s.quantile(0.95)),
+            max_ms=("wall_ms", "max"),
+            hit_rate=("hit", "mean"),
+            over_budget=("over_budget", "sum"),
+            errors=("failed", "sum"),
+            avg_rows=("rows", "mean"),
+            avg_bytes=("bytes", "mean"),
+        )
+        return summary.reset_index().sort_values("p95_ms", ascending=False)
+
+    # All records as JSON lines (the same format as the log file)
+    def to_jsonl(self):
+        return "".join(json.dumps(record) + "\n" for record in self.records())
+
+
+# Log configured from HEALTH_NAV_QUERY_LOG
+def get_query_log(backend=""):
+    return QueryLog(log_path=os.environ.get("HEALTH_NAV_QUERY_LOG") or None, backend=backend)
@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs a page's independent queries at the same time. A page opens a batch,
+# declares every query that does not depend on another one's result, and then
+# waits for each result where it is needed; the page waits for the slowest
+# query instead of the sum of all of them. One bounded pool is shared by every session so a busy
+# dashboard cannot open unbounded warehouse connections.
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class QueryBatch:
+    def __init__(self, executor, wrap=None):
+        self._executor = executor
+        self._wrap = wrap
+        self._futures = {}
+
+    # Start fn(*args, **kwargs) now; its result is fetched later by key
+    def add(self, key, fn, *args, **kwargs):
+        if key in self._futures:
+            raise ValueError(f"Query {key!r} was already added to this batch")
+        task = self._wrap(fn) if self._wrap else fn
+        self._futures[key] = self._executor.submit(task, *args, **kwargs)
+        return self._futures[key]
+
+    # Wait for one query; its exception, if any, is raised here
+    def result(self, key, timeout=None):
+        return self._futures[key].result(timeout)
+
+
+class QueryScheduler:
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="health-nav-query")
+
+    # wrap(fn) may decorate each task, e.g. to give worker threads the
+    # caller's context
+    def batch(self, wrap=None):
+        return QueryBatch(self._executor, wrap)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# A wrap() for batch() that runs each task with the given per-thread context
+# attached by attach(thread, context), which stores it in the thread attribute
+# attr. Pool threads outlive the task, so the attribute's previous value is put
+# back afterwards and the next session's task never sees this one's context.
+def with_thread_context(attach, context, attr):
+    def wrap(fn):
+        def task(*args, **kwargs):
+            thread = threading.current_thread()
+            previous = getattr(thread, attr, None)
+            attach(thread, context)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                setattr(thread, attr, previous)
+        return task
+    return wrap
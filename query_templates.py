@@ -0,0 +1,392 @@
+import hashlib
+import json
+import re
+
+import pandas as pd
+
+from query_backend import qualified_name
+from aggregates import (charge_sketches_table, cheapest_offers_table, cpt_price_index_table,
+                        hospital_price_stats_table, payer_geo_stats_table, variation_sql)
+
+# Tables
+master_table = qualified_name("MASTER_TABLE")
+hospital_table = qualified_name("HOSPITAL_DATA")
+provider_table = qualified_name("INSURANCE_PROVIDERS")
+plan_table = qualified_name("INSURANCE_PLANS")
+service_code_table = qualified_name("SERVICE_CODES")
+
+# :name placeholders in template text (a "::" cast is not a placeholder)
+_PLACEHOLDER = re.compile(r"(?<!:):([A-Za-z_][A-Za-z0-9_]*)")
+
+# Qualified table names in template text
+_TABLE = re.compile(re.escape(qualified_name("")) + r"([A-Za-z_][A-Za-z0-9_]*)")
+
+
+def _normalize_sql(sql):
+    return " ".join(sql.split())
+
+
+# Default parameter normalization: trim strings, treat blanks as NULL and make
+# lists order-independent so equivalent requests produce identical binds.
+def _normalize_value(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, (list, tuple, set)):
+        return sorted({_normalize_value(v) for v in value if _normalize_value(v) is not None})
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# A query ready to execute: positional "?" SQL, its bind values, a stable cache
+# key and the tables it reads
+class BoundQuery:
+    def __init__(self, name, sql, params, tables=()):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.tables = tables
+        payload = json.dumps([name, sql, params], default=str)
+        self.key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __repr__(self):
+        return f"BoundQuery({self.name!r}, params={self.params!r})"
+
+
+# A named SQL template with :name bind placeholders. List-valued parameters
+# expand to one "?" per element; optional filters are written as
+# "(:state IS NULL OR h.STATE = :state)" so the SQL text never changes.
+class QueryTemplate:
+    def __init__(self, name, sql, normalizers=None):
+        self.name = name
+        self.sql = _normalize_sql(sql)
+        self.param_names = list(dict.fromkeys(_PLACEHOLDER.findall(self.sql)))
+        self.tables = tuple(sorted(set(_TABLE.findall(self.sql))))
+        self.normalizers = normalizers or {}
+
+    def bind(self, **values):
+        missing = [p for p in self.param_names if p not in values]
+        if missing:
+            raise ValueError(f"Query template {self.name!r} is missing parameters: {', '.join(missing)}")
+        unknown = [p for p in values if p not in self.param_names]
+        if unknown:
+            raise ValueError(f"Query template {self.name!r} got unknown parameters: {', '.join(unknown)}")
+
+        normalized = {}
+        for param, value in values.items():
+            value = _normalize_value(value)
+            if param in self.normalizers:
+                value = self.normalizers[param](value)
+            normalized[param] = value
+
+        params = []
+
+        def substitute(match):
+            value = normalized[match.group(1)]
+            if isinstance(value, list):
+                if not value:
+                    # An empty list matches nothing
+                    params.append(None)
+                    return "?"
+                params.extend(value)
+                return ", ".join("?" for _ in value)
+            params.append(value)
+            return "?"
+
+        sql = _PLACEHOLDER.sub(substitute, self.sql)
+        return BoundQuery(self.name, sql, params, self.tables)
+
+
+# Registry of every query the dashboard issues
+QUERY_TEMPLATES = {}
+
+
+def register(name, sql, normalizers=None):
+    if name in QUERY_TEMPLATES:
+        raise ValueError(f"Query template {name!r} is already registered")
+    QUERY_TEMPLATES[name] = QueryTemplate(name, sql, normalizers)
+    return QUERY_TEMPLATES[name]
+
+
+def bind(name, **values):
+    try:
+        template = QUERY_TEMPLATES[name]
+    except KeyError:
+        raise ValueError(f"Unknown query template: {name}") from None
+    return template.bind(**values)
+
+
+# ----- Dimension lookups -----
+
+register("states", f"""
+    SELECT DISTINCT STATE
+    FROM {hospital_table}
+    WHERE STATE IS NOT NULL
+    ORDER BY STATE
+""")
+
+register("cities_by_state", f"""
+    SELECT DISTINCT CITY
+    FROM {hospital_table}
+    WHERE (:state IS NULL OR STATE = :state)
+    AND CITY IS NOT NULL
+    ORDER BY CITY
+""")
+
+# Whole dimension tables for dimensions.DimensionCache
+register("hospital_dimension", f"""
+    SELECT HOSPITAL_ID, HOSPITAL_NAME, CITY, STATE, ZIPCODE
+    FROM {hospital_table}
+""")
+
+register("provider_dimension", f"""
+    SELECT INSURANCE_PROVIDER_ID, PAYER_NAME
+    FROM {provider_table}
+""")
+
+register("plan_dimension", f"""
+    SELECT INSURANCE_PLAN_ID, PLAN_NAME
+    FROM {plan_table}
+""")
+
+register("service_code_dimension", f"""
+    SELECT CODE, DESCRIPTION
+    FROM {service_code_table}
+""")
+
+# ----- Hospital Price Variation -----
+
+# All three variation metrics come back in one query so switching metric reuses the result
+register("hospital_variation", f"""
+    SELECT
+        h.HOSPITAL_ID,
+        h.HOSPITAL_NAME,
+        h.CITY,
+        h.STATE,
+        h.DISTINCT_CODES as PROCEDURE_COUNT,
+        {variation_sql("Coefficient of Variation")} as COEFFICIENT_OF_VARIATION,
+        {variation_sql("Standard Deviation")} as STANDARD_DEVIATION,
+        {variation_sql("Price Range")} as PRICE_RANGE,
+        h.CHARGE_SUM / h.CHARGE_COUNT as AVG_PRICE,
+        h.MIN_CHARGE as MIN_PRICE,
+        h.MAX_CHARGE as MAX_PRICE,
+        h.DISTINCT_CODES as UNIQUE_CODES
+    FROM
+        {hospital_price_stats_table} h
+    WHERE
+        h.DISTINCT_CODES >= :min_procedures
+        AND (h.STATE = :state OR (:state IS NULL AND h.STATE IN ('NV', 'IL', 'NC')))
+        AND (:city IS NULL OR h.CITY = :city)
+""")
+
+register("procedure_deep_dive", f"""
+    SELECT
+        s.CODE,
+        s.DESCRIPTION,
+        m.STANDARD_CHARGE_DOLLAR as PRICE,
+        c.MEAN_CHARGE as AVG_PRICE_ACROSS_HOSPITALS,
+        (m.STANDARD_CHARGE_DOLLAR - c.MEAN_CHARGE) /
+            NULLIF(c.MEAN_CHARGE, 0) * 100 as PERCENT_DIFF_FROM_AVG
+    FROM
+        {master_table} m
+    JOIN
+        {service_code_table} s ON m.CODE = s.CODE
+    JOIN
+        {cpt_price_index_table} c ON m.CODE = c.CODE
+    WHERE
+        m.HOSPITAL_ID = :hospital_id
+        AND m.STANDARD_CHARGE_DOLLAR > 0
+    ORDER BY
+        ABS(PERCENT_DIFF_FROM_AVG) DESC
+""")
+
+# ----- Insurance Provider Comparison -----
+
+# Rolled up from the payer x geography cube rather than scanning MASTER_TABLE
+register("provider_comparison", f"""
+    SELECT
+        PAYER_NAME,
+        SUM(CHARGE_SUM) / SUM(CHARGE_COUNT) as AVG_CHARGE
+    FROM
+        {payer_geo_stats_table}
+    WHERE
+        (:state IS NULL OR STATE = :state)
+        AND (:city IS NULL OR CITY = :city)
+    GROUP BY
+        PAYER_NAME
+    ORDER BY
+        AVG_CHARGE DESC
+""")
+
+# ----- Healthcare Cost Explorer -----
+
+register("cpt_description", f"""
+    SELECT DESCRIPTION
+    FROM {service_code_table}
+    WHERE CODE = :code
+    LIMIT 1
+""")
+
+# One template per price metric; the aggregate itself cannot be a bind variable.
+# Median comes from the quantile sketches (city_charge_sketches) instead.
+CITY_METRIC_SQL = {
+    "Average": "AVG(m.STANDARD_CHARGE_DOLLAR)",
+    "Minimum": "MIN(m.STANDARD_CHARGE_DOLLAR)",
+    "Maximum": "MAX(m.STANDARD_CHARGE_DOLLAR)",
+}
+
+for _metric, _metric_sql in CITY_METRIC_SQL.items():
+    register(f"city_metrics_{_metric.lower()}", f"""
+        SELECT
+            h.CITY,
+            h.STATE,
+            {_metric_sql} as PRICE_METRIC,
+            COUNT(*) as NUM_PROVIDERS
+        FROM
+            {master_table} m
+        JOIN
+            {hospital_table} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
+        JOIN
+            {service_code_table} s ON m.CODE = s.CODE
+        WHERE
+            s.CODE = :code
+            AND h.CITY IS NOT NULL
+            AND h.STATE IS NOT NULL
+            AND m.STANDARD_CHARGE_DOLLAR > 0
+            AND (:state IS NULL OR h.STATE = :state)
+        GROUP BY
+            h.CITY, h.STATE
+        ORDER BY
+            PRICE_METRIC DESC
+    """)
+
+# Merged sketch buckets per city; quantile_sketch.quantiles turns them into
+# median and p10/p90 per city and, merged again, for the whole selection
+register("city_charge_sketches", f"""
+    SELECT
+        h.CITY,
+        h.STATE,
+        s.BUCKET,
+        SUM(s.BUCKET_COUNT) as BUCKET_COUNT
+    FROM
+        {charge_sketches_table} s
+    JOIN
+        {hospital_table} h ON s.HOSPITAL_ID = h.HOSPITAL_ID
+    WHERE
+        s.CODE = :code
+        AND h.CITY IS NOT NULL
+        AND h.STATE IS NOT NULL
+        AND (:state IS NULL OR h.STATE = :state)
+    GROUP BY
+        h.CITY, h.STATE, s.BUCKET
+""")
+
+# ----- Health Cost Navigator -----
+
+# Fact rows only: labels are attached client-side from dimensions.DimensionCache
+_NAVIGATOR_FACTS = f"""
+    SELECT
+        m.HOSPITAL_ID,
+        m.INSURANCE_PROVIDER_ID,
+        m.INSURANCE_PLAN_ID,
+        m.CODE,
+        m.STANDARD_CHARGE_DOLLAR,
+        m.MINIMUM_CHARGE,
+        m.MAXIMUM_CHARGE,
+        m.METHODOLOGY
+    FROM {master_table} m
+"""
+
+# Location searches are resolved to hospital IDs by dimensions.DimensionCache
+# and read one page at a time. Pages are keyset-paginated on the whole row,
+# charge first: each page starts after the last row of the previous one, so a
+# page costs the same however deep it is and never holds more than a page of
+# rows. Rows without a charge cannot be ordered by price and are left out.
+NAVIGATOR_PAGE_SIZES = [25, 50, 100, 250]
+
+# Charge, hospital, payer and plan alone can tie (two methodologies, or two
+# campuses sharing a hospital ID), so the rest of the row breaks ties.
+# master_loader stages DISTINCT rows, so the whole row is unique within a code.
+# NULLs are replaced so that every comparison is true or false.
+MISSING_CHARGE = -1.0
+
+NAVIGATOR_PAGE_KEY = [
+    ("m.STANDARD_CHARGE_DOLLAR", "after_charge"),
+    ("m.HOSPITAL_ID", "after_hospital"),
+    ("m.INSURANCE_PROVIDER_ID", "after_provider"),
+    ("m.INSURANCE_PLAN_ID", "after_plan"),
+    (f"COALESCE(m.MINIMUM_CHARGE, {MISSING_CHARGE})", "after_minimum"),
+    (f"COALESCE(m.MAXIMUM_CHARGE, {MISSING_CHARGE})", "after_maximum"),
+    ("COALESCE(m.METHODOLOGY, '')", "after_methodology"),
+]
+
+
+# The cursor a page leaves off at: the NAVIGATOR_PAGE_KEY values of its last
+# row, NULLs replaced the same way
+def navigator_cursor(row):
+    def charge(value):
+        return MISSING_CHARGE if pd.isna(value) else float(value)
+
+    return (
+        float(row["STANDARD_CHARGE_DOLLAR"]), row["HOSPITAL_ID"], row["INSURANCE_PROVIDER_ID"],
+        row["INSURANCE_PLAN_ID"], charge(row["MINIMUM_CHARGE"]), charge(row["MAXIMUM_CHARGE"]),
+        "" if pd.isna(row["METHODOLOGY"]) else row["METHODOLOGY"],
+    )
+
+
+# "key > cursor" in lexicographic order, spelled out column by column because
+# row-value comparisons are not portable
+def _keyset_after(key):
+    (column, param), rest = key[0], key[1:]
+    if not rest:
+        return f"{column} > :{param}"
+    return f"({column} > :{param} OR ({column} = :{param} AND {_keyset_after(rest)}))"
+
+
+# The payer and plan filters are optional: with all_providers / all_plans true
+# the ID list is ignored
+_NAVIGATOR_LOCATION = """
+    WHERE m.CODE = :code
+    AND m.HOSPITAL_ID IN (:hospital_ids)
+    AND (:all_providers OR m.INSURANCE_PROVIDER_ID IN (:provider_ids))
+    AND (:all_plans OR m.INSURANCE_PLAN_ID IN (:plan_ids))
+    AND m.STANDARD_CHARGE_DOLLAR IS NOT NULL
+"""
+
+
+# Payer and plan filter binds for the Navigator templates (None for any)
+def navigator_filters(provider_ids=None, plan_ids=None):
+    return {
+        "all_providers": provider_ids is None, "provider_ids": list(provider_ids or []),
+        "all_plans": plan_ids is None, "plan_ids": list(plan_ids or []),
+    }
+
+
+register("navigator_hospitals_count", f"""
+    SELECT COUNT(*) as ROW_COUNT
+    FROM {master_table} m
+""" + _NAVIGATOR_LOCATION)
+
+# One template per page size; one extra row tells whether a next page exists
+for _page_size in NAVIGATOR_PAGE_SIZES:
+    register(f"navigator_hospitals_page_{_page_size}", _NAVIGATOR_FACTS + _NAVIGATOR_LOCATION + f"""
+        AND (:after_charge IS NULL OR {_keyset_after(NAVIGATOR_PAGE_KEY)})
+        ORDER BY {", ".join(column for column, _ in NAVIGATOR_PAGE_KEY)}
+        LIMIT {_page_size + 1}
+    """)
+
+# Without a location the precomputed top-k of the code is read as is
+register("navigator_cheapest", f"""
+    SELECT
+        HOSPITAL_ID,
+        INSURANCE_PROVIDER_ID,
+        INSURANCE_PLAN_ID,
+        CODE,
+        STANDARD_CHARGE_DOLLAR,
+        MINIMUM_CHARGE,
+        MAXIMUM_CHARGE
+    FROM {cheapest_offers_table}
+    WHERE CODE = :code
+    ORDER BY OFFER_RANK
+""")
@@ -0,0 +1,235 @@
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pyarrow as pa
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "health_nav_cache")
+
+# Seconds between full scans of the disk tier. Between scans each process adds
+# its own writes to the last scan's total; the scan also picks up what other
+# processes wrote.
+DISK_SCAN_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def result_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# Create the disk tier's directory readable by this user only. Returns False
+# (and the cache stays in memory) if the directory is a symlink, or another
+# user owns it: anyone who can write there could plant entries.
+def _private_dir(path):
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+        if not stat.S_ISDIR(info.st_mode):
+            logger.warning("Not caching results on disk: %s is not a directory", path)
+            return False
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            logger.warning("Not caching results on disk: %s is owned by another user", path)
+            return False
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            os.chmod(path, 0o700)
+    except OSError:
+        logger.warning("Not caching results on disk: cannot use %s", path, exc_info=True)
+        return False
+    return True
+
+
+# Two-tier cache for query results keyed on BoundQuery.key:
+#   1. an in-process LRU bounded by total DataFrame bytes
+#   2. an on-disk tier shared by every worker process pointed at the same directory,
+#      stored as Arrow IPC files (plain data, unlike pickles)
+# Entries larger than max_entry_bytes are never cached. Callers get copies, so
+# mutating a returned DataFrame never changes the cached one.
+class ResultCache:
+    def __init__(self, memory_bytes=256 * 1024 * 1024, disk_dir=DEFAULT_CACHE_DIR,
+                 disk_bytes=2 * 1024 * 1024 * 1024, max_entry_bytes=32 * 1024 * 1024,
+                 ttl=None, namespace=""):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._used_bytes = 0
+        self._disk_used = None
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "rejected": 0,
+            "evictions": 0,
+        }
+        if self.disk_dir and not _private_dir(self.disk_dir):
+            self.disk_dir = None
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _full_key(self, key):
+        return f"{self.namespace}-{key}" if self.namespace else key
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.arrow")
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        key = self._full_key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, nbytes, stored_at = entry
+                if self._expired(stored_at):
+                    del self._entries[key]
+                    self._used_bytes -= nbytes
+                else:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return df.copy()
+
+        df, stored_at = self._read_disk(key)
+        if df is None:
+            self._count("misses")
+            return None
+        self._count("disk_hits")
+        self._put_memory(key, df, result_size(df), stored_at)
+        return df.copy()
+
+    def put(self, key, df):
+        key = self._full_key(key)
+        nbytes = result_size(df)
+        if nbytes > self.max_entry_bytes:
+            self._count("rejected")
+            return False
+        stored_at = time.time()
+        self._put_memory(key, df.copy(), nbytes, stored_at)
+        self._write_disk(key, df)
+        self._count("stores")
+        return True
+
+    def _put_memory(self, key, df, nbytes, stored_at):
+        if nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._used_bytes -= previous[1]
+            self._entries[key] = (df, nbytes, stored_at)
+            self._used_bytes += nbytes
+            while self._used_bytes > self.memory_bytes:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self._used_bytes -= evicted_bytes
+                self._counters["evictions"] += 1
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None, None
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                os.remove(path)
+                return None, None
+            with pa.memory_map(path) as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+            # Touch the file so disk eviction is least-recently-used too
+            os.utime(path, (time.time(), stored_at))
+        except (OSError, pa.ArrowException):
+            return None, None
+        return df, stored_at
+
+    # Write to a temporary file and rename it, so other processes never see a
+    # partial entry. Frames Arrow cannot store (mixed-type object columns) stay
+    # in memory only.
+    def _write_disk(self, key, df):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            table = pa.Table.from_pandas(df)
+            with os.fdopen(fd, "wb") as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            nbytes = os.path.getsize(tmp_path)
+            try:
+                nbytes -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except (OSError, pa.ArrowException, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += nbytes
+            scan = (self._disk_used is None or self._disk_used > self.disk_bytes
+                    or time.monotonic() - self._scanned_at >= DISK_SCAN_SECONDS)
+        if scan:
+            self._trim_disk()
+
+    # Measure the directory and drop the least recently read files once it
+    # exceeds its budget
+    def _trim_disk(self):
+        try:
+            files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".arrow")]
+        except OSError:
+            return
+        stats = []
+        for path in files:
+            try:
+                stats.append((os.stat(path), path))
+            except OSError:
+                continue
+        total = sum(info.st_size for info, _ in stats)
+        if total > self.disk_bytes:
+            for info, path in sorted(stats, key=lambda item: item[0].st_atime):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= info.st_size
+                self._count("evictions")
+                if total <= self.disk_bytes:
+                    break
+        with self._lock:
+            self._disk_used = total
+            self._scanned_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+            self._disk_used = None
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".arrow"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._entries)
+            stats["memory_bytes"] = self._used_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,145 @@
+import re
+
+import numpy as np
+
+# Typeahead search over the dashboard's dimension values (CPT codes and
+# descriptions, hospitals, cities, payers, plans). Everything is worked out
+# once when the index is built:
+#   - every word of every entry in one sorted array, so the entries with a word
+#     starting with what was typed are a range found by binary search
+#   - a posting list per trigram, so misspelt or partial words still score by
+#     how many three-letter fragments they share with an entry
+# A keystroke then costs a few searchsorted calls and one bincount, well under
+# a millisecond for the ~38,800 CPT codes.
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# A complete CPT or HCPCS code (99213, J1100, 0001U) as typed, which is looked
+# up as is rather than resolved to the closest match
+_CODE = re.compile(r"(?=.*[0-9])[0-9A-Za-z]{5}")
+
+# Score weights: an exact key beats a key prefix beats word prefixes beats trigrams
+EXACT_KEY_SCORE = 100.0
+KEY_PREFIX_SCORE = 10.0
+WORD_PREFIX_SCORE = 3.0
+
+
+def normalize(text):
+    return _NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+def is_code(text):
+    return _CODE.fullmatch(str(text).strip()) is not None
+
+
+def _trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    # keys are what a match resolves to (a CPT code, a hospital ID, a payer
+    # ID), kept as given; labels are what is shown and searched besides the
+    # key. Both are parallel sequences.
+    def __init__(self, keys, labels):
+        self.keys = list(keys)
+        self.labels = [str(label) for label in labels]
+        normalized_keys = [normalize(k) for k in self.keys]
+        texts = [normalize(f"{k} {label}") for k, label in zip(self.keys, self.labels)]
+
+        key_order = np.argsort(np.array(normalized_keys, dtype=str), kind="stable")
+        self._sorted_keys = np.array(normalized_keys, dtype=str)[key_order]
+        self._key_entries = key_order
+
+        words = [(word, i) for i, text in enumerate(texts) for word in set(text.split())]
+        words.sort()
+        self._words = np.array([word for word, _ in words], dtype=str)
+        self._word_entries = np.array([i for _, i in words], dtype=np.int64)
+
+        postings = {}
+        for i, text in enumerate(texts):
+            for gram in _trigrams(text):
+                postings.setdefault(gram, []).append(i)
+        self._trigrams = {gram: np.array(entries, dtype=np.int64) for gram, entries in postings.items()}
+
+        # Ties go to the shorter (more specific) entry, then the lower key
+        tie_order = np.lexsort((np.arange(len(texts)), [len(text) for text in texts]))
+        self._tie_rank = np.empty(len(texts), dtype=np.int64)
+        self._tie_rank[tie_order] = np.arange(len(texts))
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Entries of a sorted fixed-width string array that start with prefix. The
+    # bounds are kept within the array's width; a wider search value would make
+    # NumPy copy the whole array to compare.
+    def _prefix_range(self, sorted_values, prefix):
+        width = sorted_values.dtype.itemsize // 4
+        if len(prefix) > width:
+            return 0, 0
+        start = np.searchsorted(sorted_values, prefix, side="left")
+        stop = np.searchsorted(sorted_values, prefix + "\uffff" * (width - len(prefix)), side="right")
+        return start, stop
+
+    def scores(self, query):
+        query = normalize(query)
+        scores = np.zeros(len(self), dtype=np.float64)
+        if not query or not len(self):
+            return scores
+
+        start, stop = self._prefix_range(self._sorted_keys, query)
+        scores[self._key_entries[start:stop]] += KEY_PREFIX_SCORE
+        exact = self._key_entries[start:stop][self._sorted_keys[start:stop] == query]
+        scores[exact] += EXACT_KEY_SCORE
+
+        tokens = query.split()
+        matched = np.zeros(len(self), dtype=bool)
+        for token in tokens:
+            start, stop = self._prefix_range(self._words, token)
+            matched[:] = False
+            matched[self._word_entries[start:stop]] = True
+            scores += matched * (WORD_PREFIX_SCORE / len(tokens))
+
+        grams = _trigrams(query)
+        postings = [self._trigrams[gram] for gram in grams if gram in self._trigrams]
+        if postings:
+            scores += np.bincount(np.concatenate(postings), minlength=len(self)) / len(grams)
+        return scores
+
+    # Best matches as (key, label) pairs, highest score first
+    def search(self, query, limit=10, min_score=0.34):
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        ranked = candidates[np.lexsort((self._tie_rank[candidates], -scores[candidates]))]
+        return [(self.keys[i], self.labels[i]) for i in ranked]
+
+    # Keys of every entry that matches, best first
+    def matching_keys(self, query, min_score=0.34):
+        return [key for key, _ in self.search(query, limit=max(len(self), 1), min_score=min_score)]
+
+    # The single best match, or None
+    def best(self, query, min_score=0.5):
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+    # First entries in key order, for an empty search box
+    def head(self, limit=10):
+        return [(self.keys[i], self.labels[i]) for i in self._key_entries[:limit]]
+
+
+# One index per searchable dimension, built from a dimensions.DimensionCache
+def build_search_indexes(dimensions):
+    codes = dimensions.service_codes.reset_index()[["CODE", "DESCRIPTION"]].drop_duplicates()
+    hospitals = dimensions.hospitals.reset_index()
+    cities = hospitals[["CITY", "STATE"]].dropna().drop_duplicates()
+    providers = dimensions.providers.reset_index()
+    plans = dimensions.plans.reset_index()
+    return {
+        "cpt": SearchIndex(codes["CODE"], codes["DESCRIPTION"].fillna("")),
+        "hospital": SearchIndex(hospitals["HOSPITAL_ID"], hospitals["HOSPITAL_NAME"].fillna("")),
+        "city": SearchIndex(cities["CITY"], cities["STATE"]),
+        "payer": SearchIndex(providers["INSURANCE_PROVIDER_ID"], providers["PAYER_NAME"].fillna("")),
+        "plan": SearchIndex(plans["INSURANCE_PLAN_ID"], plans["PLAN_NAME"].fillna("")),
+    }
@@ -0,0 +1,204 @@
+import argparse
+import math
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from query_backend import CORE_TABLES, DEFAULT_DATA_PATH, TABLE_DTYPES, _read_zipped_csv
+
+# Synthetic HEALTH_NAV tables at any scale, shaped like the real sample in
+# HEALTH_NAV_Database_Tables.zip:
+#   - rows per (hospital, code), i.e. payer/plan offers per code, are drawn
+#     from the sample's per-code counts
+#   - each code's price level is drawn from the sample's per-code medians and
+#     each offer's spread around it from the sample's within-code residuals,
+#     so the long right tail of charges is kept
+#   - minimum/maximum charges keep the sample's ratios to the negotiated price
+#   - payer/plan pairs follow the sample's pair frequencies, widened with
+#     further pairs from the real provider and plan tables
+# The sample covers a single hospital, so hospital-to-hospital price levels are
+# a lognormal assumption (HOSPITAL_EFFECT_SIGMA). Output is a directory the
+# local backend reads directly (HEALTH_NAV_DATA=<dir>).
+
+HOSPITAL_EFFECT_SIGMA = 0.3
+
+# Default cardinalities of the production dataset (README "Ingestion Metrics")
+DEFAULT_CODES = 38800
+DEFAULT_CODES_PER_HOSPITAL = 5000
+DEFAULT_PAYER_PLAN_PAIRS = 200
+
+SCALES = {"k": 1000, "m": 1000 * 1000, "b": 1000 * 1000 * 1000}
+
+
+# "1M" -> 1000000
+def parse_rows(text):
+    text = str(text).strip().lower()
+    if text and text[-1] in SCALES:
+        return int(float(text[:-1]) * SCALES[text[-1]])
+    return int(text)
+
+
+def load_sample(source=DEFAULT_DATA_PATH):
+    with zipfile.ZipFile(source) as archive:
+        return {table: _read_zipped_csv(archive, table) for table in CORE_TABLES}
+
+
+# The distributions the generator draws from, measured on the sample
+class SampleProfile:
+    def __init__(self, tables):
+        master = tables["MASTER_TABLE"]
+        master = master[master["STANDARD_CHARGE_DOLLAR"] > 0]
+
+        self.offers_per_code = master.groupby("CODE").size().to_numpy()
+
+        log_price = np.log(master["STANDARD_CHARGE_DOLLAR"].to_numpy(dtype=np.float64))
+        code_median = pd.Series(log_price).groupby(master["CODE"].to_numpy()).transform("median").to_numpy()
+        self.code_log_medians = pd.Series(log_price).groupby(master["CODE"].to_numpy()).median().to_numpy()
+        self.log_residuals = log_price - code_median
+
+        dollar = master["STANDARD_CHARGE_DOLLAR"].to_numpy(dtype=np.float64)
+        self.min_ratios = (master["MINIMUM_CHARGE"].to_numpy(dtype=np.float64) / dollar)
+        self.max_ratios = (master["MAXIMUM_CHARGE"].to_numpy(dtype=np.float64) / dollar)
+
+        pairs = master.groupby(["INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID"]).size()
+        self.pairs = np.array(pairs.index.tolist(), dtype=np.int64)
+        self.pair_weights = pairs.to_numpy(dtype=np.float64) / pairs.sum()
+
+        self.provider_ids = tables["INSURANCE_PROVIDERS"]["INSURANCE_PROVIDER_ID"].dropna().to_numpy(dtype=np.int64)
+        self.plan_ids = tables["INSURANCE_PLANS"]["INSURANCE_PLAN_ID"].dropna().to_numpy(dtype=np.int64)
+        self.locations = tables["HOSPITAL_DATA"][["CITY", "STATE", "ZIPCODE"]].dropna().reset_index(drop=True)
+
+
+# Sample pairs first, then random provider/plan pairs with Zipf-like weights
+# that together carry the same share of offers as a typical sample pair
+def _payer_plan_pairs(profile, count, rng):
+    pairs = [tuple(pair) for pair in profile.pairs]
+    weights = list(profile.pair_weights)
+    seen = set(pairs)
+    while len(pairs) < count:
+        pair = (int(rng.choice(profile.provider_ids)), int(rng.choice(profile.plan_ids)))
+        if pair in seen:
+            continue
+        seen.add(pair)
+        pairs.append(pair)
+        weights.append(profile.pair_weights.mean() / (len(pairs) - len(profile.pairs)) ** 0.8)
+    weights = np.array(weights)
+    return np.array(pairs, dtype=np.int64), weights / weights.sum()
+
+
+def _service_codes(tables, codes, rng, profile):
+    real = tables["SERVICE_CODES"]
+    real_codes = real["CODE"].dropna().unique()
+    extra = max(codes - len(real_codes), 0)
+    synthetic = pd.DataFrame({
+        "CODE": [f"S{i:05d}" for i in range(extra)],
+        "CODE_TYPE": "CPT",
+        "DESCRIPTION": [f"SYNTHETIC PROCEDURE {i:05d}" for i in range(extra)],
+    })
+    service_codes = pd.concat([real, synthetic], ignore_index=True).astype(TABLE_DTYPES["SERVICE_CODES"])
+    universe = np.concatenate([real_codes.astype(str), synthetic["CODE"].to_numpy(dtype=str)])
+    log_medians = rng.choice(profile.code_log_medians, size=len(universe))
+    return service_codes, universe, log_medians
+
+
+# Fact rows for one hospital: a subset of codes, then a weighted sample of
+# payer/plan pairs without replacement for each code
+def _hospital_rows(hospital_id, profile, universe, log_medians, pairs, pair_weights, codes_per_hospital, rng):
+    n_codes = min(len(universe), max(1, int(rng.lognormal(math.log(codes_per_hospital), 0.5))))
+    code_index = rng.choice(len(universe), size=n_codes, replace=False)
+    offers = np.minimum(rng.choice(profile.offers_per_code, size=n_codes), len(pairs))
+
+    # Weighted sampling without replacement: the top-k of log(u) / weight
+    width = int(offers.max())
+    keys = np.log(rng.random((n_codes, len(pairs)))) / pair_weights
+    top = np.argpartition(-keys, width - 1, axis=1)[:, :width]
+    taken = np.arange(width) < offers[:, None]
+    code_rows = np.repeat(code_index, offers)
+    pair_rows = top[taken]
+
+    hospital_effect = rng.normal(0.0, HOSPITAL_EFFECT_SIGMA)
+    residuals = rng.choice(profile.log_residuals, size=len(code_rows))
+    dollar = np.round(np.exp(log_medians[code_rows] + hospital_effect + residuals), 2)
+    ratio_rows = rng.integers(0, len(profile.min_ratios), size=len(code_rows))
+
+    return pd.DataFrame({
+        "HOSPITAL_ID": pd.array(np.full(len(code_rows), hospital_id), dtype="string"),
+        "INSURANCE_PROVIDER_ID": pd.array(pairs[pair_rows, 0], dtype="Int64"),
+        "INSURANCE_PLAN_ID": pd.array(pairs[pair_rows, 1], dtype="Int64"),
+        "CODE": pd.array(universe[code_rows], dtype="string"),
+        "STANDARD_CHARGE_DOLLAR": dollar,
+        "MAXIMUM_CHARGE": np.round(dollar * profile.max_ratios[ratio_rows], 2),
+        "MINIMUM_CHARGE": np.round(dollar * profile.min_ratios[ratio_rows], 2),
+        "METHODOLOGY": pd.array([None] * len(code_rows), dtype="string"),
+    })
+
+
+def _write_table(output_dir, table, df):
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(output_dir, f"{table}.parquet"))
+
+
+def generate(output_dir, rows, source=DEFAULT_DATA_PATH, codes=DEFAULT_CODES,
+             codes_per_hospital=DEFAULT_CODES_PER_HOSPITAL, payer_plan_pairs=DEFAULT_PAYER_PLAN_PAIRS, seed=0):
+    rng = np.random.default_rng(seed)
+    tables = load_sample(source)
+    profile = SampleProfile(tables)
+    os.makedirs(os.path.join(output_dir, "MASTER_TABLE"), exist_ok=True)
+
+    service_codes, universe, log_medians = _service_codes(tables, codes, rng, profile)
+    pairs, pair_weights = _payer_plan_pairs(profile, payer_plan_pairs, rng)
+
+    hospitals = []
+    written = 0
+    schema = None
+    writer = None
+    try:
+        while written < rows:
+            hospital_id = f"SYN{len(hospitals) + 1:05d}"
+            location = profile.locations.iloc[int(rng.integers(len(profile.locations)))]
+            hospitals.append({
+                "HOSPITAL_NAME": f"Synthetic Hospital {len(hospitals) + 1:05d}",
+                "HOSPITAL_ID": hospital_id,
+                "CITY": location["CITY"],
+                "STATE": location["STATE"],
+                "ZIPCODE": location["ZIPCODE"],
+            })
+            chunk = _hospital_rows(hospital_id, profile, universe, log_medians, pairs, pair_weights,
+                                   codes_per_hospital, rng)
+            chunk = chunk.iloc[:rows - written]
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(os.path.join(output_dir, "MASTER_TABLE", "part-00000.parquet"), schema,
+                                          compression="zstd")
+            writer.write_table(table.cast(schema))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    _write_table(output_dir, "HOSPITAL_DATA", pd.DataFrame(hospitals).astype(TABLE_DTYPES["HOSPITAL_DATA"]))
+    _write_table(output_dir, "INSURANCE_PROVIDERS", tables["INSURANCE_PROVIDERS"])
+    _write_table(output_dir, "INSURANCE_PLANS", tables["INSURANCE_PLANS"])
+    _write_table(output_dir, "SERVICE_CODES", service_codes)
+    return {"rows": written, "hospitals": len(hospitals), "codes": len(universe), "payer_plan_pairs": len(pairs)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic HEALTH_NAV tables shaped like the real sample")
+    parser.add_argument("output_dir")
+    parser.add_argument("--rows", default="1M", help="MASTER_TABLE rows, e.g. 1M, 10M, 100M")
+    parser.add_argument("--source", default=DEFAULT_DATA_PATH, help="Zip of the real tables to profile")
+    parser.add_argument("--codes", type=int, default=DEFAULT_CODES)
+    parser.add_argument("--codes-per-hospital", type=int, default=DEFAULT_CODES_PER_HOSPITAL)
+    parser.add_argument("--payer-plan-pairs", type=int, default=DEFAULT_PAYER_PLAN_PAIRS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate(args.output_dir, parse_rows(args.rows), args.source, args.codes,
+                       args.codes_per_hospital, args.payer_plan_pairs, args.seed)
+    print(f"Wrote {summary['rows']} rows for {summary['hospitals']} hospitals, {summary['codes']} codes and "
+          f"{summary['payer_plan_pairs']} payer/plan pairs to {args.output_dir}")
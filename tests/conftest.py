@@ -0,0 +1,79 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The ingestion scripts import each other from Data_Cleaning/
+sys.path.insert(0, os.path.join(ROOT, "Data_Cleaning"))
+sys.path.insert(0, ROOT)
+
+from query_backend import LocalBackend, TABLE_DTYPES  # noqa: E402
+
+# Hospitals as in HOSPITAL_DATA: H2 is two campuses sharing one ID (like the
+# Novant hospitals) and H5 has no city
+HOSPITALS = [
+    ("Uptown Medical", "H1", "Charlotte", "NC", "28203"),
+    ("Mint Hill Campus", "H2", "Charlotte", "NC", "28227"),
+    ("Matthews Campus", "H2", "Matthews", "NC", "28105"),
+    ("Desert Springs", "H3", "Las Vegas", "NV", "89169"),
+    ("Henderson General", "H4", "Henderson", "NV", "89052"),
+    ("Rural Clinic", "H5", None, "IL", "62207"),
+]
+PROVIDERS = ["Aetna", "Cigna", "UnitedHealthcare", "Ambetter"]
+PLANS = ["PPO", "HMO", "EPO", "Gold", "Silver"]
+CODES = [f"9920{i}" for i in range(1, 9)]
+
+# Exactly 50 priced offers (and a few unpriced ones) so pages of 25 end on a
+# page boundary
+FULL_PAGE_CODE = "99500"
+
+# Charges are exact in float32 and repeat often, so keyset ties are common and
+# the fact store's float32 charges compare equal to the warehouse's
+CHARGE_LEVELS = np.array([95.5, 120.0, 120.0, 180.25, 240.0, 310.75, 500.0])
+
+
+def _frame(table, rows, columns):
+    return pd.DataFrame(rows, columns=columns).astype(TABLE_DTYPES[table])
+
+
+def make_tables(seed=0):
+    rng = np.random.default_rng(seed)
+    hospital_ids = sorted({hospital_id for _, hospital_id, _, _, _ in HOSPITALS})
+    offers = list(itertools.product(hospital_ids, range(1, len(PROVIDERS) + 1), range(1, len(PLANS) + 1)))
+
+    # METHODOLOGY is NULL, as master_loader writes it
+    rows = []
+    for code in CODES:
+        for hospital_id, provider_id, plan_id in offers:
+            if rng.random() < 0.7:
+                charge = float(rng.choice(CHARGE_LEVELS))
+                rows.append((hospital_id, provider_id, plan_id, code, charge, charge * 2, charge / 2, None))
+    for i, (hospital_id, provider_id, plan_id) in enumerate(offers[:53]):
+        charge = None if i >= 50 else float(CHARGE_LEVELS[i % len(CHARGE_LEVELS)])
+        rows.append((hospital_id, provider_id, plan_id, FULL_PAGE_CODE, charge, None, None, None))
+
+    return {
+        "HOSPITAL_DATA": _frame("HOSPITAL_DATA", HOSPITALS, list(TABLE_DTYPES["HOSPITAL_DATA"])),
+        "INSURANCE_PROVIDERS": _frame(
+            "INSURANCE_PROVIDERS", list(enumerate(PROVIDERS, 1)), list(TABLE_DTYPES["INSURANCE_PROVIDERS"])
+        ),
+        "INSURANCE_PLANS": _frame("INSURANCE_PLANS", list(enumerate(PLANS, 1)), list(TABLE_DTYPES["INSURANCE_PLANS"])),
+        "SERVICE_CODES": _frame(
+            "SERVICE_CODES",
+            [(code, "CPT", f"Procedure {code}") for code in CODES + [FULL_PAGE_CODE]],
+            list(TABLE_DTYPES["SERVICE_CODES"]),
+        ),
+        "MASTER_TABLE": _frame("MASTER_TABLE", rows, list(TABLE_DTYPES["MASTER_TABLE"])),
+    }
+
+
+@pytest.fixture
+def backend():
+    backend = LocalBackend(tables=make_tables())
+    yield backend
+    backend.close()
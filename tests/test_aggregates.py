@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import DERIVED_TABLE_BUILDERS, build_derived_tables, ensure_derived_tables
+from master_loader import load_hospital
+from query_backend import qualified_name
+from query_templates import bind
+
+cleaned_table = qualified_name("CLEANED_CHARGES")
+
+
+def _table(backend, table):
+    df = backend.run(f"SELECT * FROM {qualified_name(table)}")
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _derived(backend):
+    return {table: _table(backend, table) for table in DERIVED_TABLE_BUILDERS}
+
+
+# The refreshed tables must match building every table again from scratch
+def assert_matches_rebuild(backend):
+    refreshed = _derived(backend)
+    build_derived_tables(backend)
+    for table, rebuilt in _derived(backend).items():
+        pd.testing.assert_frame_equal(refreshed[table], rebuilt, check_dtype=False, obj=table)
+
+
+# One hospital's current rows as cleaned rows (payer and plan names, not IDs)
+def cleaned_rows(hospital_id):
+    return f"""
+        SELECT m.HOSPITAL_ID, p.PAYER_NAME, pl.PLAN_NAME, m.CODE,
+               m.STANDARD_CHARGE_DOLLAR, m.MAXIMUM_CHARGE, m.MINIMUM_CHARGE
+        FROM {qualified_name("MASTER_TABLE")} m
+        JOIN {qualified_name("INSURANCE_PROVIDERS")} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
+        JOIN {qualified_name("INSURANCE_PLANS")} pl ON m.INSURANCE_PLAN_ID = pl.INSURANCE_PLAN_ID
+        WHERE m.HOSPITAL_ID = '{hospital_id}'
+    """
+
+
+# H2 is shared by two campuses in different cities; H5 has no city
+@pytest.mark.parametrize("hospital_id", ["H1", "H2", "H5"])
+def test_reload_refresh_matches_rebuild(backend, hospital_id):
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows(hospital_id)}")
+    backend.run(f"DELETE FROM {cleaned_table} WHERE CODE = '99201'")
+    backend.run(f"UPDATE {cleaned_table} SET STANDARD_CHARGE_DOLLAR = STANDARD_CHARGE_DOLLAR * 3 WHERE CODE = '99202'")
+    backend.run(f"""
+        INSERT INTO {cleaned_table}
+        VALUES ('{hospital_id}', 'Aetna', 'PPO', '99500', 42.5, 85.0, 21.25)
+    """)
+
+    report = load_hospital(backend, hospital_id)
+
+    assert report["deleted"] > 0 and report["updated"] > 0
+    assert_matches_rebuild(backend)
+
+
+# The page's metrics from the rollup against the same metrics computed from
+# MASTER_TABLE directly
+def test_hospital_variation_matches_master_table(backend):
+    query = bind("hospital_variation", min_procedures=1, state=None, city=None)
+    result = backend.run(query.sql, query.params).set_index(["HOSPITAL_ID", "CITY"])
+    charges = backend.run(f"""
+        SELECT HOSPITAL_ID, CODE, STANDARD_CHARGE_DOLLAR as CHARGE
+        FROM {qualified_name("MASTER_TABLE")} WHERE STANDARD_CHARGE_DOLLAR > 0
+    """)
+
+    # One row per campus: H2 is listed in Charlotte and in Matthews
+    assert len(result) == 6
+    for (hospital_id, _), row in result.iterrows():
+        values = charges.loc[charges["HOSPITAL_ID"] == hospital_id, "CHARGE"]
+        assert row["AVG_PRICE"] == pytest.approx(values.mean())
+        assert row["STANDARD_DEVIATION"] == pytest.approx(values.std())
+        assert row["COEFFICIENT_OF_VARIATION"] == pytest.approx(values.std() / values.mean() * 100)
+        assert row["PRICE_RANGE"] == pytest.approx(values.max() - values.min())
+        assert row["UNIQUE_CODES"] == charges.loc[charges["HOSPITAL_ID"] == hospital_id, "CODE"].nunique()
+
+
+def test_ensure_builds_only_missing_tables(backend):
+    backend.run(f"DROP TABLE {qualified_name('HOSPITAL_PRICE_STATS')}")
+
+    assert ensure_derived_tables(backend) == ["HOSPITAL_PRICE_STATS"]
+    assert ensure_derived_tables(backend) == []
+    assert_matches_rebuild(backend)
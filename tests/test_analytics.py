@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import (CONSISTENCY_LABELS, PRICE_LABELS, consistency_category, group_deltas, location_labels,
+                       percentile_rank, price_category)
+
+# The row-wise versions the pages used before, as reference results
+
+
+def old_score_category(percentile):
+    if percentile >= 80:
+        return "High Consistency"
+    elif percentile >= 50:
+        return "Medium Consistency"
+    else:
+        return "Low Consistency"
+
+
+def old_price_category(pct_diff):
+    if pct_diff < -20:
+        return "Significantly Lower"
+    elif pct_diff < -5:
+        return "Moderately Lower"
+    elif pct_diff <= 5:
+        return "Comparable"
+    elif pct_diff <= 20:
+        return "Moderately Higher"
+    else:
+        return "Significantly Higher"
+
+
+def old_state_comparison(df):
+    state_avgs = df.groupby('STATE')['PRICE_METRIC'].mean().reset_index()
+    state_avgs.columns = ['STATE', 'STATE_AVG']
+    comparison = df.merge(state_avgs, on='STATE', how='left')
+    comparison['PRICE_DIFF'] = comparison['PRICE_METRIC'] - comparison['STATE_AVG']
+    comparison['PRICE_DIFF_PCT'] = (comparison['PRICE_DIFF'] / comparison['STATE_AVG']) * 100
+    return comparison
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(3)
+
+
+def test_percentile_rank_matches_pandas_rank(rng):
+    values = pd.Series(np.round(rng.gamma(2.0, 20.0, 500), 1))
+    np.testing.assert_allclose(percentile_rank(values), values.rank(pct=True) * 100)
+    np.testing.assert_allclose(percentile_rank(values, higher_is_better=False), 100 - values.rank(pct=True) * 100)
+
+
+def test_consistency_category_matches_row_wise(rng):
+    percentiles = np.concatenate([rng.uniform(0, 100, 500), [0, 49.99, 50, 79.99, 80, 100, np.nan]])
+    result = consistency_category(percentiles)
+    assert list(result.categories) == CONSISTENCY_LABELS and result.ordered
+    assert list(result.astype(str)) == [old_score_category(p) for p in percentiles]
+
+
+# Both edge kinds (< and <=) and missing differences, which the old chain also
+# put in the last category
+def test_price_category_matches_row_wise(rng):
+    diffs = np.concatenate([rng.normal(0, 25, 500), [-20, -20.01, -5, -5.01, 5, 5.01, 20, 20.01, np.nan]])
+    result = price_category(diffs)
+    assert list(result.categories) == PRICE_LABELS and result.ordered
+    assert list(result.astype(str)) == [old_price_category(d) for d in diffs]
+
+
+def test_location_labels_match_row_wise(rng):
+    df = pd.DataFrame({
+        "CITY": rng.choice(["Charlotte", "Matthews", "Las Vegas", "A, B", "A"], 300),
+        "STATE": rng.choice(["NC", "NV", "C", "B, C"], 300),
+    })
+    result = location_labels(df["CITY"], df["STATE"])
+    assert list(result.astype(str)) == list(df.apply(lambda x: f"{x['CITY']}, {x['STATE']}", axis=1))
+    # "A, B" + "C" and "A" + "B, C" share one category
+    assert len(result.categories) == len(set(result.astype(str)))
+
+
+def test_location_labels_leave_missing_locations_missing():
+    result = location_labels(pd.Series(["Charlotte", None, "Elgin"]), pd.Series(["NC", "NC", None]))
+    assert result[0] == "Charlotte, NC"
+    assert pd.isna(result[1]) and pd.isna(result[2])
+
+
+def test_group_deltas_match_merge(rng):
+    df = pd.DataFrame({
+        "CITY": [f"City {i}" for i in range(200)],
+        "STATE": rng.choice(["NC", "NV", "IL", None], 200),
+        "PRICE_METRIC": rng.lognormal(6, 1, 200),
+    })
+    result = group_deltas(df)
+    expected = old_state_comparison(df)
+    for column in ["STATE_AVG", "PRICE_DIFF", "PRICE_DIFF_PCT"]:
+        np.testing.assert_allclose(result[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float))
+    assert list(result["CITY"]) == list(df["CITY"])
+    assert "STATE_AVG" not in df
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from aggregates import CHEAPEST_OFFERS_K
+from conftest import CODES, FULL_PAGE_CODE
+from fact_store import FactStore
+from master_loader import load_hospital
+from query_backend import qualified_name
+from query_templates import NAVIGATOR_PAGE_KEY, bind
+from test_aggregates import cleaned_rows
+
+cleaned_table = qualified_name("CLEANED_CHARGES")
+
+OFFER_COLUMNS = ["HOSPITAL_ID", "INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID", "CODE", "STANDARD_CHARGE_DOLLAR",
+                 "MINIMUM_CHARGE", "MAXIMUM_CHARGE"]
+
+
+# The cheapest offers as the Navigator read them from MASTER_TABLE before the
+# top-k table, in the page order
+def direct_cheapest(backend, code):
+    return backend.run(f"""
+        SELECT {", ".join(f"m.{column}" for column in OFFER_COLUMNS)}
+        FROM {qualified_name("MASTER_TABLE")} m
+        WHERE m.CODE = ? AND m.STANDARD_CHARGE_DOLLAR IS NOT NULL
+        ORDER BY {", ".join(column for column, _ in NAVIGATOR_PAGE_KEY)}
+        LIMIT {CHEAPEST_OFFERS_K}
+    """, [code])
+
+
+def assert_matches_direct(backend, store=None):
+    for code in CODES + [FULL_PAGE_CODE, "00000"]:
+        query = bind("navigator_cheapest", code=code)
+        result = backend.run(query.sql, query.params)
+        expected = direct_cheapest(backend, code)
+        pd.testing.assert_frame_equal(result[OFFER_COLUMNS], expected, check_dtype=False, obj=code)
+        if store is not None:
+            pd.testing.assert_frame_equal(store.cheapest(code)[OFFER_COLUMNS], expected, check_dtype=False, obj=code)
+
+
+def test_top_k_matches_master_table(backend):
+    assert_matches_direct(backend, FactStore.from_backend(backend))
+
+
+# A reload that deletes some of a code's cheapest offers promotes the next
+# cheapest ones from MASTER_TABLE
+def test_top_k_matches_after_reload(backend):
+    cheapest = direct_cheapest(backend, "99203")
+    hospital_id = cheapest["HOSPITAL_ID"].iloc[0]
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows(hospital_id)}")
+    backend.run(f"DELETE FROM {cleaned_table} WHERE CODE = '99203'")
+    backend.run(f"UPDATE {cleaned_table} SET STANDARD_CHARGE_DOLLAR = 1.0 WHERE CODE = '99204'")
+    load_hospital(backend, hospital_id)
+
+    assert hospital_id not in set(direct_cheapest(backend, "99203")["HOSPITAL_ID"])
+    assert_matches_direct(backend)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import refresh_cpt_price_index
+from query_backend import qualified_name
+from query_templates import bind
+
+master_table = qualified_name("MASTER_TABLE")
+service_code_table = qualified_name("SERVICE_CODES")
+cpt_price_index_table = qualified_name("CPT_PRICE_INDEX")
+
+# The deep dive as it was before the index: MASTER_TABLE joined to itself,
+# one output row per pair of rows with the same code
+SELF_JOIN_DEEP_DIVE = f"""
+    SELECT
+        s.CODE,
+        s.DESCRIPTION,
+        m.STANDARD_CHARGE_DOLLAR as PRICE,
+        AVG(m2.STANDARD_CHARGE_DOLLAR) OVER (PARTITION BY s.CODE) as AVG_PRICE_ACROSS_HOSPITALS
+    FROM {master_table} m
+    JOIN {service_code_table} s ON m.CODE = s.CODE
+    JOIN {master_table} m2 ON s.CODE = m2.CODE AND m2.STANDARD_CHARGE_DOLLAR > 0
+    WHERE m.HOSPITAL_ID = ? AND m.STANDARD_CHARGE_DOLLAR > 0
+"""
+
+
+def _sorted(df, columns):
+    return df[columns].sort_values(columns).reset_index(drop=True)
+
+
+def test_index_matches_master_table(backend):
+    index = backend.run(f"SELECT * FROM {cpt_price_index_table}").set_index("CODE")
+    charges = backend.run(f"SELECT * FROM {master_table} WHERE STANDARD_CHARGE_DOLLAR > 0")
+
+    assert sorted(index.index) == sorted(charges["CODE"].unique())
+    for code, rows in charges.groupby("CODE"):
+        values = rows["STANDARD_CHARGE_DOLLAR"].to_numpy()
+        assert index.loc[code, "CHARGE_COUNT"] == len(values)
+        assert index.loc[code, "HOSPITAL_COUNT"] == rows["HOSPITAL_ID"].nunique()
+        assert index.loc[code, "MEAN_CHARGE"] == pytest.approx(values.mean())
+        assert index.loc[code, "MEDIAN_CHARGE"] == pytest.approx(np.median(values))
+        for q in (10, 25, 75, 90):
+            assert index.loc[code, f"P{q}_CHARGE"] == pytest.approx(np.percentile(values, q))
+
+
+# Same prices and market averages as the self-join, with one row per hospital
+# row instead of one per pair
+@pytest.mark.parametrize("hospital_id", ["H1", "H2"])
+def test_deep_dive_matches_self_join(backend, hospital_id):
+    query = bind("procedure_deep_dive", hospital_id=hospital_id)
+    result = backend.run(query.sql, query.params)
+    old = backend.run(SELF_JOIN_DEEP_DIVE, [hospital_id]).drop_duplicates()
+    columns = ["CODE", "DESCRIPTION", "PRICE", "AVG_PRICE_ACROSS_HOSPITALS"]
+
+    rows = backend.run(f"SELECT COUNT(*) as N FROM {master_table} WHERE HOSPITAL_ID = ? AND STANDARD_CHARGE_DOLLAR > 0",
+                       [hospital_id])
+    assert len(result) == rows["N"].iloc[0]
+    pd.testing.assert_frame_equal(_sorted(result, columns).drop_duplicates().reset_index(drop=True),
+                                  _sorted(old, columns), check_dtype=False)
+    expected = (result["PRICE"] - result["AVG_PRICE_ACROSS_HOSPITALS"]) / result["AVG_PRICE_ACROSS_HOSPITALS"] * 100
+    np.testing.assert_allclose(result["PERCENT_DIFF_FROM_AVG"], expected)
+    assert result["PERCENT_DIFF_FROM_AVG"].abs().is_monotonic_decreasing
+
+
+def test_refresh_drops_codes_without_rows(backend):
+    backend.run(f"DELETE FROM {master_table} WHERE CODE = '99201'")
+    backend.run(f"UPDATE {master_table} SET STANDARD_CHARGE_DOLLAR = 1000 WHERE CODE = '99202'")
+    refresh_cpt_price_index(backend, ["99201", "99202"])
+
+    index = backend.run(f"SELECT CODE, MAX_CHARGE FROM {cpt_price_index_table}").set_index("CODE")
+    assert "99201" not in index.index
+    assert index.loc["99202", "MAX_CHARGE"] == 1000
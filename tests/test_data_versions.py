@@ -0,0 +1,101 @@
+import logging
+
+import pandas as pd
+
+import data_versions
+from data_versions import DataVersions, bump_data_versions, source_version
+from query_backend import qualified_name
+from query_templates import bind
+from result_cache import ResultCache
+
+charges_query = bind("city_charge_sketches", code="99203", state=None)
+states_query = bind("states")
+
+
+# The dashboard's execute_template: cache each result under its template key
+# and the stamps of the tables it reads
+def cached_run(backend, cache, versions, query):
+    key = f"{query.key}-{versions.stamp(query.tables)}"
+    df = cache.get(key)
+    if df is None:
+        df = backend.run(query.sql, query.params)
+        cache.put(key, df)
+    return df
+
+
+def test_load_invalidates_only_results_it_changes(backend):
+    versions = DataVersions(backend, check_seconds=0)
+    charges_stamp, states_stamp = versions.stamp(charges_query.tables), versions.stamp(states_query.tables)
+    assert versions.stamp(charges_query.tables) == charges_stamp
+
+    bump_data_versions(backend, ["MASTER_TABLE"])
+
+    assert versions.stamp(charges_query.tables) != charges_stamp
+    assert versions.stamp(states_query.tables) == states_stamp
+
+
+def test_cached_result_is_served_until_its_stamp_changes(backend, tmp_path):
+    versions = DataVersions(backend, check_seconds=0)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    before = cached_run(backend, cache, versions, charges_query)
+
+    backend.run(f"UPDATE {qualified_name('CHARGE_SKETCHES')} SET BUCKET_COUNT = BUCKET_COUNT * 2")
+    pd.testing.assert_frame_equal(cached_run(backend, cache, versions, charges_query), before)
+
+    bump_data_versions(backend, ["MASTER_TABLE"])
+    after = cached_run(backend, cache, versions, charges_query)
+    assert after["BUCKET_COUNT"].sum() == 2 * before["BUCKET_COUNT"].sum()
+
+
+# Stamps are re-read at most every check_seconds
+def test_stamps_are_rechecked_after_interval(backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(data_versions.time, "monotonic", lambda: clock[0])
+    versions = DataVersions(backend, check_seconds=30)
+    stamp = versions.stamp(charges_query.tables)
+
+    bump_data_versions(backend, ["MASTER_TABLE"])
+    clock[0] += 29
+    assert versions.stamp(charges_query.tables) == stamp
+    clock[0] += 1
+    assert versions.stamp(charges_query.tables) != stamp
+
+
+# Without a DATA_VERSIONS row a table's results live for unversioned_ttl seconds
+def test_unversioned_tables_expire_after_ttl(backend, monkeypatch):
+    clock = [7200.0]
+    monkeypatch.setattr(data_versions.time, "time", lambda: clock[0])
+    backend.run(f"DELETE FROM {data_versions.data_versions_table} WHERE TABLE_NAME = 'MASTER_TABLE'")
+    versions = DataVersions(backend, check_seconds=0, unversioned_ttl=3600)
+    charges_stamp, states_stamp = versions.stamp(charges_query.tables), versions.stamp(states_query.tables)
+
+    clock[0] += 3599
+    assert versions.stamp(charges_query.tables) == charges_stamp
+    clock[0] += 1
+    assert versions.stamp(charges_query.tables) != charges_stamp
+    assert versions.stamp(states_query.tables) == states_stamp
+
+
+def test_read_failure_is_logged_and_falls_back_to_ttl(backend, monkeypatch, caplog):
+    versions = DataVersions(backend, check_seconds=0)
+    stamp = versions.stamp(charges_query.tables)
+
+    def fail():
+        raise RuntimeError("warehouse unavailable")
+
+    monkeypatch.setattr(backend, "last_altered", fail)
+    with caplog.at_level(logging.WARNING, logger="data_versions"):
+        assert versions.current() == {}
+    assert "Could not read data versions" in caplog.text
+    assert versions.stamp(charges_query.tables) != stamp
+
+
+def test_source_version_changes_when_file_is_rewritten(tmp_path):
+    path = tmp_path / "MASTER_TABLE.csv"
+    path.write_text("HOSPITAL_ID\nH1\n")
+    version = source_version(str(path))
+    assert source_version(str(path)) == version
+
+    path.write_text("HOSPITAL_ID\nH1\nH2\n")
+    assert source_version(str(path)) != version
+    assert source_version(str(tmp_path)) != source_version(str(path))
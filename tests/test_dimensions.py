@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+from dimensions import MISSING_LABEL, NAVIGATOR_COLUMNS, DimensionCache
+from query_backend import qualified_name
+from query_templates import bind
+
+
+@pytest.fixture
+def dimensions(backend):
+    return DimensionCache(backend.run)
+
+
+def facts(rows):
+    return pd.DataFrame(rows, columns=["HOSPITAL_ID", "INSURANCE_PROVIDER_ID", "INSURANCE_PLAN_ID", "CODE",
+                                       "STANDARD_CHARGE_DOLLAR", "MINIMUM_CHARGE", "MAXIMUM_CHARGE"])
+
+
+# Labels match the joins the Navigator's SQL used to do
+def test_labels_match_sql_joins(backend, dimensions):
+    query = bind("navigator_cheapest", code="99203")
+    labeled = dimensions.label(backend.run(query.sql, query.params))
+    expected = backend.run(f"""
+        SELECT s.DESCRIPTION, h.HOSPITAL_NAME, h.CITY, h.STATE, h.ZIPCODE, p.PAYER_NAME, pl.PLAN_NAME,
+               c.STANDARD_CHARGE_DOLLAR, c.MINIMUM_CHARGE, c.MAXIMUM_CHARGE
+        FROM {qualified_name("CHEAPEST_OFFERS")} c
+        JOIN {qualified_name("SERVICE_CODES")} s ON c.CODE = s.CODE
+        JOIN {qualified_name("HOSPITAL_DATA")} h ON c.HOSPITAL_ID = h.HOSPITAL_ID
+        JOIN {qualified_name("INSURANCE_PROVIDERS")} p ON c.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
+        JOIN {qualified_name("INSURANCE_PLANS")} pl ON c.INSURANCE_PLAN_ID = pl.INSURANCE_PLAN_ID
+        WHERE c.CODE = '99203'
+    """)
+
+    assert list(labeled.columns) == NAVIGATOR_COLUMNS
+    pd.testing.assert_frame_equal(
+        labeled.astype(str).sort_values(NAVIGATOR_COLUMNS).reset_index(drop=True),
+        expected.astype(str).sort_values(NAVIGATOR_COLUMNS).reset_index(drop=True),
+    )
+
+
+# A page keeps every fact row even when the cache does not know its labels
+def test_rows_with_unknown_dimensions_are_kept(dimensions):
+    page = facts([
+        ("H1", 1, 1, "99203", 100.0, 50.0, 200.0),
+        ("H9", 1, 1, "99203", 110.0, 50.0, 200.0),
+        ("H1", 99, 1, "99203", 120.0, 50.0, 200.0),
+        ("H1", 1, 99, "99999", 130.0, 50.0, 200.0),
+    ])
+    labeled = dimensions.label(page)
+
+    assert labeled["STANDARD_CHARGE_DOLLAR"].tolist() == [100.0, 110.0, 120.0, 130.0]
+    assert labeled["HOSPITAL_NAME"].tolist() == ["Uptown Medical", MISSING_LABEL, "Uptown Medical", "Uptown Medical"]
+    assert labeled["PAYER_NAME"].tolist()[2] == MISSING_LABEL
+    assert labeled[["PLAN_NAME", "DESCRIPTION"]].iloc[3].tolist() == [MISSING_LABEL, MISSING_LABEL]
+
+
+def test_duplicate_code_takes_its_first_description(backend):
+    codes = backend.run(f"SELECT * FROM {qualified_name('SERVICE_CODES')}")
+    extra = codes[codes["CODE"] == "99203"].assign(DESCRIPTION="Second description")
+    backend.load_dataframe("SERVICE_CODES", pd.concat([codes, extra], ignore_index=True))
+    dimensions = DimensionCache(backend.run)
+
+    labeled = dimensions.label(facts([("H1", 1, 1, "99203", 100.0, 50.0, 200.0)]))
+    assert labeled["DESCRIPTION"].tolist() == ["Procedure 99203"]
+
+
+# H2 is two campuses: one row per campus, or only the campuses asked for
+def test_shared_hospital_id(dimensions):
+    page = facts([("H2", 1, 1, "99203", 100.0, 50.0, 200.0)])
+
+    assert sorted(dimensions.label(page)["CITY"]) == ["Charlotte", "Matthews"]
+    matthews = dimensions.hospitals[dimensions.hospitals["CITY"] == "Matthews"]
+    assert dimensions.label(page, matthews)["HOSPITAL_NAME"].tolist() == ["Matthews Campus"]
+    assert dimensions.label(facts([("H1", 1, 1, "99203", 1.0, 1.0, 1.0)]), matthews).empty
+
+
+def _names(hospitals):
+    return sorted(hospitals["HOSPITAL_NAME"])
+
+
+@pytest.mark.parametrize("search, expected", [
+    ("28203", ["Uptown Medical"]),
+    ("28203-1234", ["Uptown Medical"]),
+    ("282", ["Mint Hill Campus", "Uptown Medical"]),
+    ("28203, 89169;28105", ["Desert Springs", "Matthews Campus", "Uptown Medical"]),
+    (["28", "281"], ["Matthews Campus", "Mint Hill Campus", "Uptown Medical"]),
+    ("Charlotte", []),
+    ("99999", []),
+    ("", []),
+])
+def test_zip_searches(dimensions, search, expected):
+    assert _names(dimensions.hospitals_in_zipcodes(search)) == expected
+
+
+# A city covers every hospital in its ZIP codes, found case-insensitively
+def test_city_searches(dimensions):
+    assert _names(dimensions.hospitals_in_city(" charlotte ")) == ["Mint Hill Campus", "Uptown Medical"]
+    assert _names(dimensions.hospitals_in_city("LAS VEGAS")) == ["Desert Springs"]
+    assert dimensions.hospitals_in_city("nowhere").empty
+    assert dimensions.hospitals_in_city(None).empty
+    assert dimensions.hospitals_in_city("").empty
+
+
+def test_reload_picks_up_new_hospitals(backend, dimensions):
+    backend.run(f"INSERT INTO {qualified_name('HOSPITAL_DATA')} VALUES ('Ballantyne', 'H6', 'Charlotte', 'NC', '28277')")
+    assert "Ballantyne" not in _names(dimensions.hospitals_in_city("Charlotte"))
+    dimensions.reload()
+    assert "Ballantyne" in _names(dimensions.hospitals_in_city("Charlotte"))
+    assert _names(dimensions.hospitals_in_zipcodes("28277")) == ["Ballantyne"]
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fact_store import FACT_COLUMNS, FactStore
+from query_backend import qualified_name
+from query_templates import NAVIGATOR_PAGE_KEY, bind, navigator_filters
+
+GROUP_COLUMNS = {"hospital": "HOSPITAL_ID", "provider": "INSURANCE_PROVIDER_ID", "plan": "INSURANCE_PLAN_ID",
+                 "code": "CODE"}
+
+
+@pytest.fixture
+def master(backend):
+    return backend.run(f"SELECT {', '.join(FACT_COLUMNS)} FROM {qualified_name('MASTER_TABLE')}")
+
+
+@pytest.fixture
+def store(backend):
+    return FactStore.from_backend(backend)
+
+
+def _sorted(df):
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("key", sorted(GROUP_COLUMNS))
+@pytest.mark.parametrize("code, hospital_ids", [(None, None), ("99203", None), ("99205", ["H2", "H4", "H9"])])
+def test_group_by_matches_pandas(master, store, key, code, hospital_ids):
+    rows = master[master["STANDARD_CHARGE_DOLLAR"] > 0]
+    if code is not None:
+        rows = rows[rows["CODE"] == code]
+    if hospital_ids is not None:
+        rows = rows[rows["HOSPITAL_ID"].isin(hospital_ids)]
+    column = GROUP_COLUMNS[key]
+    expected = rows.groupby(column)["STANDARD_CHARGE_DOLLAR"].agg(["count", "sum", "mean", "median", "min", "max"])
+
+    result = store.group_by(key, code, hospital_ids).set_index(column)
+    assert sorted(result.index.astype(str)) == sorted(expected.index.astype(str))
+    result.index = result.index.astype(str)
+    expected.index = expected.index.astype(str)
+    for ours, theirs in [("CHARGE_COUNT", "count"), ("CHARGE_SUM", "sum"), ("MEAN_CHARGE", "mean"),
+                         ("MEDIAN_CHARGE", "median"), ("MIN_CHARGE", "min"), ("MAX_CHARGE", "max")]:
+        np.testing.assert_allclose(result[ours].to_numpy(dtype=float), expected.loc[result.index, theirs])
+
+
+def test_group_by_of_unknown_code_is_empty(store):
+    result = store.group_by("hospital", code="00000")
+    assert result.empty
+    assert list(result.columns) == ["HOSPITAL_ID", "CHARGE_COUNT", "CHARGE_SUM", "MEAN_CHARGE", "MEDIAN_CHARGE",
+                                    "MIN_CHARGE", "MAX_CHARGE"]
+
+
+def test_rows_match_master_table(master, store):
+    for code in ["99201", "99500"]:
+        expected = master[(master["CODE"] == code) & master["HOSPITAL_ID"].isin(["H1", "H3"])]
+        pd.testing.assert_frame_equal(_sorted(store.rows(code, ["H1", "H3"])), _sorted(expected))
+        assert store.count(code, ["H1", "H3"]) == expected["STANDARD_CHARGE_DOLLAR"].notna().sum()
+    assert len(store) == len(master)
+
+
+# Streaming frames one hospital at a time builds the same store as one frame
+def test_streamed_frames_match_one_frame(master, store):
+    whole = FactStore.from_frame(master)
+    for key in store.dictionaries:
+        np.testing.assert_array_equal(store.dictionaries[key], whole.dictionaries[key])
+    for key in store.columns:
+        np.testing.assert_array_equal(store.columns[key], whole.columns[key])
+
+
+def test_save_and_memory_mapped_load(store, tmp_path):
+    store.save(tmp_path / "store")
+    store.save(tmp_path / "store")
+    loaded = FactStore.load(tmp_path / "store")
+
+    assert isinstance(loaded.columns["dollar"], np.memmap)
+    pd.testing.assert_frame_equal(loaded.rows("99203"), store.rows("99203"))
+    assert loaded.nbytes == store.nbytes
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+
+
+# String IDs keep leading zeros and are never matched by truncation
+def test_lookup(master):
+    master = master.assign(HOSPITAL_ID=master["HOSPITAL_ID"].replace({"H1": "0004994"}))
+    store = FactStore.from_frame(master)
+    assert store.lookup("hospital", ["0004994", "4994", "0004994X", "H2"]).tolist()[:3] == [0, -1, -1]
+    assert store.lookup("hospital", ["H2"])[0] >= 0
+    assert store.rows("99203", ["0004994"])["HOSPITAL_ID"].unique().tolist() == ["0004994"]
+
+
+# The Navigator's payer and plan filters give the same rows from the store as
+# from the templates
+@pytest.mark.parametrize("provider_ids, plan_ids", [(None, None), ([1, 3], None), (None, [2]), ([2], [1, 5]),
+                                                    ([99], None)])
+def test_payer_and_plan_filters_match_the_templates(backend, store, provider_ids, plan_ids):
+    hospital_ids = ["H1", "H2", "H3"]
+    filters = navigator_filters(provider_ids, plan_ids)
+    query = bind("navigator_hospitals_count", code="99204", hospital_ids=hospital_ids, **filters)
+    count = backend.run(query.sql, query.params)["ROW_COUNT"].iloc[0]
+    assert store.count("99204", hospital_ids, provider_ids, plan_ids) == count
+
+    query = bind("navigator_hospitals_page_250", code="99204", hospital_ids=hospital_ids, **filters,
+                 **{param: None for _, param in NAVIGATOR_PAGE_KEY})
+    expected = backend.run(query.sql, query.params)
+    page = store.page("99204", hospital_ids, 251, None, provider_ids, plan_ids)
+    assert len(page) == count
+    assert page["STANDARD_CHARGE_DOLLAR"].tolist() == expected["STANDARD_CHARGE_DOLLAR"].tolist()
+    if provider_ids is not None:
+        assert set(page["INSURANCE_PROVIDER_ID"]) <= set(provider_ids)
+    if plan_ids is not None:
+        assert set(page["INSURANCE_PLAN_ID"]) <= set(plan_ids)
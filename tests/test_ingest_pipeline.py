@@ -0,0 +1,121 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import ingest_pipeline
+from cleaning import CLEANED_COLUMNS
+from ingest_pipeline import load_manifest, run_pipeline
+
+STAGE_COLUMNS = ['Description', 'Code', 'Code Type', 'Payer Name', 'Plan Name', 'Standard Charge Dollar',
+                 'Standard Charge Percentage', 'Minimum Charge', 'Maximum Charge']
+
+
+def stage_rows(count, price=100.0):
+    return [
+        [f"Procedure {i % 7}", f"992{i % 7:02d}", "CPT", ["Aetna", "Cigna"][i % 2], f"Plan {i % 3}",
+         price + i, "", 10.0, 900.0]
+        for i in range(count)
+    ]
+
+
+def write_stage(path, rows):
+    pd.DataFrame(rows, columns=STAGE_COLUMNS).to_csv(path, index=False)
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    entries = []
+    for hospital, hospital_id, state in [("UPTOWN", "H1", "NC"), ("DESERT", "H3", "NV")]:
+        write_stage(tmp_path / f"{hospital}.csv", stage_rows(40))
+        entries.append({"hospital": hospital, "hospital_id": hospital_id, "state": state,
+                        "source": f"{hospital}.csv", "header_row": 0})
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(entries))
+    return str(path)
+
+
+def test_manifest_sources_are_relative_to_the_manifest(manifest, tmp_path):
+    assert [entry["source"] for entry in load_manifest(manifest)] == \
+        [str(tmp_path / "UPTOWN.csv"), str(tmp_path / "DESERT.csv")]
+
+
+def test_every_hospital_is_cleaned(manifest, tmp_path):
+    output = tmp_path / "cleaned"
+    summary = run_pipeline(load_manifest(manifest), str(output), workers=2, chunk_size=15)
+
+    assert summary["failures"] == []
+    assert sorted(result["rows_loaded"] for result in summary["results"]) == [40, 40]
+    df = pd.read_csv(output / "UPTOWN.csv")
+    assert list(df.columns) == CLEANED_COLUMNS
+    assert df["STANDARD_CHARGE_DOLLAR"].tolist() == [100.0 + i for i in range(40)]
+    assert not any(name.endswith(".tmp") for name in os.listdir(output))
+
+
+def test_incremental_run_skips_unchanged_files(manifest, tmp_path):
+    output = str(tmp_path / "cleaned")
+    entries = load_manifest(manifest)
+    run_pipeline(entries, output, workers=2, incremental=True)
+    write_stage(tmp_path / "DESERT.csv", stage_rows(41))
+
+    results = {r["hospital"]: r for r in run_pipeline(entries, output, workers=2, incremental=True)["results"]}
+    assert results["UPTOWN"]["skipped"] and not results["DESERT"]["skipped"]
+    assert results["DESERT"]["rows_loaded"] == 41
+
+
+# Rows repeated in several chunks are inserted once; rows that disappear or
+# change price come back as deletes
+def test_delta_loader_emits_only_changes(manifest, tmp_path):
+    output = tmp_path / "deltas"
+    entries = [entry for entry in load_manifest(manifest) if entry["hospital"] == "UPTOWN"]
+    rows = stage_rows(30)
+    write_stage(tmp_path / "UPTOWN.csv", rows + rows[:10])
+
+    first = run_pipeline(entries, str(output), workers=1, loader="delta", chunk_size=7)["results"][0]
+    assert (first["inserted"], first["deleted"]) == (30, 0)
+
+    changed = rows[:20] + [rows[20][:5] + [999.0] + rows[20][6:]] + stage_rows(32)[30:]
+    write_stage(tmp_path / "UPTOWN.csv", changed + changed[:5])
+    second = run_pipeline(entries, str(output), workers=1, loader="delta", chunk_size=7)["results"][0]
+
+    delta = pd.read_csv(output / "UPTOWN.delta.csv")
+    assert (second["inserted"], second["deleted"]) == (3, 10)
+    assert sorted(delta.loc[delta["ACTION"] == "insert", "STANDARD_CHARGE_DOLLAR"]) == [130.0, 131.0, 999.0]
+    assert sorted(delta.loc[delta["ACTION"] == "delete", "STANDARD_CHARGE_DOLLAR"]) == [100.0 + i for i in range(20, 30)]
+    assert (delta["HOSPITAL_ID"] == "H1").all()
+
+    third = run_pipeline(entries, str(output), workers=1, loader="delta", chunk_size=7)["results"][0]
+    assert (third["inserted"], third["deleted"]) == (0, 0)
+
+
+# Stand-in for process_hospital: the first attempt at each hospital fails,
+# either by raising or by killing its worker process
+def flaky_process_hospital(entry, output_dir, *args):
+    marker = os.path.join(os.path.dirname(entry["source"]), f"{entry['hospital']}.attempted")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        if entry["hospital"] == "UPTOWN":
+            os._exit(1)
+        raise RuntimeError("source unavailable")
+    return real_process_hospital(entry, output_dir, *args)
+
+
+real_process_hospital = ingest_pipeline.process_hospital
+
+
+def test_failed_and_crashed_hospitals_are_retried(manifest, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "process_hospital", flaky_process_hospital)
+    summary = run_pipeline(load_manifest(manifest), str(tmp_path / "cleaned"), workers=2, retries=2)
+
+    assert summary["failures"] == []
+    assert sorted(result["hospital"] for result in summary["results"]) == ["DESERT", "UPTOWN"]
+    assert os.path.exists(tmp_path / "cleaned" / "UPTOWN.csv")
+
+
+def test_hospitals_fail_after_their_retries(manifest, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "process_hospital", flaky_process_hospital)
+    summary = run_pipeline(load_manifest(manifest), str(tmp_path / "cleaned"), workers=2, retries=0)
+
+    assert sorted(failure["hospital"] for failure in summary["failures"]) == ["DESERT", "UPTOWN"]
+    assert summary["results"] == []
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+import master_loader
+from master_loader import apply_changes, load_hospital
+from query_backend import qualified_name
+from test_aggregates import _derived, _table, assert_matches_rebuild, cleaned_rows
+
+master_table = qualified_name("MASTER_TABLE")
+cleaned_table = qualified_name("CLEANED_CHARGES")
+changes_table = qualified_name("CLEANED_CHARGES_DELTA")
+
+
+def _rows(backend, hospital_id):
+    df = backend.run(f"SELECT * FROM {master_table} WHERE HOSPITAL_ID = ?", [hospital_id])
+    return set(df.astype(str).itertuples(index=False))
+
+
+def test_reload_changes_only_what_changed(backend):
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows('H4')}")
+    before = _rows(backend, "H4")
+
+    report = load_hospital(backend, "H4")
+
+    assert (report["inserted"], report["updated"], report["deleted"]) == (0, 0, 0)
+    assert report["unchanged"] == len(before)
+    assert _rows(backend, "H4") == before
+
+
+# Counts are per row: a key whose one price becomes two is one update and one
+# insert, and inserted + updated rows are exactly the rows added
+def test_counts_are_per_row(backend):
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows('H1')}")
+    key = backend.run(f"SELECT * FROM {cleaned_table} WHERE CODE = '99203' LIMIT 1")
+    payer, plan = key["PAYER_NAME"].iloc[0], key["PLAN_NAME"].iloc[0]
+    backend.run(f"""
+        UPDATE {cleaned_table} SET STANDARD_CHARGE_DOLLAR = STANDARD_CHARGE_DOLLAR + 1
+        WHERE CODE = '99203' AND PAYER_NAME = ? AND PLAN_NAME = ?
+    """, [payer, plan])
+    backend.run(f"""
+        INSERT INTO {cleaned_table}
+        SELECT HOSPITAL_ID, PAYER_NAME, PLAN_NAME, CODE, STANDARD_CHARGE_DOLLAR + 2, MAXIMUM_CHARGE, MINIMUM_CHARGE
+        FROM {cleaned_table} WHERE CODE = '99203' AND PAYER_NAME = ? AND PLAN_NAME = ?
+    """, [payer, plan])
+    backend.run(f"DELETE FROM {cleaned_table} WHERE CODE = '99204'")
+    before = _rows(backend, "H1")
+
+    report = load_hospital(backend, "H1")
+
+    after = _rows(backend, "H1")
+    deleted_99204 = sum(1 for row in before if row[3] == "99204")
+    assert (report["inserted"], report["updated"], report["deleted"]) == (1, 1, deleted_99204)
+    assert report["inserted"] + report["updated"] == len(after - before)
+    assert report["deleted"] + report["updated"] == len(before - after)
+    assert report["unchanged"] == len(after & before)
+    assert_matches_rebuild(backend)
+
+
+def test_change_file_refresh_matches_rebuild(backend):
+    backend.run(f"""
+        CREATE TABLE {changes_table} AS
+        SELECT 'delete' as ACTION, * FROM ({cleaned_rows("H3")}) WHERE CODE IN ('99203', '99204')
+        UNION ALL
+        SELECT 'insert' as ACTION, HOSPITAL_ID, PAYER_NAME, PLAN_NAME, CODE,
+               STANDARD_CHARGE_DOLLAR + 1, MAXIMUM_CHARGE, MINIMUM_CHARGE
+        FROM ({cleaned_rows("H3")}) WHERE CODE = '99204'
+    """)
+
+    report = apply_changes(backend, "H3", changes_table)
+
+    assert report["deleted"] > 0 and report["updated"] > 0
+    assert_matches_rebuild(backend)
+
+
+# The DELETE, INSERT and refresh run in one transaction
+def test_failed_refresh_leaves_tables_unchanged(backend, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("refresh failed")
+
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows('H1')} AND m.CODE <> '99201'")
+    master = _table(backend, "MASTER_TABLE")
+    derived = _derived(backend)
+    monkeypatch.setattr(master_loader, "refresh_cheapest_offers", fail)
+
+    with pytest.raises(RuntimeError):
+        load_hospital(backend, "H1")
+
+    pd.testing.assert_frame_equal(_table(backend, "MASTER_TABLE"), master)
+    for table, before in _derived(backend).items():
+        pd.testing.assert_frame_equal(before, derived[table], obj=table)
+    assert "MASTER_TABLE_DELTA" not in backend.list_tables()
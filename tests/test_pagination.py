@@ -0,0 +1,134 @@
+import pandas as pd
+import pytest
+
+from conftest import FULL_PAGE_CODE, make_tables
+from fact_store import FACT_COLUMNS, FactStore
+from query_backend import LocalBackend
+from query_templates import NAVIGATOR_PAGE_KEY, bind, navigator_cursor, navigator_filters
+
+
+def _key(row):
+    charge, hospital_id, provider_id, plan_id, minimum, maximum, methodology = navigator_cursor(row)
+    return (charge, hospital_id, int(provider_id), int(plan_id), minimum, maximum, methodology)
+
+
+def _keys(df):
+    return [_key(row) for _, row in df.iterrows()]
+
+
+def sql_page(backend, code, hospital_ids, page_size, after):
+    cursor = dict(zip([param for _, param in NAVIGATOR_PAGE_KEY], after or [None] * len(NAVIGATOR_PAGE_KEY)))
+    query = bind(f"navigator_hospitals_page_{page_size}", code=code, hospital_ids=hospital_ids, **cursor,
+                 **navigator_filters())
+    return backend.run(query.sql, query.params)
+
+
+def store_page(store, code, hospital_ids, page_size, after):
+    return store.page(code, hospital_ids, page_size + 1, after)
+
+
+# Follow Next until the last page, as the Navigator does: each fetch returns up
+# to page_size + 1 rows and the extra row only says that a next page exists
+def walk(fetch, page_size):
+    pages, after = [], None
+    while True:
+        rows = fetch(page_size, after)
+        page = rows.iloc[:page_size]
+        pages.append(_keys(page))
+        if len(rows) <= page_size:
+            return pages
+        after = _key(page.iloc[-1])
+
+
+def all_priced(backend, code, hospital_ids):
+    query = bind("navigator_hospitals_count", code=code, hospital_ids=hospital_ids, **navigator_filters())
+    count = int(backend.run(query.sql, query.params)["ROW_COUNT"].iloc[0])
+    placeholders = ", ".join("?" for _ in hospital_ids)
+    rows = backend.run(
+        f"SELECT {', '.join(FACT_COLUMNS)} FROM HEALTH_NAV.CORE.MASTER_TABLE m "
+        f"WHERE CODE = ? AND HOSPITAL_ID IN ({placeholders}) AND STANDARD_CHARGE_DOLLAR IS NOT NULL",
+        [code] + hospital_ids,
+    )
+    assert len(rows) == count
+    return sorted(_keys(rows))
+
+
+@pytest.mark.parametrize("page_size", [25, 50])
+@pytest.mark.parametrize("hospital_ids", [["H1", "H2", "H3", "H4", "H5"], ["H2"], ["H4", "H5"]])
+def test_pages_cover_every_row_once_in_order(backend, page_size, hospital_ids):
+    code = "99203"
+    expected = all_priced(backend, code, hospital_ids)
+    store = FactStore.from_backend(backend)
+
+    sql_pages = walk(lambda size, after: sql_page(backend, code, hospital_ids, size, after), page_size)
+    store_pages = walk(lambda size, after: store_page(store, code, hospital_ids, size, after), page_size)
+
+    assert [key for page in sql_pages for key in page] == expected
+    assert store_pages == sql_pages
+    assert all(len(page) == page_size for page in sql_pages[:-1])
+
+
+def test_last_full_page_has_no_next_page(backend):
+    hospital_ids = ["H1", "H2", "H3", "H4", "H5"]
+    expected = all_priced(backend, FULL_PAGE_CODE, hospital_ids)
+    store = FactStore.from_backend(backend)
+    assert len(expected) == 50
+
+    for fetch in (lambda size, after: sql_page(backend, FULL_PAGE_CODE, hospital_ids, size, after),
+                  lambda size, after: store_page(store, FULL_PAGE_CODE, hospital_ids, size, after)):
+        pages = walk(fetch, 25)
+        assert [len(page) for page in pages] == [25, 25]
+        assert [key for page in pages for key in page] == expected
+
+
+# A cursor taken from one source continues the same walk in the other, even
+# when the cursor's hospital is not among the store's hospitals
+def test_cursor_carries_across_sources(backend):
+    hospital_ids = ["H1", "H3"]
+    store = FactStore.from_backend(backend)
+    first = sql_page(backend, "99205", hospital_ids, 25, None).iloc[:25]
+    after = _key(first.iloc[-1])
+
+    assert _keys(store_page(store, "99205", hospital_ids, 25, after)) == \
+        _keys(sql_page(backend, "99205", hospital_ids, 25, after))
+
+    between = (after[0], "H1~") + after[2:]
+    assert _keys(store_page(store, "99205", hospital_ids, 25, between)) == \
+        _keys(sql_page(backend, "99205", hospital_ids, 25, between))
+
+
+# Offers that tie on charge, hospital, payer and plan and differ only in
+# methodology or minimum/maximum charge, more of them than fit on one page
+def test_tied_offers_are_not_skipped_at_a_page_boundary():
+    tables = make_tables()
+    columns = list(tables["MASTER_TABLE"].columns)
+    tied = [
+        ("H2", 1, 1, "99700", 120.0, maximum, minimum, methodology)
+        for methodology in [None, "case rate", "fee schedule", "per diem", "percent of charges"]
+        for minimum, maximum in [(None, None), (60.0, 240.0), (60.0, 250.0), (55.0, 240.0), (None, 240.0),
+                                 (60.0, None)]
+    ]
+    tied.append(("H1", 2, 3, "99700", 95.5, None, None, None))
+    rows = pd.DataFrame(tied, columns=columns).astype(tables["MASTER_TABLE"].dtypes.to_dict())
+    tables["MASTER_TABLE"] = pd.concat([tables["MASTER_TABLE"], rows], ignore_index=True)
+
+    backend = LocalBackend(tables=tables)
+    try:
+        hospital_ids = ["H1", "H2"]
+        expected = all_priced(backend, "99700", hospital_ids)
+        store = FactStore.from_backend(backend)
+        assert len(set(expected)) == len(expected) == 31
+
+        sql_pages = walk(lambda size, after: sql_page(backend, "99700", hospital_ids, size, after), 25)
+        store_pages = walk(lambda size, after: store_page(store, "99700", hospital_ids, size, after), 25)
+        assert [len(page) for page in sql_pages] == [25, 6]
+        assert [key for page in sql_pages for key in page] == expected
+        assert store_pages == sql_pages
+
+        # Each source continues from the other's cursor inside the tie
+        after = sql_pages[0][-1]
+        assert _keys(store_page(store, "99700", hospital_ids, 25, after)) == sql_pages[1]
+        after = store_pages[0][-1]
+        assert _keys(sql_page(backend, "99700", hospital_ids, 25, after)) == store_pages[1]
+    finally:
+        backend.close()
@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from conftest import make_tables
+from ingest_pipeline import run_pipeline
+from query_backend import LocalBackend, TABLE_DTYPES, qualified_name
+from test_ingest_pipeline import STAGE_COLUMNS, stage_rows
+
+
+def test_parquet_loader_partitions_by_state_and_hospital(tmp_path):
+    pd.DataFrame(stage_rows(40), columns=STAGE_COLUMNS).to_csv(tmp_path / "uptown.csv", index=False)
+    entries = [
+        {"hospital": "UPTOWN", "hospital_id": "0004994", "state": "NC", "source": str(tmp_path / "uptown.csv")},
+        {"hospital": "UPTOWN_EAST", "hospital_id": "0004994", "state": "NC", "source": str(tmp_path / "uptown.csv")},
+    ]
+    run_pipeline(entries, str(tmp_path / "cleaned"), workers=1, chunk_size=15)
+    summary = run_pipeline(entries, str(tmp_path / "parquet"), workers=1, loader="parquet", chunk_size=15)
+
+    assert summary["failures"] == []
+    # Two campuses sharing an ID are two files in one partition
+    partition = tmp_path / "parquet" / "STATE=NC" / "HOSPITAL_ID=0004994"
+    assert sorted(os.listdir(partition)) == ["UPTOWN.parquet", "UPTOWN_EAST.parquet"]
+
+    parquet = pq.ParquetFile(partition / "UPTOWN.parquet")
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.schema_arrow.field("PAYER_NAME").type == pa.dictionary(pa.int32(), pa.string())
+    assert parquet.schema_arrow.field("STANDARD_CHARGE_DOLLAR").type == pa.float64()
+    assert parquet.metadata.row_group(0).column(5).statistics.has_min_max
+
+    from_csv = pd.read_csv(tmp_path / "cleaned" / "UPTOWN.csv", dtype={"CODE": str})
+    from_parquet = parquet.read().to_pandas()
+    for column in from_csv.columns:
+        assert from_parquet[column].astype(from_csv[column].dtype).tolist() == from_csv[column].tolist(), column
+
+
+# A MASTER_TABLE/ dataset partitioned by hospital: partition values stay
+# strings, so leading zeros survive
+def test_local_backend_reads_partitioned_parquet(tmp_path):
+    tables = make_tables()
+    master = tables.pop("MASTER_TABLE")
+    master["HOSPITAL_ID"] = master["HOSPITAL_ID"].replace({"H1": "0004994"})
+    for table, df in tables.items():
+        df.to_csv(tmp_path / f"{table}.csv", index=False)
+    dataset = tmp_path / "MASTER_TABLE"
+    for hospital_id, rows in master.groupby("HOSPITAL_ID"):
+        os.makedirs(dataset / f"HOSPITAL_ID={hospital_id}")
+        rows.drop(columns="HOSPITAL_ID").to_parquet(dataset / f"HOSPITAL_ID={hospital_id}" / "part-0.parquet")
+
+    backend = LocalBackend(str(tmp_path))
+    try:
+        df = backend.run(f"SELECT * FROM {qualified_name('MASTER_TABLE')}")
+        assert set(TABLE_DTYPES["MASTER_TABLE"]) <= set(df.columns)
+        assert len(df) == len(master)
+        assert sorted(df["HOSPITAL_ID"].unique()) == ["0004994", "H2", "H3", "H4", "H5"]
+    finally:
+        backend.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from master_loader import load_hospital
+from query_backend import qualified_name
+from query_templates import bind
+from test_aggregates import cleaned_rows
+
+cleaned_table = qualified_name("CLEANED_CHARGES")
+
+
+# The Insurance Provider Comparison query as it read MASTER_TABLE before the cube
+def direct_provider_comparison(backend, state, city):
+    return backend.run(f"""
+        SELECT p.PAYER_NAME, AVG(m.STANDARD_CHARGE_DOLLAR) as AVG_CHARGE
+        FROM {qualified_name("MASTER_TABLE")} m
+        JOIN {qualified_name("HOSPITAL_DATA")} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
+        JOIN {qualified_name("INSURANCE_PROVIDERS")} p ON m.INSURANCE_PROVIDER_ID = p.INSURANCE_PROVIDER_ID
+        WHERE m.STANDARD_CHARGE_DOLLAR > 0
+            AND (? IS NULL OR h.STATE = ?)
+            AND (? IS NULL OR h.CITY = ?)
+        GROUP BY p.PAYER_NAME
+    """, [state, state, city, city])
+
+
+def assert_matches_direct(backend, state, city):
+    query = bind("provider_comparison", state=state, city=city)
+    result = backend.run(query.sql, query.params)
+    expected = direct_provider_comparison(backend, state, city)
+
+    assert result["AVG_CHARGE"].is_monotonic_decreasing
+    result = result.set_index("PAYER_NAME")["AVG_CHARGE"]
+    expected = expected.set_index("PAYER_NAME")["AVG_CHARGE"]
+    assert sorted(result.index) == sorted(expected.index)
+    for payer, average in expected.items():
+        assert result[payer] == pytest.approx(average)
+
+
+# H2's two campuses sit in Charlotte and Matthews; H5 has no city
+FILTERS = [(None, None), ("NC", None), ("NC", "Charlotte"), ("NC", "Matthews"), ("NV", None), ("IL", None),
+           (None, "Las Vegas"), ("NV", "Nowhere")]
+
+
+@pytest.mark.parametrize("state, city", FILTERS)
+def test_cube_matches_master_table(backend, state, city):
+    assert_matches_direct(backend, state, city)
+
+
+# After a reload refreshes the cube, the averages still match
+def test_cube_matches_after_reload(backend):
+    backend.run(f"CREATE TABLE {cleaned_table} AS {cleaned_rows('H2')}")
+    backend.run(f"DELETE FROM {cleaned_table} WHERE PAYER_NAME = 'Cigna'")
+    backend.run(f"UPDATE {cleaned_table} SET STANDARD_CHARGE_DOLLAR = STANDARD_CHARGE_DOLLAR * 2 "
+                f"WHERE PAYER_NAME = 'Aetna'")
+    load_hospital(backend, "H2")
+
+    for state, city in FILTERS:
+        assert_matches_direct(backend, state, city)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import QUANTILES, RELATIVE_ACCURACY, bucket_of, bucket_sql, quantiles
+from query_backend import qualified_name
+from query_templates import bind
+
+
+# The charge at each quantile's rank (the lower of two middles), as the sketch defines it
+def exact_quantile(values, q):
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    return values[int(np.floor(q * (len(values) - 1)))]
+
+
+def sketch(charges, by):
+    frame = charges.assign(BUCKET=bucket_of(charges["CHARGE"]))
+    return frame.groupby(by + ["BUCKET"]).size().rename("BUCKET_COUNT").reset_index()
+
+
+@pytest.fixture
+def charges():
+    rng = np.random.default_rng(7)
+    groups = np.repeat(["A", "B", "C", "D"], [1, 17, 400, 5000])
+    values = np.concatenate([
+        [250.0],
+        rng.uniform(10, 20, 17),
+        rng.lognormal(6, 1.5, 400),
+        np.round(rng.lognormal(4, 0.5, 5000), 2),
+    ])
+    return pd.DataFrame({"GROUP": groups, "CHARGE": values})
+
+
+def test_quantiles_within_relative_accuracy(charges):
+    result = quantiles(sketch(charges, ["GROUP"]), by=["GROUP"]).set_index("GROUP")
+
+    for group, values in charges.groupby("GROUP")["CHARGE"]:
+        assert result.loc[group, "CHARGE_COUNT"] == len(values)
+        for column, q in QUANTILES.items():
+            exact = exact_quantile(values, q)
+            assert abs(result.loc[group, column] - exact) <= RELATIVE_ACCURACY * exact * (1 + 1e-9), (group, column)
+
+
+# Merging sketches (adding bucket counts) answers as if the charges were sketched together
+def test_merged_sketches_match_one_sketch(charges):
+    merged = quantiles(sketch(charges, ["GROUP"]))
+    whole = quantiles(sketch(charges.assign(GROUP="all"), ["GROUP"]), by=["GROUP"])
+
+    for column, q in QUANTILES.items():
+        assert merged[column].iloc[0] == pytest.approx(whole[column].iloc[0])
+        exact = exact_quantile(charges["CHARGE"], q)
+        assert abs(merged[column].iloc[0] - exact) <= RELATIVE_ACCURACY * exact * (1 + 1e-9)
+
+
+def test_empty_sketch_has_no_rows():
+    empty = pd.DataFrame({"GROUP": [], "BUCKET": [], "BUCKET_COUNT": []})
+    assert list(quantiles(empty, by=["GROUP"]).columns) == ["GROUP", "CHARGE_COUNT"] + list(QUANTILES)
+    assert quantiles(empty, by=["GROUP"]).empty
+
+
+# CHARGE_SKETCHES is bucketed in SQL; the buckets must be the ones bucket_of gives
+def test_sql_buckets_match_python(backend, charges):
+    backend.load_dataframe("CHARGES", charges)
+    sql = backend.run(f"SELECT {bucket_sql('CHARGE')} as BUCKET FROM {qualified_name('CHARGES')}")
+    np.testing.assert_array_equal(sql["BUCKET"].to_numpy(), bucket_of(charges["CHARGE"]))
+
+
+# The Cost Explorer's per-city figures: CHARGE_SKETCHES rows merged per city
+# against the exact charges of that city's hospitals
+def test_city_sketches_match_master_table(backend):
+    query = bind("city_charge_sketches", code="99203", state=None)
+    result = quantiles(backend.run(query.sql, query.params), by=["CITY", "STATE"])
+    charges = backend.run(f"""
+        SELECT h.CITY, h.STATE, m.STANDARD_CHARGE_DOLLAR as CHARGE
+        FROM {qualified_name("MASTER_TABLE")} m
+        JOIN {qualified_name("HOSPITAL_DATA")} h ON m.HOSPITAL_ID = h.HOSPITAL_ID
+        WHERE m.CODE = '99203' AND m.STANDARD_CHARGE_DOLLAR > 0 AND h.CITY IS NOT NULL
+    """)
+
+    assert len(result) == charges.groupby(["CITY", "STATE"]).ngroups
+    for _, row in result.iterrows():
+        values = charges.loc[(charges["CITY"] == row["CITY"]) & (charges["STATE"] == row["STATE"]), "CHARGE"]
+        assert row["CHARGE_COUNT"] == len(values)
+        for column, q in QUANTILES.items():
+            exact = exact_quantile(values, q)
+            assert abs(row[column] - exact) <= RELATIVE_ACCURACY * exact * (1 + 1e-9)
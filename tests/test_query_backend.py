@@ -0,0 +1,78 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from conftest import make_tables
+from query_backend import CORE_TABLES, LocalBackend, get_backend, qualified_name
+
+master_table = qualified_name("MASTER_TABLE")
+
+
+def test_tables_keep_their_types(backend):
+    assert sorted(set(CORE_TABLES) - set(backend.list_tables())) == []
+    df = backend.run(f"SELECT * FROM {master_table} WHERE HOSPITAL_ID = ? AND CODE = ?", ["H1", "99201"])
+    expected = make_tables()["MASTER_TABLE"]
+    expected = expected[(expected["HOSPITAL_ID"] == "H1") & (expected["CODE"] == "99201")]
+    assert len(df) == len(expected)
+    assert df["CODE"].tolist() == ["99201"] * len(expected)
+
+
+# A CSV copy of the tables, as exported from Snowflake; IDs and codes keep
+# their leading zeros
+def test_loads_a_directory_of_csvs(tmp_path):
+    tables = make_tables()
+    tables["HOSPITAL_DATA"].loc[0, "HOSPITAL_ID"] = "0004994"
+    tables["MASTER_TABLE"].loc[tables["MASTER_TABLE"]["HOSPITAL_ID"] == "H1", "HOSPITAL_ID"] = "0004994"
+    for table, df in tables.items():
+        df.to_csv(tmp_path / f"{table}.csv", index=False)
+
+    backend = LocalBackend(str(tmp_path))
+    try:
+        df = backend.run(f"SELECT DISTINCT HOSPITAL_ID FROM {master_table} ORDER BY HOSPITAL_ID")
+        assert df["HOSPITAL_ID"].tolist() == ["0004994", "H2", "H3", "H4", "H5"]
+        assert len(backend.run(f"SELECT * FROM {master_table}")) == len(tables["MASTER_TABLE"])
+    finally:
+        backend.close()
+
+
+def test_threads_share_the_database(backend):
+    results, errors = [], []
+
+    def count(code):
+        try:
+            df = backend.run(f"SELECT COUNT(*) as N FROM {master_table} WHERE CODE = ?", [code])
+            results.append(int(df["N"].iloc[0]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=count, args=(f"9920{i % 8 + 1}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(results) == 2 * int(backend.run(
+        f"SELECT COUNT(*) as N FROM {master_table} WHERE CODE LIKE '9920%'"
+    )["N"].iloc[0])
+
+
+def test_transaction_rolls_back_on_error(backend):
+    before = backend.run(f"SELECT COUNT(*) as N FROM {master_table}")["N"].iloc[0]
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            backend.run(f"DELETE FROM {master_table}")
+            raise RuntimeError("load failed")
+    assert backend.run(f"SELECT COUNT(*) as N FROM {master_table}")["N"].iloc[0] == before
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_backend("postgres")
+
+
+def test_load_dataframe_replaces_a_table(backend):
+    backend.load_dataframe("SCRATCH", pd.DataFrame({"A": [1, 2]}))
+    backend.load_dataframe("SCRATCH", pd.DataFrame({"A": [3]}))
+    assert backend.run(f"SELECT A FROM {qualified_name('SCRATCH')}")["A"].tolist() == [3]
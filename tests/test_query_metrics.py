@@ -0,0 +1,83 @@
+import json
+
+import pandas as pd
+
+from query_metrics import RECORD_FIELDS, QueryLog, get_query_log, params_hash
+from query_templates import bind
+
+
+def _query(code="99203"):
+    return bind("cpt_description", code=code)
+
+
+def test_record_fields(backend):
+    query = _query()
+    result, stats = backend.run_measured(query.sql, query.params)
+    record = QueryLog(backend="local").record(query, "Explorer", "miss", 12.34567, result, stats)
+
+    assert list(record) == RECORD_FIELDS
+    assert record["template"] == "cpt_description"
+    assert record["backend"] == "local"
+    assert record["wall_ms"] == 12.346
+    assert record["rows"] == 1 and record["bytes"] > 0
+    assert 0 <= record["first_row_ms"] and record["query_id"] is None
+    assert record["params_hash"] == params_hash(["99203"]) != params_hash(["99204"])
+
+
+def test_failed_query_is_recorded_without_rows():
+    record = QueryLog().record(_query(), "Explorer", "miss", 5.0, error="boom")
+    assert record["rows"] is None and record["bytes"] is None and record["error"] == "boom"
+
+
+def test_keeps_only_the_most_recent_records():
+    log = QueryLog(capacity=3)
+    for i in range(5):
+        log.record(_query(), "Explorer", "miss", float(i))
+    assert [r["wall_ms"] for r in log.records()] == [2.0, 3.0, 4.0]
+    log.clear()
+    assert log.frame().empty
+
+
+def test_summary_per_page_and_template():
+    log = QueryLog()
+    for wall_ms in [10.0, 20.0, 30.0, 40.0]:
+        log.record(_query(), "Explorer", "hit" if wall_ms < 25 else "miss", wall_ms, pd.DataFrame({"A": [1, 2]}))
+    log.record(_query(), "Explorer", "miss", 11000.0, error="timeout")
+    log.record(bind("states"), "Navigator", "fact_store", 1.0, pd.DataFrame())
+
+    summary = log.summary().set_index(["page", "template"])
+    explorer = summary.loc[("Explorer", "cpt_description")]
+    assert explorer["queries"] == 5
+    assert explorer["p50_ms"] == 30.0
+    assert explorer["max_ms"] == 11000.0
+    assert explorer["hit_rate"] == 0.4
+    assert explorer["over_budget"] == 1 and explorer["errors"] == 1
+    assert explorer["avg_rows"] == 2
+    assert summary.loc[("Navigator", "states"), "hit_rate"] == 0
+    # Slowest first
+    assert summary.index[0] == ("Explorer", "cpt_description")
+    assert list(log.summary(by=("page",))["page"]) == ["Explorer", "Navigator"]
+
+
+def test_empty_summary_has_the_columns():
+    summary = QueryLog().summary()
+    assert summary.empty
+    assert list(summary.columns)[:3] == ["page", "template", "queries"]
+
+
+def test_log_file_and_jsonl_match(tmp_path, monkeypatch):
+    path = tmp_path / "queries.jsonl"
+    monkeypatch.setenv("HEALTH_NAV_QUERY_LOG", str(path))
+    log = get_query_log("local")
+    log.record(_query(), "Explorer", "miss", 1.0)
+    log.record(_query("99204"), "Explorer", "hit", 2.0)
+
+    assert path.read_text() == log.to_jsonl()
+    assert [json.loads(line)["cache"] for line in path.read_text().splitlines()] == ["miss", "hit"]
+
+
+# A log file that cannot be written never fails the query
+def test_unwritable_log_file_is_ignored(tmp_path):
+    log = QueryLog(log_path=str(tmp_path / "missing" / "queries.jsonl"))
+    log.record(_query(), "Explorer", "miss", 1.0)
+    assert len(log.records()) == 1
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from query_scheduler import QueryScheduler, with_thread_context
+
+ATTR = "test_script_run_ctx"
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = QueryScheduler(max_workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+# Like Streamlit's add_script_run_ctx: a None context leaves the thread's as is
+def attach(thread, context):
+    if context is not None:
+        setattr(thread, ATTR, context)
+
+
+def current_context():
+    return getattr(threading.current_thread(), ATTR, None)
+
+
+def test_queries_run_at_the_same_time(scheduler):
+    barrier = threading.Barrier(2, timeout=5)
+    batch = scheduler.batch()
+    batch.add("a", barrier.wait)
+    batch.add("b", barrier.wait)
+    # Each query waits for the other, so this only finishes if both run at once
+    assert sorted([batch.result("a"), batch.result("b")]) == [0, 1]
+
+
+def test_results_and_errors_come_back_by_key(scheduler):
+    def fail():
+        raise RuntimeError("query failed")
+
+    batch = scheduler.batch()
+    batch.add("slow", lambda: time.sleep(0.05) or "slow")
+    batch.add("sum", sum, [1, 2, 3])
+    batch.add("fail", fail)
+    assert batch.result("sum") == 6
+    assert batch.result("slow") == "slow"
+    with pytest.raises(RuntimeError, match="query failed"):
+        batch.result("fail")
+    with pytest.raises(ValueError):
+        batch.add("sum", sum, [1])
+
+
+# A pool thread reused by another session's batch does not keep the previous
+# session's context
+def test_context_is_restored_after_each_task():
+    scheduler = QueryScheduler(max_workers=1)
+    try:
+        first = scheduler.batch(with_thread_context(attach, "session-1", ATTR))
+        first.add("ctx", current_context)
+        assert first.result("ctx") == "session-1"
+
+        unwrapped = scheduler.batch()
+        unwrapped.add("ctx", current_context)
+        assert unwrapped.result("ctx") is None
+
+        second = scheduler.batch(with_thread_context(attach, "session-2", ATTR))
+        second.add("ctx", current_context)
+        assert second.result("ctx") == "session-2"
+
+        # A task run on a thread that had a context of its own gives it back
+        setattr(threading.current_thread(), ATTR, "page")
+        with_thread_context(attach, "session-3", ATTR)(current_context)()
+        assert current_context() == "page"
+    finally:
+        threading.current_thread().__dict__.pop(ATTR, None)
+        scheduler.shutdown()
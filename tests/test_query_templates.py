@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from query_templates import QUERY_TEMPLATES, QueryTemplate, bind, navigator_filters
+
+
+def test_placeholders_become_positional_binds():
+    template = QueryTemplate("t", """
+        SELECT *   FROM HEALTH_NAV.CORE.MASTER_TABLE
+        WHERE (:state IS NULL OR STATE = :state) AND CODE = :code AND x::INT > 0
+    """)
+    query = template.bind(code="99203", state="NC")
+
+    assert template.param_names == ["state", "code"]
+    assert query.sql == "SELECT * FROM HEALTH_NAV.CORE.MASTER_TABLE WHERE (? IS NULL OR STATE = ?) AND CODE = ? AND x::INT > 0"
+    assert query.params == ["NC", "NC", "99203"]
+    assert query.tables == ("MASTER_TABLE",)
+
+
+def test_lists_expand_to_one_bind_each():
+    template = QueryTemplate("t", "SELECT * FROM T WHERE ID IN (:ids)")
+    assert template.bind(ids=["b", "a", "b"]).sql == "SELECT * FROM T WHERE ID IN (?, ?)"
+    assert template.bind(ids=["b", "a", "b"]).params == ["a", "b"]
+    # An empty list matches nothing instead of producing "IN ()"
+    assert template.bind(ids=[]).sql == "SELECT * FROM T WHERE ID IN (?)"
+    assert template.bind(ids=[]).params == [None]
+
+
+# Equivalent requests share one cache key
+def test_equivalent_requests_share_a_key():
+    a = bind("navigator_hospitals_count", code=" 99203 ", hospital_ids=["H2", "H1", ""], **navigator_filters())
+    b = bind("navigator_hospitals_count", code="99203", hospital_ids=("H1", "H2"), **navigator_filters())
+    assert a.sql == b.sql and a.params == b.params and a.key == b.key
+    assert bind("cities_by_state", state="  ").params == [None, None]
+    assert bind("cities_by_state", state="NC").key != bind("cities_by_state", state="NV").key
+
+
+def test_numpy_values_bind_as_python_values():
+    query = bind("hospital_variation", min_procedures=np.int64(5), state="NC", city=None)
+    assert type(query.params[0]) is int
+
+
+def test_normalizers_run_after_the_defaults():
+    template = QueryTemplate("t", "SELECT * FROM T WHERE CODE = :code", normalizers={"code": str.upper})
+    assert template.bind(code=" ab1 ").params == ["AB1"]
+
+
+def test_bad_parameters_are_rejected():
+    with pytest.raises(ValueError, match="missing parameters: state"):
+        bind("cities_by_state")
+    with pytest.raises(ValueError, match="unknown parameters: city"):
+        bind("cities_by_state", state="NC", city="Charlotte")
+    with pytest.raises(ValueError, match="Unknown query template"):
+        bind("no_such_template")
+
+
+# Every registered template binds and runs on the local backend
+def test_every_template_runs(backend):
+    values = {
+        "code": "99203", "state": None, "city": None, "hospital_id": "H1", "hospital_ids": ["H1", "H2"],
+        "min_procedures": 1, "after_charge": None, "after_hospital": None, "after_provider": None,
+        "after_plan": None, "after_minimum": None, "after_maximum": None, "after_methodology": None,
+        "all_providers": True, "provider_ids": [], "all_plans": False, "plan_ids": [1, 2],
+    }
+    for name, template in QUERY_TEMPLATES.items():
+        query = template.bind(**{param: values[param] for param in template.param_names})
+        backend.run(query.sql, query.params)
@@ -0,0 +1,150 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_cache
+from result_cache import ResultCache, result_size
+
+
+def frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "HOSPITAL_ID": pd.array([f"H{i}" for i in range(rows)], dtype="string"),
+        "INSURANCE_PLAN_ID": pd.array(rng.integers(1, 5, rows), dtype="Int64"),
+        "STANDARD_CHARGE_DOLLAR": rng.uniform(10, 500, rows),
+    })
+
+
+def test_memory_tier_is_lru_within_its_byte_budget():
+    nbytes = result_size(frame(100))
+    cache = ResultCache(memory_bytes=3 * nbytes, disk_dir=None)
+    for key in "abc":
+        cache.put(key, frame(100))
+    cache.get("a")
+    cache.put("d", frame(100))
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["memory_entries"] == 3
+    assert stats["memory_bytes"] <= 3 * nbytes
+
+
+def test_oversized_entries_are_not_cached():
+    cache = ResultCache(max_entry_bytes=result_size(frame(10)), disk_dir=None)
+    assert cache.put("small", frame(10))
+    assert not cache.put("large", frame(1000))
+    assert cache.get("large") is None
+    assert cache.stats()["rejected"] == 1
+
+
+def test_counters_and_hit_rate(tmp_path):
+    writer = ResultCache(disk_dir=str(tmp_path))
+    writer.put("k", frame(5))
+    reader = ResultCache(disk_dir=str(tmp_path))
+    reader.get("k")
+    reader.get("k")
+    reader.get("missing")
+
+    stats = reader.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+# Callers may change what they get back without changing the cache
+def test_results_are_copies():
+    cache = ResultCache(disk_dir=None)
+    df = frame(5)
+    cache.put("k", df)
+    df.loc[0, "STANDARD_CHARGE_DOLLAR"] = -1
+    result = cache.get("k")
+    result.loc[1, "STANDARD_CHARGE_DOLLAR"] = -1
+    assert (cache.get("k")["STANDARD_CHARGE_DOLLAR"] > 0).all()
+
+
+# Another process sees the same frame, dtypes and index included
+def test_disk_tier_round_trips_frames(tmp_path):
+    df = frame(50).iloc[10:20]
+    ResultCache(disk_dir=str(tmp_path)).put("k", df)
+    pd.testing.assert_frame_equal(ResultCache(disk_dir=str(tmp_path)).get("k"), df)
+    assert ResultCache(disk_dir=str(tmp_path), namespace="snowflake").get("k") is None
+
+
+def test_disk_tier_never_loads_pickles(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    frame(5).to_pickle(tmp_path / "planted.pkl")
+    (tmp_path / "planted.arrow").write_bytes(b"not an arrow file")
+    assert cache.get("planted") is None
+
+
+def test_unstorable_frames_stay_in_memory(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    df = pd.DataFrame({"MIXED": [1, "a", 2.5]})
+    assert cache.put("k", df)
+    assert cache.get("k") is not None
+    assert not any(name.endswith((".arrow", ".tmp")) for name in os.listdir(tmp_path))
+
+
+def test_directory_is_private(tmp_path):
+    path = tmp_path / "cache"
+    ResultCache(disk_dir=str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+    os.chmod(path, 0o777)
+    ResultCache(disk_dir=str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="chown needs root")
+def test_directory_owned_by_another_user_is_refused(tmp_path, caplog):
+    path = tmp_path / "cache"
+    path.mkdir()
+    os.chown(path, 12345, -1)
+    with caplog.at_level(logging.WARNING, logger="result_cache"):
+        cache = ResultCache(disk_dir=str(path))
+    assert cache.disk_dir is None
+    assert "owned by another user" in caplog.text
+    cache.put("k", frame(5))
+    assert os.listdir(path) == []
+
+
+def test_symlinked_directory_is_refused(tmp_path):
+    (tmp_path / "real").mkdir(mode=0o700)
+    os.symlink(tmp_path / "real", tmp_path / "link")
+    assert ResultCache(disk_dir=str(tmp_path / "link")).disk_dir is None
+
+
+def test_disk_tier_evicts_least_recently_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "DISK_SCAN_SECONDS", 0)
+    cache = ResultCache(disk_dir=str(tmp_path), memory_bytes=0)
+    cache.put("a", frame(200))
+    size = os.path.getsize(tmp_path / "a.arrow")
+    cache.disk_bytes = int(2.5 * size)
+    cache.put("b", frame(200, seed=1))
+    os.utime(tmp_path / "a.arrow", (1, 1))
+    os.utime(tmp_path / "b.arrow", (2, 2))
+    cache.get("a")
+    cache.put("c", frame(200, seed=2))
+
+    assert sorted(os.listdir(tmp_path)) == ["a.arrow", "c.arrow"]
+
+
+# Writes add to a running total; the directory is only listed when the total
+# goes over budget or the last scan is DISK_SCAN_SECONDS old
+def test_puts_do_not_rescan_the_directory(tmp_path, monkeypatch):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    scans = []
+    trim = cache._trim_disk
+    monkeypatch.setattr(cache, "_trim_disk", lambda: scans.append(1) or trim())
+
+    for i in range(20):
+        cache.put(f"k{i}", frame(20, seed=i))
+    assert len(scans) == 1
+
+    cache.disk_bytes = 0
+    cache.put("over", frame(20))
+    assert len(scans) == 2
+    assert os.listdir(tmp_path) == []
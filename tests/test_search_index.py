@@ -0,0 +1,56 @@
+import pytest
+
+from dimensions import DimensionCache
+from search_index import SearchIndex, build_search_indexes, is_code
+
+
+@pytest.fixture
+def cpt_index():
+    return SearchIndex(
+        ["99213", "99214", "21399", "J1100", "72148"],
+        ["Office visit, established patient", "Office visit, established patient, moderate",
+         "Unlisted procedure, craniofacial", "Dexamethasone injection", "MRI lumbar spine without contrast"],
+    )
+
+
+def test_exact_key_beats_prefix_beats_words(cpt_index):
+    assert cpt_index.search("99213")[0] == ("99213", "Office visit, established patient")
+    assert [key for key, _ in cpt_index.search("9921")] == ["99213", "99214"]
+    # The other entries only share trigrams with "99213"
+    scores = cpt_index.scores("99213")
+    assert scores[0] > 100 > scores[1]
+
+
+def test_word_prefixes_and_typos_match(cpt_index):
+    assert cpt_index.best("mri lumb") == ("72148", "MRI lumbar spine without contrast")
+    assert cpt_index.best("dexamethazone") == ("J1100", "Dexamethasone injection")
+    # Ties go to the shorter entry
+    assert cpt_index.search("office visit")[0][0] == "99213"
+
+
+def test_weak_matches_are_left_out(cpt_index):
+    assert cpt_index.best("zzzz") is None
+    assert cpt_index.search("") == []
+    assert cpt_index.search("visit", limit=1) == [("99213", "Office visit, established patient")]
+
+
+def test_head_lists_keys_in_order(cpt_index):
+    assert [key for key, _ in cpt_index.head(3)] == ["21399", "72148", "99213"]
+    assert SearchIndex([], []).head() == [] and SearchIndex([], []).search("a") == []
+
+
+def test_complete_codes_are_recognised():
+    assert all(is_code(text) for text in ["99213", " J1100 ", "0001U"])
+    assert not any(is_code(text) for text in ["9921", "knee", "office", "992134"])
+
+
+# Payer and plan keys stay IDs, so matches filter fact rows directly
+def test_indexes_built_from_the_dimension_cache(backend):
+    indexes = build_search_indexes(DimensionCache(backend.run))
+    assert indexes["payer"].matching_keys("united") == [3]
+    assert indexes["payer"].matching_keys("aetan") == [1]
+    assert indexes["plan"].matching_keys("silver") == [5]
+    assert sorted(set(indexes["hospital"].matching_keys("campus"))) == ["H2"]
+    assert indexes["hospital"].best("desert sprngs")[0] == "H3"
+    assert indexes["city"].best("las vegs") == ("Las Vegas", "NV")
+    assert indexes["cpt"].best("99500")[0] == "99500"
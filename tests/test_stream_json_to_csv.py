@@ -0,0 +1,81 @@
+import csv
+import json
+
+import pytest
+
+from stream_json_to_csv import LAYOUTS, convert, iter_batches, iter_rows
+
+CHARGES = {
+    "hospital_name": "Uptown Medical",
+    "standard_charge_information": [
+        {
+            "description": "Office visit",
+            "code_information": [{"code": "99203", "type": "CPT"}, {"code": "G0463", "type": "HCPCS"}],
+            "standard_charges": [
+                {
+                    "minimum": 50.5, "maximum": 400, "setting": "outpatient",
+                    "gross_charge": 500, "discounted_cash": 250, "billing_class": "professional",
+                    "payers_information": [
+                        {"payer_name": "Aetna", "plan_name": "PPO", "standard_charge_dollar": 120.25,
+                         "methodology": "fee schedule"},
+                        {"payer_name": "Cigna", "plan_name": "HMO", "standard_charge_percentage": 40,
+                         "estimated_amount": 200},
+                        {"payer_name": "Ambetter", "plan_name": "Gold"},
+                    ],
+                },
+            ],
+        },
+        {
+            "description": "No codes",
+            "standard_charges": [{"payers_information": [{"payer_name": "Aetna", "standard_charge_dollar": 9}]}],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def charges_file(tmp_path):
+    path = tmp_path / "standardcharges.json"
+    path.write_text(json.dumps(CHARGES))
+    return str(path)
+
+
+# Streaming gives the rows the notebook got from json.load on the whole file
+@pytest.mark.parametrize("layout", sorted(LAYOUTS))
+def test_streamed_rows_match_whole_file(charges_file, layout):
+    flatten, _ = LAYOUTS[layout]
+    expected = [row for charge in CHARGES["standard_charge_information"] for row in flatten(charge)]
+    streamed = list(iter_rows(charges_file, layout))
+
+    assert [{k: str(v) for k, v in row.items()} for row in streamed] == \
+        [{k: str(v) for k, v in row.items()} for row in expected]
+
+
+def test_standard_layout_handles_both_methodologies(charges_file):
+    rows = list(iter_rows(charges_file))
+
+    assert [(row["Payer_Name"], str(row["Standard_Charge_Dollar"]), str(row["Standard_Charge_Percentage"]))
+            for row in rows] == [("Aetna", "120.25", "N/A"), ("Cigna", "N/A", "40"), ("Ambetter", "N/A", "N/A"),
+                                 ("Aetna", "9", "N/A")]
+    assert rows[1]["Estimated_Amount"] == 200
+    assert (rows[3]["Code"], rows[3]["Minimum_Charge"]) == ("N/A", "N/A")
+
+
+def test_multi_code_layout_has_a_row_per_code(charges_file):
+    rows = list(iter_rows(charges_file, "multi_code"))
+    assert [(row["Code"], row["Code_Type"]) for row in rows] == [("99203", "CPT"), ("G0463", "HCPCS")]
+    assert str(rows[0]["Gross_Charge"]) == "500"
+
+
+def test_batches_are_bounded(charges_file):
+    assert [len(batch) for batch in iter_batches(charges_file, batch_size=3)] == [3, 1]
+
+
+def test_convert_writes_every_row(charges_file, tmp_path):
+    output = tmp_path / "out.csv"
+    assert convert(charges_file, str(output), batch_size=2) == 4
+
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == LAYOUTS["standard"][1]
+    assert [row["Payer_Name"] for row in rows] == ["Aetna", "Cigna", "Ambetter", "Aetna"]
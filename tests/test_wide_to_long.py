@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+import wide_to_long
+from wide_to_long import OUTPUT_COLUMNS, OUTPUT_RENAMES, WideLayout, convert, iter_long_chunks, parse_header
+
+HEADER = ['description', 'code|1', 'code|1|type', 'setting', 'standard_charge|min', 'standard_charge|max',
+          'standard_charge|Aetna|PPO|negotiated_dollar', 'standard_charge|Aetna|PPO|methodology',
+          'standard_charge|Cigna_Health|HMO_Plus|negotiated_dollar',
+          'standard_charge|Cigna_Health|HMO_Plus|negotiated_percentage',
+          'estimated_amount|Cigna_Health|HMO_Plus']
+
+
+def wide_rows():
+    rows = []
+    for i in range(12):
+        aetna = f"{100 + i}" if i % 3 else ""
+        cigna = f"{200 + i}" if i % 4 else ""
+        rows.append([f"Procedure {i}", f"992{i:02d}", "CPT", "outpatient", "10", "900",
+                     aetna, "fee schedule", cigna, "45" if cigna == "" else "", f"{50 + i}"])
+    # Repeated rows, one within the first chunk and two in later chunks
+    return rows[:6] + [rows[1]] + rows[6:] + [rows[2], rows[7]]
+
+
+@pytest.fixture
+def wide_file(tmp_path):
+    path = tmp_path / "standardcharges.csv"
+    with open(path, "w", encoding="latin1") as f:
+        f.write("hospital_name,last_updated_on\nUptown,2024-01-01\n")
+        pd.DataFrame(wide_rows(), columns=HEADER).to_csv(f, index=False)
+    return str(path)
+
+
+# Wide_To_Long_Format.ipynb on the whole file: melt each measure, keep rows with
+# a dollar charge, drop repeated merge keys and join the other measures on
+def notebook_long(path):
+    df = pd.read_csv(path, header=2, dtype=str, encoding="latin1")
+    base = ['description', 'code|1', 'code|1|type', 'setting', 'standard_charge|min', 'standard_charge|max']
+    keys = base + ['Payer Name', 'Plan Name']
+
+    def melted(pattern, name):
+        cols = [c for c in df.columns if pattern in c and '|' in c]
+        long = df[base + cols].melt(id_vars=base, value_vars=cols, var_name='charge_key', value_name=name)
+        payer_info = long['charge_key'].str.extract(r'(?:standard_charge|estimated_amount)\|(.+?)\|([^|]+)')
+        long['Payer Name'] = payer_info[0].str.replace("_", " ", regex=False)
+        long['Plan Name'] = payer_info[1].str.replace("_", " ", regex=False)
+        return long.dropna(subset=[name]).drop_duplicates(subset=keys)
+
+    merged = melted('negotiated_dollar', 'Standard Charge Dollar')
+    for pattern, name in [('negotiated_percentage', 'Standard Charge Percentage'),
+                          ('estimated_amount', 'Estimated Amount'), ('methodology', 'Methodology')]:
+        merged = merged.merge(melted(pattern, name)[keys + [name]], on=keys, how='left')
+    return merged.rename(columns=OUTPUT_RENAMES)[OUTPUT_COLUMNS]
+
+
+def _sorted(df):
+    df = df.astype(str).replace({"nan": "", "None": "", "<NA>": ""})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_parse_header():
+    assert parse_header('standard_charge|Cigna_Health|HMO_Plus|negotiated_dollar') == \
+        ('Cigna Health', 'HMO Plus', 'Standard Charge Dollar')
+    assert parse_header('estimated_amount|Aetna|PPO') == ('Aetna', 'PPO', 'Estimated Amount')
+    assert parse_header('standard_charge|gross') is None
+    assert parse_header('description') is None
+
+
+def test_layout_pairs_payers_and_plans():
+    layout = WideLayout(HEADER)
+    assert layout.pairs == [('Aetna', 'PPO'), ('Cigna Health', 'HMO Plus')]
+    assert layout.charge_columns == 5
+    assert layout.measure_columns['Methodology'] == ['standard_charge|Aetna|PPO|methodology', None]
+
+
+@pytest.mark.parametrize("chunk_size", [4, 5, 100])
+def test_matches_notebook(wide_file, tmp_path, chunk_size):
+    output = tmp_path / "long.csv"
+    rows = convert(wide_file, str(output), chunk_size=chunk_size)
+    result = pd.read_csv(output, dtype=str)
+
+    expected = notebook_long(wide_file)
+    assert rows == len(expected)
+    pd.testing.assert_frame_equal(_sorted(result), _sorted(expected))
+
+
+def test_duplicates_across_chunks_are_dropped(wide_file):
+    chunks = list(iter_long_chunks(wide_file, chunk_size=4))
+    long = pd.concat(chunks, ignore_index=True)
+    assert len(chunks) == 4
+    assert not long.duplicated(subset=[c for c in wide_to_long.MERGE_KEYS if c in long.columns]).any()
+    assert long['Standard Charge Dollar'].notna().all()